@@ -1,3 +1,4 @@
+from iceglitcher.uart import BufferedReader
 from pylibftdi import Device, INTERFACE_B
 from struct import pack
 from time import sleep
@@ -5,6 +6,7 @@ from time import sleep
 # Initialize FTDI device
 dev = Device(mode='b', interface_select=INTERFACE_B)
 dev.baudrate = 115200
+reader = BufferedReader(dev)
 
 EOL = b"\r\n"
 CMD_PASSTHROUGH = b"\x00"
@@ -15,14 +17,10 @@ def send_question_mark():
 
 # Read one line from the target
 def read_line():
-    line = b""
-    while True:
-        b1 = dev.read(1)
-        if not b1:
-            return None
-        line += b1
-        if line.endswith(EOL):
-            return line.strip()
+    line = reader.read_until(EOL)
+    if line is None:
+        return None
+    return line.strip()
 
 print("[*] Sending '?' (0x3F) to target every 1s. Press Ctrl+C to exit.")
 while True:
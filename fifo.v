@@ -0,0 +1,48 @@
+/*
+  iCEstick Glitcher (fifo.v)
+
+  Synchronous first-in first-out buffer (block RAM on the iCE40).
+*/
+
+`default_nettype none
+
+module fifo #(
+    parameter WIDTH = 8,
+    parameter DEPTH_LOG2 = 9            // 512 entries
+) (
+    input  wire             clk,
+    input  wire             rst,
+    input  wire             wr,
+    input  wire [WIDTH-1:0] din,
+    input  wire             rd,
+    output reg  [WIDTH-1:0] dout = 0,
+    output wire             empty,
+    output wire             full
+);
+
+    reg [WIDTH-1:0] mem [0:(1 << DEPTH_LOG2) - 1];
+    reg [DEPTH_LOG2:0] wr_ptr = 0;
+    reg [DEPTH_LOG2:0] rd_ptr = 0;
+
+    assign empty = (wr_ptr == rd_ptr);
+    assign full = (wr_ptr[DEPTH_LOG2] != rd_ptr[DEPTH_LOG2]) &&
+            (wr_ptr[DEPTH_LOG2-1:0] == rd_ptr[DEPTH_LOG2-1:0]);
+
+    // dout holds the entry read with rd in the following cycle
+    always @(posedge clk) begin
+        if (rst) begin
+            wr_ptr <= 0;
+            rd_ptr <= 0;
+        end else begin
+            if (wr && !full) begin
+                mem[wr_ptr[DEPTH_LOG2-1:0]] <= din;
+                wr_ptr <= wr_ptr + 1;
+            end
+            if (rd && !empty) begin
+                dout <= mem[rd_ptr[DEPTH_LOG2-1:0]];
+                rd_ptr <= rd_ptr + 1;
+            end
+        end
+    end
+
+endmodule
@@ -0,0 +1,207 @@
+/*
+  iCEstick Glitcher (host_link.v)
+
+  Transmit side of the USB-UART link to the host with a negotiable
+  baudrate. Bytes from the target (received at the current target
+  baudrate, target_clks_per_bit), the answers of the link and the
+  outcome records of the sweep engine are queued in a FIFO and sent
+  with the current host baudrate, which must not be lower than the
+  target baudrate.
+
+  Baudrate switch (lockstep with the host):
+
+    CMD_SET_BAUDRATE (0x0B, clocks per bit LE32):
+        0x5A is sent at the old baudrate, then the link switches
+    CMD_PING (0x0C):
+        0xA5 is sent, a ping at a new baudrate confirms the switch
+
+  Without a ping within CONFIRM_CYCLES after the switch, the link falls
+  back to the old baudrate. clks_per_bit is also used by the receiver
+  of the command processor.
+*/
+
+`default_nettype none
+
+module host_link #(
+    parameter DEFAULT_CLKS_PER_BIT = 868,   // 115200 baud at 100 MHz
+    parameter CONFIRM_CYCLES = 10_000_000   // 100 ms
+) (
+    input  wire        clk,
+    input  wire        rst,
+
+    // baudrate control from the command processor
+    input  wire        baud_set,
+    input  wire [15:0] baud_clks_per_bit,
+    input  wire        ping,
+    output reg  [15:0] clks_per_bit = DEFAULT_CLKS_PER_BIT,
+
+    // target bytes, relayed unless the sweep engine consumes them
+    input  wire        target_rx,
+    input  wire [15:0] target_clks_per_bit,
+    input  wire        relay,
+
+    // outcome records of the sweep engine
+    input  wire        rec_wr,
+    input  wire [7:0]  rec_data,
+    output wire        rec_full,
+
+    output wire        host_tx
+);
+
+    localparam [7:0] BAUD_ACK = 8'h5A;
+    localparam [7:0] PONG     = 8'hA5;
+
+    localparam [1:0] L_NORMAL  = 2'd0;
+    localparam [1:0] L_SWITCH  = 2'd1;
+    localparam [1:0] L_CONFIRM = 2'd2;
+
+    /* ───────────────────────────────
+       Transmit FIFO
+       ─────────────────────────────── */
+    reg        fifo_wr = 1'b0;
+    reg  [7:0] fifo_din = 8'd0;
+    reg        fifo_rd = 1'b0;
+    wire [7:0] fifo_dout;
+    wire       fifo_empty;
+    wire       fifo_full;
+
+    fifo #(.WIDTH(8), .DEPTH_LOG2(9)) TX_FIFO (
+        .clk  (clk),
+        .rst  (rst),
+        .wr   (fifo_wr),
+        .din  (fifo_din),
+        .rd   (fifo_rd),
+        .dout (fifo_dout),
+        .empty(fifo_empty),
+        .full (fifo_full)
+    );
+
+    assign rec_full = fifo_full;
+
+    // relayed target bytes
+    wire [7:0] tgt_data;
+    wire       tgt_valid;
+
+    uart_rx_var TARGET_RX (
+        .clk         (clk),
+        .rst         (rst),
+        .clks_per_bit(target_clks_per_bit),
+        .rx          (target_rx),
+        .data        (tgt_data),
+        .valid       (tgt_valid)
+    );
+
+    /* One FIFO write per cycle: records of the engine first, answers and
+       target bytes wait in their holding registers. */
+    reg        reply_pending = 1'b0;
+    reg  [7:0] reply = 8'd0;
+    reg        tgt_pending = 1'b0;
+    reg  [7:0] tgt_byte = 8'd0;
+
+    /* ───────────────────────────────
+       Baudrate switch
+       ─────────────────────────────── */
+    reg  [1:0]  link_state = L_NORMAL;
+    reg  [15:0] new_clks_per_bit = DEFAULT_CLKS_PER_BIT;
+    reg  [15:0] old_clks_per_bit = DEFAULT_CLKS_PER_BIT;
+    reg  [31:0] confirm_cnt = 32'd0;
+    wire        tx_idle;
+
+    always @(posedge clk) begin
+        fifo_wr <= 1'b0;
+
+        if (tgt_valid && relay) begin
+            tgt_byte <= tgt_data;
+            tgt_pending <= 1'b1;
+        end
+
+        if (rst) begin
+            link_state <= L_NORMAL;
+            clks_per_bit <= DEFAULT_CLKS_PER_BIT;
+            reply_pending <= 1'b0;
+            tgt_pending <= 1'b0;
+        end else begin
+            case (link_state)
+                L_NORMAL: begin
+                    if (baud_set) begin
+                        new_clks_per_bit <= baud_clks_per_bit;
+                        reply <= BAUD_ACK;
+                        reply_pending <= 1'b1;
+                        link_state <= L_SWITCH;
+                    end else if (ping) begin
+                        reply <= PONG;
+                        reply_pending <= 1'b1;
+                    end
+                end
+
+                // switch after the acknowledge left at the old baudrate
+                L_SWITCH: begin
+                    if (!reply_pending && !fifo_wr && fifo_empty && tx_idle) begin
+                        old_clks_per_bit <= clks_per_bit;
+                        clks_per_bit <= new_clks_per_bit;
+                        confirm_cnt <= 32'd0;
+                        link_state <= L_CONFIRM;
+                    end
+                end
+
+                L_CONFIRM: begin
+                    if (ping) begin
+                        reply <= PONG;
+                        reply_pending <= 1'b1;
+                        link_state <= L_NORMAL;
+                    end else if (confirm_cnt == CONFIRM_CYCLES) begin
+                        clks_per_bit <= old_clks_per_bit;
+                        link_state <= L_NORMAL;
+                    end else begin
+                        confirm_cnt <= confirm_cnt + 1;
+                    end
+                end
+            endcase
+
+            if (rec_wr) begin
+                fifo_din <= rec_data;
+                fifo_wr <= 1'b1;
+            end else if (reply_pending && !fifo_full) begin
+                fifo_din <= reply;
+                fifo_wr <= 1'b1;
+                reply_pending <= 1'b0;
+            end else if (tgt_pending && !fifo_full) begin
+                fifo_din <= tgt_byte;
+                fifo_wr <= 1'b1;
+                tgt_pending <= 1'b0;
+            end
+        end
+    end
+
+    /* ───────────────────────────────
+       Transmitter: read an entry, send it one cycle later
+       ─────────────────────────────── */
+    reg  tx_en = 1'b0;
+    reg  tx_pending = 1'b0;
+    wire tx_rdy;
+
+    uart_tx_var HOST_TX (
+        .clk         (clk),
+        .rst         (rst),
+        .clks_per_bit(clks_per_bit),
+        .data_in     (fifo_dout),
+        .en          (tx_en),
+        .rdy         (tx_rdy),
+        .dout        (host_tx)
+    );
+
+    always @(posedge clk) begin
+        fifo_rd <= 1'b0;
+        tx_en <= 1'b0;
+        if (tx_pending) begin
+            tx_en <= 1'b1;
+            tx_pending <= 1'b0;
+        end else if (!fifo_empty && tx_rdy && !tx_en && !fifo_rd) begin
+            fifo_rd <= 1'b1;
+            tx_pending <= 1'b1;
+        end
+    end
+
+    assign tx_idle = tx_rdy && !tx_en && !fifo_rd && !tx_pending;
+
+endmodule
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from iceglitcher.timing import Timeouts
+from iceglitcher.uart import BufferedReader
+from iceglitcher.uucode import uudecode
 from pylibftdi import Device, INTERFACE_B
 from time import sleep
 from struct import pack
-from codecs import decode
 from binascii import hexlify
 
 CRLF = b"\r\n"
@@ -18,6 +20,8 @@ class FlashDumper:
     def __init__(self):
         self.dev = Device(mode='b', interface_select=INTERFACE_B)
         self.dev.baudrate = 115200
+        self.reader = BufferedReader(self.dev)
+        self.timeouts = Timeouts()
 
     def toggle_reset(self):
         # 控制 RESET 引脚（假设为 CBUS0）
@@ -29,25 +33,22 @@ class FlashDumper:
         self.dev.ftdi_fn.ftdi_write_data(bytes([0x01]))  # Reset HIGH
         sleep(0.3)
 
-    def read_data(self, terminator=b"\r\n", echo=True):
+    def read_data(self, terminator=b"\r\n", echo=True, deadline=None):
         if echo:
-            while self.dev.read(1) != b"\r":
-                pass
-        data = b""
-        while True:
-            c = self.dev.read(1)
-            if not c:
+            if self.reader.read_until(b"\r", self.timeouts.deadline("echo")) is None:
                 return b"TIMEOUT"
-            data += c
-            if data.endswith(terminator):
-                break
+        if deadline is None:
+            deadline = self.timeouts.deadline("payload")
+        data = self.reader.read_until(terminator, deadline)
+        if data is None:
+            return b"TIMEOUT"
         return data.replace(terminator, b"")
 
     def synchronize(self):
         print("[*] Synchronizing with bootloader...")
 
         self.dev.write(CMD_PASSTHROUGH + pack("B", 1) + b"?")
-        resp = self.read_data(echo=False)
+        resp = self.read_data(echo=False, deadline=self.timeouts.deadline("sync"))
         print("[*] Got:", resp)
         if resp != SYNCHRONIZED:
             return False
@@ -94,8 +95,10 @@ class FlashDumper:
                     print(f"[!] Fail at {hex(addr)}: {resp}")
                     continue
 
-                data = b"begin 666 <x>\n" + resp[1] + b" \n \nend\n"
-                raw = decode(data, "uu")
+                raw = uudecode([resp[1]])
+                if raw is None:
+                    print(f"[!] Fail at {hex(addr)}: bad uuencoded data {resp[1]}")
+                    continue
                 print(f"[{hex(addr)}] {hexlify(raw).decode()}")
                 f.write(raw)
 
@@ -0,0 +1,17 @@
+"""
+  iCE, iCE Baby Glitcher
+
+  Host side of the iCEstick voltage glitcher: one FPGA transport, one
+  glitch parameter sweep and protocol plugins for the supported targets
+"""
+
+__version__ = '0.5'
+__author__ = 'Matthias Deeg'
+
+from .timing import Timeouts
+from .uart import BufferedReader
+from .fpga import FPGA
+from .protocols import PROTOCOLS, LPC, STM8
+from .sweep import Glitcher
+
+__all__ = ["BufferedReader", "Timeouts", "FPGA", "PROTOCOLS", "LPC", "STM8", "Glitcher"]
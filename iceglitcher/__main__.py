@@ -0,0 +1,9 @@
+"""
+  iCE, iCE Baby Glitcher - python -m iceglitcher
+"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+  iCE, iCE Baby Glitcher - asyncio transport
+
+  The protocol plugins are coroutines that await every UART read. With
+  the synchronous transport (SyncReader, used by the command line tool)
+  every read completes before it is awaited and run_sync() drives the
+  coroutine without an event loop. AsyncReader drains the FTDI FIFO in
+  a reader task backed by an executor thread and wakes the waiting read
+  with a future, so a sweep in an event loop can do host work (logging,
+  result storage) while bytes are on the wire.
+"""
+
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+
+from .uart import CRLF, READ_CHUNK_SIZE, READ_TIMEOUT
+
+# seconds a poll of the executor thread waits for data before it returns
+POLL_TIME = 0.005
+
+# pause between two empty reads of the FTDI FIFO in the executor thread
+IDLE_TIME = 0.0001
+
+
+class Ready():
+    """Awaitable with an already known result"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __await__(self):
+        return self.value
+        yield
+
+
+def run_sync(coro):
+    """Run a coroutine that never suspends and return its result"""
+
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    coro.close()
+    raise RuntimeError("coroutine suspended outside of an event loop (asynchronous transport?)")
+
+
+class SyncReader():
+    """Awaitable reads of a BufferedReader that complete immediately"""
+
+    def __init__(self, reader):
+        """Initialize the reader on top of a BufferedReader"""
+
+        self.reader = reader
+
+    def read_until(self, terminator=CRLF, deadline=None):
+        """Read data including the terminator, None on timeout"""
+
+        return Ready(self.reader.read_until(terminator, deadline))
+
+    def read_exact(self, n, deadline=None):
+        """Read exactly n bytes, None on timeout"""
+
+        return Ready(self.reader.read_exact(n, deadline))
+
+    def skip(self, n):
+        """Drop up to n bytes that are already available without waiting"""
+
+        self.reader.skip(n)
+
+    def flush(self):
+        """Discard buffered data and the content of the FTDI input FIFO"""
+
+        self.reader.flush()
+
+
+class AsyncReader():
+    """Reader task on top of a pylibftdi Device for use in an event loop
+
+    Reads have the same semantics as the ones of BufferedReader. Use it
+    as asynchronous context manager to run the reader task.
+    """
+
+    def __init__(self, dev, chunk_size=READ_CHUNK_SIZE, timeout=READ_TIMEOUT, lock=None):
+        """Initialize the reader, lock guards the device against writes of other threads"""
+
+        self.dev = dev
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.buf = bytearray()
+
+        # future of the read waiting for data
+        self.waiter = None
+
+        # data read before a flush is dropped, the lock orders reads, flushes
+        # and the writes of the FPGA link
+        self.generation = 0
+        self.lock = lock or threading.Lock()
+
+        self.running = False
+        self.task = None
+        self.loop = None
+        self.executor = None
+
+    async def start(self):
+        """Start the reader task"""
+
+        self.loop = asyncio.get_running_loop()
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="ftdi-reader")
+        self.running = True
+        self.task = self.loop.create_task(self._run())
+
+    async def stop(self):
+        """Stop the reader task"""
+
+        self.running = False
+        await self.task
+        self.executor.shutdown()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+        return False
+
+    def _poll(self):
+        """Wait in the executor thread until the FTDI FIFO holds data or POLL_TIME passed
+
+        Returns the generation of the read and the data.
+        """
+
+        end = monotonic() + POLL_TIME
+        while self.running:
+            with self.lock:
+                generation = self.generation
+                data = self.dev.read(self.chunk_size)
+            if data or monotonic() >= end:
+                return generation, data
+            sleep(IDLE_TIME)
+        return self.generation, b""
+
+    async def _run(self):
+        """Move everything the FTDI FIFO receives into the buffer"""
+
+        while self.running:
+            generation, data = await self.loop.run_in_executor(self.executor, self._poll)
+            if data and generation == self.generation:
+                self.buf += data
+                if self.waiter is not None and not self.waiter.done():
+                    self.waiter.set_result(None)
+
+    async def _wait(self, deadline):
+        """Wait for new data until deadline, False on timeout"""
+
+        timeout = deadline - monotonic()
+        if timeout <= 0:
+            return False
+
+        self.waiter = self.loop.create_future()
+        try:
+            await asyncio.wait_for(self.waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiter = None
+
+    async def read_until(self, terminator=CRLF, deadline=None):
+        """Read data including the terminator, None on timeout (dropping the partial data)"""
+
+        if deadline is None:
+            deadline = monotonic() + self.timeout
+
+        start = 0
+        while True:
+            pos = self.buf.find(terminator, start)
+            if pos >= 0:
+                end = pos + len(terminator)
+                data = bytes(self.buf[:end])
+                del self.buf[:end]
+                return data
+
+            # only search the new part of the buffer next time
+            start = max(0, len(self.buf) - len(terminator) + 1)
+
+            if not await self._wait(deadline):
+                self.buf.clear()
+                return None
+
+    async def read_exact(self, n, deadline=None):
+        """Read exactly n bytes, None on timeout (dropping the partial data)"""
+
+        if deadline is None:
+            deadline = monotonic() + self.timeout
+
+        while len(self.buf) < n:
+            if not await self._wait(deadline):
+                self.buf.clear()
+                return None
+
+        data = bytes(self.buf[:n])
+        del self.buf[:n]
+        return data
+
+    def skip(self, n):
+        """Drop up to n bytes that are already available without waiting"""
+
+        del self.buf[:n]
+
+    def flush(self):
+        """Discard buffered data and the content of the FTDI input FIFO"""
+
+        with self.lock:
+            self.generation += 1
+            self.buf.clear()
+            try:
+                self.dev.flush_input()
+            except Exception:
+                pass
@@ -0,0 +1,247 @@
+"""
+  iCE, iCE Baby Glitcher - host stack benchmark
+
+  Runs the sweep and the memory dump of every protocol against the
+  simulated iCEstick (iceglitcher.sim) and reports glitch attempts per
+  second, per-phase latency percentiles and dump throughput. Results can
+  be written as JSON and compared with a previous run:
+
+    python -m iceglitcher.bench --json before.json
+    python -m iceglitcher.bench --compare before.json
+
+  Without --baudrate, responses arrive instantly and the numbers show
+  the pure host overhead. With --baudrate 115200, the UART wire time of
+  the target responses is included, --latency 1 adds 1 ms USB latency
+  to every response (round trips then dominate). --link_baudrate runs
+  the FPGA command link at a higher baudrate.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+
+from binascii import b2a_uu
+from codecs import decode
+from contextlib import redirect_stdout
+from itertools import islice
+from statistics import quantiles
+from time import perf_counter
+
+from . import __version__
+from .aio import run_sync
+from .fpga import BAUDRATE, FPGA
+from .protocols import PROTOCOLS
+from .sim import simulate
+from .sweep import Glitcher, PHASES
+from .timing import Timeouts
+from .uucode import uudecode
+
+# glitch parameters of the benchmarked sweep
+START_OFFSET = 100
+END_OFFSET = 10000
+START_DURATION = 1
+END_DURATION = 30
+RETRIES = 2
+
+
+def percentiles(samples):
+    """Return p50, p95 and p99 of samples in milliseconds"""
+
+    if len(samples) < 2:
+        samples = samples * 2 or [0.0, 0.0]
+    q = quantiles(samples, n=100, method="inclusive")
+    return {"p50": q[49] * 1000, "p95": q[94] * 1000, "p99": q[98] * 1000}
+
+
+def bench_sweep(protocol_name, attempts, baudrate=None, seed=0, latency=0.0, link_baudrate=BAUDRATE):
+    """Benchmark glitch attempts against a target that is never glitched"""
+
+    protocol_class = PROTOCOLS[protocol_name]
+    fpga = FPGA(simulate(protocol_name, protocol_class.flash_size, seed=seed, baudrate=baudrate, latency=latency))
+    if not fpga.set_baudrate(link_baudrate):
+        raise RuntimeError("could not switch the simulated link to {} baud".format(link_baudrate))
+    glitcher = Glitcher(fpga, protocol_class(fpga, Timeouts()), start_offset=START_OFFSET,
+            end_offset=END_OFFSET, start_duration=START_DURATION, end_duration=END_DURATION,
+            retries=RETRIES)
+
+    samples = {phase: [] for phase in PHASES}
+    outcomes = {}
+
+    # same parameter order as Glitcher.run()
+    params = islice(glitcher.search, attempts)
+
+    start = perf_counter()
+    for offset, duration in params:
+        outcome, resp = glitcher.attempt(offset, duration)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        for phase, t in glitcher.timings.items():
+            samples[phase].append(t)
+    elapsed = perf_counter() - start
+
+    return {
+        "attempts": attempts,
+        "seconds": elapsed,
+        "attempts_per_s": attempts / elapsed,
+        "outcomes": outcomes,
+        "usb_writes": fpga.dev.writes,
+        "usb_reads": fpga.dev.reads,
+        "saved_writes": fpga.saved_writes,
+        "phases_ms": {phase: percentiles(s) for phase, s in samples.items() if s},
+    }
+
+
+def bench_dump(protocol_name, flash_size=None, baudrate=None, seed=0, latency=0.0, link_baudrate=BAUDRATE):
+    """Benchmark a memory dump of an unprotected target"""
+
+    protocol_class = PROTOCOLS[protocol_name]
+    flash_size = flash_size or protocol_class.flash_size
+    dev = simulate(protocol_name, flash_size, seed=seed, locked=False, baudrate=baudrate, latency=latency)
+    fpga = FPGA(dev)
+    if not fpga.set_baudrate(link_baudrate):
+        raise RuntimeError("could not switch the simulated link to {} baud".format(link_baudrate))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dump_file = os.path.join(tmp, "memory.bin")
+        protocol = protocol_class(fpga, Timeouts(), flash_size=flash_size, dump_file=dump_file)
+
+        fpga.reset_target()
+        if not run_sync(protocol.synchronize()):
+            raise RuntimeError("could not synchronize with simulated {} target".format(protocol_name))
+
+        start = perf_counter()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            run_sync(protocol.dump_memory())
+        elapsed = perf_counter() - start
+
+        with open(dump_file, "rb") as f:
+            verified = f.read() == dev.target.memory
+
+    return {
+        "bytes": flash_size,
+        "seconds": elapsed,
+        "kb_per_s": flash_size / 1024 / elapsed,
+        "verified": verified,
+        "usb_writes": dev.writes,
+    }
+
+
+def bench_uudecode(groups=2000, seed=0):
+    """Benchmark the ISP uudecoding against the former codecs based decoding"""
+
+    rng = random.Random(seed)
+    data = rng.randbytes(900 * groups)
+    lines = [b2a_uu(data[i:i + 45]).rstrip(b"\n") for i in range(0, len(data), 45)]
+
+    def codecs_decode(lines):
+        return decode(b"begin 666 <data>\n" + b"\n".join(lines) + b"\n \nend\n", "uu")
+
+    results = {"bytes": len(data)}
+    for name, decoder, size in (("codecs_line", codecs_decode, 1), ("codecs_group", codecs_decode, 20),
+            ("binascii_line", uudecode, 1), ("binascii_group", uudecode, 20)):
+        start = perf_counter()
+        out = b"".join(decoder(lines[i:i + size]) for i in range(0, len(lines), size))
+        elapsed = perf_counter() - start
+        if out != data:
+            raise RuntimeError("{} decoded wrong data".format(name))
+        results[name] = {"mb_per_s": len(data) / 1e6 / elapsed}
+    return results
+
+
+def run_benchmarks(protocols, attempts, baudrate=None, flash_size=None, dump=True, latency=0.0,
+        link_baudrate=BAUDRATE):
+    """Run all benchmarks and return the results as dictionary"""
+
+    results = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "config": {"attempts": attempts, "baudrate": baudrate, "flash_size": flash_size, "latency": latency,
+                "link_baudrate": link_baudrate},
+        "protocols": {},
+    }
+    for name in protocols:
+        result = {"sweep": bench_sweep(name, attempts, baudrate, latency=latency, link_baudrate=link_baudrate)}
+        if dump:
+            result["dump"] = bench_dump(name, flash_size, baudrate, latency=latency, link_baudrate=link_baudrate)
+        results["protocols"][name] = result
+    results["uudecode"] = bench_uudecode()
+    return results
+
+
+def show(results, baseline=None):
+    """Print benchmark results, compared with a baseline if given"""
+
+    def change(path, value):
+        node = baseline
+        for key in path:
+            if not isinstance(node, dict) or key not in node:
+                return ""
+            node = node[key]
+        if not node:
+            return ""
+        return " ({:+.1f}%)".format((value / node - 1) * 100)
+
+    for name, result in results["protocols"].items():
+        sweep = result["sweep"]
+        print("[*] {}: {:.1f} attempts/s{}, {} USB writes for {} attempts".format(name,
+                sweep["attempts_per_s"], change(("protocols", name, "sweep", "attempts_per_s"), sweep["attempts_per_s"]),
+                sweep["usb_writes"], sweep["attempts"]))
+        for phase, p in sweep["phases_ms"].items():
+            print("    {:<6} p50 {:8.3f} ms   p95 {:8.3f} ms   p99 {:8.3f} ms".format(
+                    phase, p["p50"], p["p95"], p["p99"]))
+        if "dump" in result:
+            dump = result["dump"]
+            print("    dump   {} bytes in {:.3f} s = {:.1f} KB/s{}{}".format(dump["bytes"], dump["seconds"],
+                    dump["kb_per_s"], change(("protocols", name, "dump", "kb_per_s"), dump["kb_per_s"]),
+                    "" if dump["verified"] else " (DUMP MISMATCH)"))
+
+    if "uudecode" in results:
+        print("[*] uudecode of {} bytes:".format(results["uudecode"]["bytes"]))
+        for name, r in results["uudecode"].items():
+            if isinstance(r, dict):
+                print("    {:<15} {:8.1f} MB/s{}".format(name, r["mb_per_s"],
+                        change(("uudecode", name, "mb_per_s"), r["mb_per_s"])))
+
+
+def main(argv=None):
+    """Command line entry point"""
+
+    parser = argparse.ArgumentParser("python -m iceglitcher.bench")
+    parser.add_argument('--protocol', choices=sorted(PROTOCOLS), action='append',
+            help='protocol to benchmark (default is all)')
+    parser.add_argument('--attempts', type=int, default=2000, help='glitch attempts per protocol (default is 2000)')
+    parser.add_argument('--baudrate', type=int, default=None, help='simulate UART wire time at this baudrate')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulate USB latency in ms (default is 0)')
+    parser.add_argument('--link_baudrate', type=int, default=BAUDRATE,
+            help='baudrate of the FPGA command link (default is {})'.format(BAUDRATE))
+    parser.add_argument('--flash_size', type=lambda x: int(x, 0), default=None, help='dumped flash size (default depends on protocol)')
+    parser.add_argument('--no_dump', action='store_true', help='skip the dump benchmark')
+    parser.add_argument('--json', metavar='FILE', help='write results as JSON to FILE ("-" for stdout)')
+    parser.add_argument('--compare', metavar='FILE', help='compare with results of a previous --json run')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(args.protocol or sorted(PROTOCOLS), args.attempts,
+            args.baudrate, args.flash_size, not args.no_dump, args.latency / 1000, args.link_baudrate)
+
+    if args.json == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        show(results, baseline)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+  iCE, iCE Baby Glitcher - sweep checkpoints
+
+  The glitcher periodically saves its configuration and search progress
+  as JSON, so an interrupted or crashed sweep can be resumed with
+  --resume instead of starting over at the first offset.
+"""
+
+import json
+import os
+from time import monotonic
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+# seconds between checkpoints
+CHECKPOINT_INTERVAL = 10.0
+
+
+class Checkpoint():
+    """Sweep checkpoint file"""
+
+    def __init__(self, path=CHECKPOINT_FILE, interval=CHECKPOINT_INTERVAL):
+        """Initialize the checkpoint"""
+
+        self.path = path
+        self.interval = interval
+        self.last_save = monotonic()
+
+    def due(self):
+        """Return True if the next checkpoint should be saved"""
+
+        return monotonic() - self.last_save >= self.interval
+
+    def save(self, state):
+        """Atomically replace the checkpoint with the given state"""
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.last_save = monotonic()
+
+    def load(self):
+        """Return the saved state, None if there is no checkpoint"""
+
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def clear(self):
+        """Remove the checkpoint of a completed sweep"""
+
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,380 @@
+"""
+  iCE, iCE Baby Glitcher - command line interface
+
+  by Matthias Deeg (@matthiasdeeg, matthias.deeg@syss.de)
+
+  Command tool for a simple FPGA-based voltage glitcher using a
+  Lattice Semiconductor iCEstick Evaluation Kit or an iCEBreaker FPGA
+
+  This glitcher is based on and inspired by glitcher implementations
+  by Dmitry Nedospasov (@nedos) from Toothless Consulting and
+  Grazfather (@Grazfather)
+
+  References:
+    http://www.latticesemi.com/icestick
+    https://www.crowdsupply.com/1bitsquared/icebreaker-fpga
+    https://github.com/toothlessco/arty-glitcher
+    https://toothless.co/blog/bootloader-bypass-part1/
+    https://toothless.co/blog/bootloader-bypass-part2/
+    https://toothless.co/blog/bootloader-bypass-part3/
+    https://github.com/Grazfather/glitcher
+    http://grazfather.github.io/re/pwn/electronics/fpga/2019/12/08/Glitcher.html
+
+  Copyright 2020, Matthias Deeg, SySS GmbH
+
+  Redistribution and use in source and binary forms, with or without
+  modification, are permitted provided that the following conditions are met:
+
+  1. Redistributions of source code must retain the above copyright notice,
+     this list of conditions and the following disclaimer.
+
+  2. Redistributions in binary form must reproduce the above copyright notice,
+     this list of conditions and the following disclaimer in the documentation
+     and/or other materials provided with the distribution.
+
+  3. Neither the name of the copyright holder nor the names of its contributors
+     may be used to endorse or promote products derived from this software
+     without specific prior written permission.
+
+  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+  POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import argparse
+import asyncio
+
+from sty import fg
+
+from . import __version__
+from .fpga import (BAUDRATE, DEFAULT_RESET_WIDTH, FPGA, MAX_SWEEP_RETRIES, MAX_TRIGGER_PATTERN, TRIGGER_RX,
+        TRIGGER_SOURCES, baudrate_divisor, list_serials)
+from .protocols import PROTOCOLS
+from .rigs import CHUNK_SIZE
+from .protocols.base import DUMP_FILE
+from .search import Adaptive, Raster, SEARCHES
+from .checkpoint import Checkpoint, CHECKPOINT_FILE, CHECKPOINT_INTERVAL
+from .engine import CONFIRM_ATTEMPTS, RESPONSE_TIMEOUT, HardwareSweep
+from .store import ResultStore, STORE_FILE
+from .sim import parse_hit, simulate
+from .sweep import Glitcher, FILL_ATTEMPTS, RESET_GLITCH, RESET_MODES, RESET_PIN, RESULTS_FILE
+from .timing import Timeouts, add_timeout_arguments
+
+
+def banner():
+    """Show a fancy banner"""
+
+    print(fg.li_white + "\n" +
+""" ██▓ ▄████▄  ▓█████     ██▓ ▄████▄  ▓█████     ▄▄▄▄    ▄▄▄       ▄▄▄▄ ▓██   ██▓     ▄████  ██▓     ██▓▄▄▄█████▓ ▄████▄   ██░ ██ ▓█████  ██▀███  \n"""
+"""▓██▒▒██▀ ▀█  ▓█   ▀    ▓██▒▒██▀ ▀█  ▓█   ▀    ▓█████▄ ▒████▄    ▓█████▄▒██  ██▒    ██▒ ▀█▒▓██▒    ▓██▒▓  ██▒ ▓▒▒██▀ ▀█  ▓██░ ██▒▓█   ▀ ▓██ ▒ ██▒\n"""
+"""▒██▒▒▓█    ▄ ▒███      ▒██▒▒▓█    ▄ ▒███      ▒██▒ ▄██▒██  ▀█▄  ▒██▒ ▄██▒██ ██░   ▒██░▄▄▄░▒██░    ▒██▒▒ ▓██░ ▒░▒▓█    ▄ ▒██▀▀██░▒███   ▓██ ░▄█ ▒\n"""
+"""░██░▒▓▓▄ ▄██▒▒▓█  ▄    ░██░▒▓▓▄ ▄██▒▒▓█  ▄    ▒██░█▀  ░██▄▄▄▄██ ▒██░█▀  ░ ▐██▓░   ░▓█  ██▓▒██░    ░██░░ ▓██▓ ░ ▒▓▓▄ ▄██▒░▓█ ░██ ▒▓█  ▄ ▒██▀▀█▄  \n"""
+"""░██░▒ ▓███▀ ░░▒████▒   ░██░▒ ▓███▀ ░░▒████▒   ░▓█  ▀█▓ ▓█   ▓██▒░▓█  ▀█▓░ ██▒▓░   ░▒▓███▀▒░██████▒░██░  ▒██▒ ░ ▒ ▓███▀ ░░▓█▒░██▓░▒████▒░██▓ ▒██▒\n"""
+"""░▓  ░ ░▒ ▒  ░░░ ▒░ ░   ░▓  ░ ░▒ ▒  ░░░ ▒░ ░   ░▒▓███▀▒ ▒▒   ▓▒█░░▒▓███▀▒ ██▒▒▒     ░▒   ▒ ░ ▒░▓  ░░▓    ▒ ░░   ░ ░▒ ▒  ░ ▒ ░░▒░▒░░ ▒░ ░░ ▒▓ ░▒▓░\n"""
+""" ▒ ░  ░  ▒    ░ ░  ░    ▒ ░  ░  ▒    ░ ░  ░   ▒░▒   ░   ▒   ▒▒ ░▒░▒   ░▓██ ░▒░      ░   ░ ░ ░ ▒  ░ ▒ ░    ░      ░  ▒    ▒ ░▒░ ░ ░ ░  ░  ░▒ ░ ▒░\n"""
+""" ▒ ░░           ░       ▒ ░░           ░       ░    ░   ░   ▒    ░    ░▒ ▒ ░░     ░ ░   ░   ░ ░    ▒ ░  ░      ░         ░  ░░ ░   ░     ░░   ░ \n"""
+""" ░  ░ ░         ░  ░    ░  ░ ░         ░  ░    ░            ░  ░ ░     ░ ░              ░     ░  ░ ░           ░ ░       ░  ░  ░   ░  ░   ░     \n"""
+"""    ░                      ░                        ░                 ░░ ░                                     ░                                \n"""
+"""iCE iCE Baby Glitcher v{0} by Matthias Deeg - SySS GmbH\n""".format(__version__) + fg.white +
+"""A very simple voltage glitcher implementation for the Lattice iCEstick Evaluation Kit\n"""
+"""Based on and inspired by voltage glitcher implementations by Dmitry Nedospasov (@nedos)\n"""
+"""and Grazfather (@Grazfather)\n---""" + fg.rs)
+
+def auto_int(x):
+    """Parse decimal or 0x prefixed integers"""
+
+    return int(x, 0)
+
+
+def trigger_pattern(x):
+    """Parse a trigger pattern with Python escape sequences, e.g. 'R ' or '\\x79'"""
+
+    pattern = x.encode("latin-1").decode("unicode_escape").encode("latin-1")
+    if not 0 < len(pattern) <= MAX_TRIGGER_PATTERN:
+        raise argparse.ArgumentTypeError("trigger pattern needs 1 to {} bytes".format(MAX_TRIGGER_PATTERN))
+    return pattern
+
+
+def link_baudrate(text):
+    """Parse a baudrate of the FPGA command link"""
+
+    baudrate = int(text, 0)
+    try:
+        baudrate_divisor(baudrate)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return baudrate
+
+
+def build_parser(prog="iceglitcher"):
+    """Create the command line parser"""
+
+    parser = argparse.ArgumentParser(prog)
+    parser.add_argument('--protocol', choices=sorted(PROTOCOLS), default='lpc', help='target bootloader protocol (default is lpc)')
+    parser.add_argument('--start_offset', type=int, default=100, help='start offset for glitch (default is 100)')
+    parser.add_argument('--end_offset', type=int, default=10000, help='end offset for glitch (default is 10000)')
+    parser.add_argument('--start_duration', type=int, default=1, help='start duration for glitch (default is 1)')
+    parser.add_argument('--end_duration', type=int, default=30, help='end duration for glitch (default is 30)')
+    parser.add_argument('--offset_step', type=int, default=1, help='offset step (default is 1)')
+    parser.add_argument('--duration_step', type=int,default=1, help='duration step (default is 1)')
+    parser.add_argument('--retries', type=int,default=2, help='number of retries per configuration (default is 2)')
+    parser.add_argument('--reset_mode', choices=RESET_MODES, default=RESET_PIN, help='how to reset the target (default is pin)')
+    parser.add_argument('--reset_width', type=auto_int, default=None,
+            help='reset pulse width in FPGA clock cycles (default is {})'.format(DEFAULT_RESET_WIDTH))
+    parser.add_argument('--calibrate_reset', action='store_true',
+            help='find the shortest reset pulse that reliably reboots the target before glitching')
+    parser.add_argument('--trigger', type=trigger_pattern, default=None, metavar='PATTERN',
+            help='count the glitch offset from this UART byte pattern (escapes like \\x79 allowed) instead of from the reset')
+    parser.add_argument('--trigger_source', choices=TRIGGER_SOURCES, default=TRIGGER_RX,
+            help='UART line watched for the trigger pattern, rx from or tx to the target (default is rx)')
+    parser.add_argument('--flash_size', type=auto_int, default=None, help='flash size in bytes, e.g. 0x8000 (default depends on protocol)')
+    parser.add_argument('--dump_file', default=DUMP_FILE, help='file for the flash dump (default is {})'.format(DUMP_FILE))
+    parser.add_argument('--results_file', default=RESULTS_FILE, help='file for successful glitch parameters (default is {})'.format(RESULTS_FILE))
+
+    # order in which glitch parameters are tried
+    parser.add_argument('--search', choices=sorted(SEARCHES), default=Raster.name,
+            help='glitch parameter search strategy (default is raster)')
+    parser.add_argument('--coarse_step', type=int, default=8, help='initial grid stride of the adaptive search (default is 8)')
+    parser.add_argument('--explore', type=float, default=0.2,
+            help='share of adaptive attempts that continue the grid instead of refining hotspots (default is 0.2)')
+    parser.add_argument('--seed', type=int, default=None, help='random seed of the adaptive search')
+    parser.add_argument('--store', default=STORE_FILE, metavar='FILE',
+            help='SQLite database recording all attempts, empty to disable (default is {})'.format(STORE_FILE))
+    parser.add_argument('--learn', action='store_true', help='let the search learn from the attempts in the store')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE, metavar='FILE',
+            help='file for the progress of the sweep, empty to disable (default is {})'.format(CHECKPOINT_FILE))
+    parser.add_argument('--checkpoint_interval', type=float, default=CHECKPOINT_INTERVAL,
+            help='seconds between checkpoints (default is {})'.format(CHECKPOINT_INTERVAL))
+    parser.add_argument('--resume', action='store_true', help='continue the sweep saved in the checkpoint')
+    parser.add_argument('--fill_dump', action='store_true',
+            help='glitch with the last successful parameters and read the blocks missing in the dump file')
+    parser.add_argument('--fill_attempts', type=int, default=FILL_ATTEMPTS,
+            help='glitch attempts for reading missing blocks (default is {})'.format(FILL_ATTEMPTS))
+
+    # sweep on the FPGA (sweep_engine.v)
+    parser.add_argument('--hw_sweep', action='store_true',
+            help='let the FPGA sweep the raster on its own and confirm candidates on the host')
+    parser.add_argument('--hw_hits_only', action='store_true', help='only report attempts that were not rejected')
+    parser.add_argument('--hw_probe_delay', type=auto_int, default=None,
+            help='FPGA clock cycles from the reset to the probe (default is the reset width + 10 ms)')
+    parser.add_argument('--hw_timeout', type=auto_int, default=RESPONSE_TIMEOUT,
+            help='quiet FPGA clock cycles that end a response (default is {})'.format(RESPONSE_TIMEOUT))
+    parser.add_argument('--hw_confirm', type=int, default=CONFIRM_ATTEMPTS,
+            help='host driven attempts to confirm a candidate (default is {})'.format(CONFIRM_ATTEMPTS))
+
+    # USB-UART link to the FPGA (host_link.v)
+    parser.add_argument('--link_baudrate', type=link_baudrate, default=BAUDRATE,
+            help='baudrate of the FPGA command link, e.g. 3000000 (default is {})'.format(BAUDRATE))
+
+    parser.add_argument('--async_io', action='store_true',
+            help='sweep in an asyncio event loop, logging and storing attempts while the target answers')
+
+    # several iCEstick + target rigs
+    parser.add_argument('--serial', action='append', default=[],
+            help='FTDI serial number of the iCEstick to use, repeat for several rigs (default is the first one)')
+    parser.add_argument('--all_rigs', action='store_true', help='use all connected iCEsticks')
+    parser.add_argument('--chunk_size', type=int, default=CHUNK_SIZE,
+            help='offsets per work unit shared between rigs (default is {})'.format(CHUNK_SIZE))
+
+    # per-phase UART timeouts
+    add_timeout_arguments(parser)
+
+    # offline simulation without iCEstick and target
+    parser.add_argument('--simulate', action='store_true', help='use a simulated iCEstick and target instead of the hardware')
+    parser.add_argument('--sim_glitch', type=parse_hit, action='append', default=[], metavar='OFFSET,DURATION[,P]',
+            help='successful glitch parameters of the simulated target with probability P (default is 1.0)')
+    parser.add_argument('--sim_seed', type=int, default=None, help='random seed of the simulation')
+    parser.add_argument('--sim_rigs', type=int, default=1, help='number of simulated rigs (default is 1)')
+    parser.add_argument('--sim_min_reset_width', type=auto_int, default=0,
+            help='shortest reset pulse in FPGA clock cycles that reboots the simulated target (default is 0)')
+    parser.add_argument('--sim_max_link_baudrate', type=int, default=None,
+            help='highest working baudrate of the simulated FPGA command link (default is no limit)')
+    parser.add_argument('--sim_max_target_baudrate', type=int, default=None,
+            help='highest working baudrate of the simulated target UART (default is no limit)')
+
+    # protocol specific options
+    for protocol in PROTOCOLS.values():
+        protocol.add_arguments(parser)
+
+    return parser
+
+
+def open_fpga(args, serial=None, sim_seed=None):
+    """Open the iCEstick with the given serial number, or its simulation"""
+
+    if args.simulate:
+        protocol_class = PROTOCOLS[args.protocol]
+        flash_size = args.flash_size or protocol_class.flash_size
+        fpga = FPGA(simulate(args.protocol, flash_size, dict(args.sim_glitch), sim_seed,
+                min_reset_width=args.sim_min_reset_width, max_link_baudrate=args.sim_max_link_baudrate,
+                max_target_baudrate=args.sim_max_target_baudrate))
+    else:
+        fpga = FPGA(serial=serial)
+
+    # switch the command link in lockstep with the FPGA
+    if args.link_baudrate != fpga.baudrate:
+        if fpga.set_baudrate(args.link_baudrate):
+            print(fg.li_white + "[*] FPGA command link at {} baud".format(args.link_baudrate) + fg.rs)
+        else:
+            print(fg.li_red + "[-] FPGA command link stays at {} baud, {} baud failed".format(
+                    fpga.baudrate, args.link_baudrate) + fg.rs)
+    return fpga
+
+
+def close_fpga(fpga):
+    """Switch the command link back to the default baudrate for the next session"""
+
+    if fpga is not None and fpga.baudrate != BAUDRATE:
+        fpga.set_baudrate(BAUDRATE)
+
+
+def build_glitcher(args, fpga, search, **kwargs):
+    """Create the target protocol and the glitcher for an FPGA link"""
+
+    protocol = PROTOCOLS[args.protocol].from_args(fpga, Timeouts.from_args(args), args)
+    return Glitcher(fpga, protocol,
+            start_offset=args.start_offset,
+            end_offset=args.end_offset,
+            start_duration=args.start_duration,
+            end_duration=args.end_duration,
+            offset_step=args.offset_step,
+            duration_step=args.duration_step,
+            retries=args.retries,
+            reset_mode=args.reset_mode,
+            results_file=args.results_file,
+            fill_attempts=args.fill_attempts,
+            reset_width=args.reset_width,
+            trigger=args.trigger,
+            trigger_source=args.trigger_source,
+            search=search,
+            **kwargs)
+
+
+def calibrate_reset(glitcher):
+    """Calibrate the reset pulse width of a glitcher, return True on success"""
+
+    try:
+        return glitcher.calibrate_reset_width() is not None
+    except ValueError as e:
+        print(fg.li_red + "[-] {}".format(e) + fg.rs)
+        return False
+
+
+def main(argv=None, prog="iceglitcher"):
+    """Command line entry point"""
+
+    # show banner
+    banner()
+
+    # parse command line arguments
+    args = build_parser(prog).parse_args(argv)
+
+    # select the rigs
+    if args.simulate:
+        serials = ["sim{}".format(i) for i in range(args.sim_rigs)]
+    elif args.all_rigs:
+        serials = list_serials()
+    else:
+        serials = args.serial
+
+    if args.hw_sweep and (args.search != Raster.name or args.resume or len(serials) > 1):
+        print(fg.li_red + "[-] The hardware sweep only supports a raster search with one rig without --resume" + fg.rs)
+        return 1
+    if args.hw_sweep and not 0 <= args.retries <= MAX_SWEEP_RETRIES:
+        print(fg.li_red + "[-] The hardware sweep supports at most {} retries".format(MAX_SWEEP_RETRIES) + fg.rs)
+        return 1
+
+    if args.async_io and (args.hw_sweep or args.resume or len(serials) > 1):
+        print(fg.li_red + "[-] The asyncio sweep only supports one rig without --hw_sweep and --resume" + fg.rs)
+        return 1
+
+    # the reader task cannot drop the echo of the power-cycle glitch before it arrives
+    if args.async_io and args.reset_mode == RESET_GLITCH:
+        print(fg.li_red + "[-] The asyncio sweep only supports reset mode '{}'".format(RESET_PIN) + fg.rs)
+        return 1
+    if args.async_io and args.checkpoint not in ("", CHECKPOINT_FILE):
+        print(fg.li_white + "[*] The asyncio sweep does not save checkpoints, ignoring --checkpoint" + fg.rs)
+
+    # an rx trigger pattern may be the command echo of the LPC target
+    if (args.protocol == "lpc" and args.trigger is not None and args.trigger_source == TRIGGER_RX
+            and not args.keep_echo):
+        print(fg.li_white + "[*] Keeping the LPC command echo for the rx trigger" + fg.rs)
+        args.keep_echo = True
+
+    if len(serials) > 1:
+        if args.search != Raster.name or args.resume:
+            print(fg.li_red + "[-] Several rigs only support a raster search without --resume" + fg.rs)
+            return 1
+
+        # one worker process per rig sharing the parameter space
+        from .rigs import run_rigs
+        return 0 if run_rigs(args, serials) else 1
+
+    # create the FPGA link, the search and the glitcher
+    fpga = open_fpga(args, serials[0] if serials else None, args.sim_seed)
+    offsets = range(args.start_offset, args.end_offset, args.offset_step)
+    durations = range(args.start_duration, args.end_duration, args.duration_step)
+    if args.search == Adaptive.name:
+        search = Adaptive(offsets, durations, args.retries, coarse_step=args.coarse_step,
+                explore=args.explore, seed=args.seed)
+    else:
+        search = Raster(offsets, durations, args.retries)
+
+    # record all attempts
+    store = ResultStore(args.store) if args.store else None
+    if store is not None and args.learn:
+        search.learn(store.history(args.protocol))
+
+    # the hardware and the asyncio sweep cannot be resumed from a checkpoint
+    checkpoint = None
+    if args.checkpoint and not args.hw_sweep and not args.async_io:
+        checkpoint = Checkpoint(args.checkpoint, args.checkpoint_interval)
+    glitcher = build_glitcher(args, fpga, search, store=store, checkpoint=checkpoint)
+
+    # run the glitcher with specified start parameters
+    try:
+        if args.calibrate_reset and not calibrate_reset(glitcher):
+            return 1
+
+        if args.fill_dump:
+            params = glitcher.last_success()
+            if params is None:
+                print(fg.li_red + "[-] No successful glitch parameters recorded" + fg.rs)
+                return 1
+            try:
+                return 0 if glitcher.fill_dump(*params) else 1
+            except ValueError as e:
+                print(fg.li_red + "[-] {}".format(e) + fg.rs)
+                return 1
+
+        if args.hw_sweep:
+            try:
+                sweep = HardwareSweep(glitcher, args.hw_hits_only, args.hw_probe_delay, args.hw_timeout,
+                        args.hw_confirm)
+            except ValueError as e:
+                print(fg.li_red + "[-] {}".format(e) + fg.rs)
+                return 1
+            return 0 if sweep.run() else 1
+
+        if args.async_io:
+            return 0 if asyncio.run(glitcher.run_async()) else 1
+
+        if args.resume and glitcher.checkpoint is not None:
+            try:
+                glitcher.resume()
+            except ValueError as e:
+                print(fg.li_red + "[-] {}".format(e) + fg.rs)
+                return 1
+        return 0 if glitcher.run() else 1
+    finally:
+        if store is not None:
+            store.close()
+        close_fpga(fpga)
@@ -0,0 +1,165 @@
+"""
+  iCE, iCE Baby Glitcher - streaming memory dump
+
+  Dumped blocks are written at their final offset into a pre-sized,
+  memory-mapped binary file and appended to the Intel HEX file as soon
+  as they arrive. A completion bitmap (one bit per block, also memory
+  mapped) records which blocks were actually read, so a partial dump
+  survives a disconnect and memory use does not depend on the flash size.
+  An incomplete dump can be resumed to read only the missing blocks.
+"""
+
+import mmap
+import os
+from struct import pack, unpack_from
+
+from .hexfile import IntelHexWriter
+
+# value of erased flash and of blocks that were not read
+FILL_BYTE = b"\xFF"
+
+# bytes written at once when pre-sizing the binary file
+FILL_CHUNK = 64 * 1024
+
+# the bitmap file starts with the block size
+MAP_HEADER = "<I"
+MAP_HEADER_SIZE = 4
+
+
+def _create(path, size, fill, header=b""):
+    """Create a file of size bytes with the given fill byte"""
+
+    with open(path, "wb") as f:
+        f.write(header)
+        chunk = fill * FILL_CHUNK
+        for offset in range(0, size, FILL_CHUNK):
+            f.write(chunk[:size - offset])
+
+
+class DumpFile():
+    """Memory dump written block by block
+
+    Writes <stem>.bin (the given path), <stem>.hex and the completion
+    bitmap <stem>.map. With resume, the blocks of an existing dump are
+    kept; a dump with another size or block size raises ValueError
+    instead of being overwritten.
+    """
+
+    def __init__(self, path, size, block_size, base_addr=0, resume=False):
+        """Create (or reopen) the dump files for size bytes in blocks of block_size"""
+
+        self.path = path
+        self.size = size
+        self.block_size = block_size
+        self.base_addr = base_addr
+        self.blocks = (size + block_size - 1) // block_size
+
+        stem = os.path.splitext(path)[0]
+        self.hex_path = stem + ".hex"
+        self.map_path = stem + ".map"
+
+        map_size = MAP_HEADER_SIZE + (self.blocks + 7) // 8
+        self.resumed = resume and self._check_layout(map_size)
+        if not self.resumed:
+            # binary image, unread blocks keep the value of erased flash
+            _create(path, size, FILL_BYTE)
+
+            # completion bitmap
+            _create(self.map_path, map_size - MAP_HEADER_SIZE, b"\x00", pack(MAP_HEADER, block_size))
+
+        self.bin_file = open(path, "r+b")
+        self.image = mmap.mmap(self.bin_file.fileno(), size)
+        self.map_file = open(self.map_path, "r+b")
+        self.bitmap = mmap.mmap(self.map_file.fileno(), map_size)
+
+        # the Intel HEX file is rewritten from the blocks already read
+        self.hex_file = open(self.hex_path, "w", newline="\n")
+        self.hex = IntelHexWriter(self.hex_file)
+        self.completed = 0
+        for i in range(self.blocks):
+            if self.done(i):
+                addr, n = self.block_range(i)
+                offset = addr - self.base_addr
+                self.hex.write(addr, self.image[offset:offset + n])
+                self.completed += 1
+        self.hex_file.flush()
+
+    def _check_layout(self, map_size):
+        """Return True if there is a dump to resume, raise ValueError if its layout differs"""
+
+        if not os.path.exists(self.map_path):
+            return False
+
+        with open(self.map_path, "rb") as f:
+            header = f.read(MAP_HEADER_SIZE)
+        if len(header) < MAP_HEADER_SIZE:
+            raise ValueError("dump map '{}' is truncated".format(self.map_path))
+        block_size = unpack_from(MAP_HEADER, header)[0]
+        if block_size != self.block_size:
+            raise ValueError("dump '{}' was written in blocks of {} bytes, not {} "
+                    "(keep the block size to resume)".format(self.path, block_size, self.block_size))
+
+        if not os.path.exists(self.path):
+            raise ValueError("dump '{}' is missing, its map '{}' is left".format(self.path, self.map_path))
+        size = os.path.getsize(self.path)
+        if size != self.size or os.path.getsize(self.map_path) != map_size:
+            raise ValueError("dump '{}' has {} bytes, not {} (keep the flash size to resume)".format(
+                    self.path, size, self.size))
+        return True
+
+    def done(self, index):
+        """Return True if the block has been read"""
+
+        return bool(self.bitmap[MAP_HEADER_SIZE + (index >> 3)] & (1 << (index & 7)))
+
+    def missing(self):
+        """Return the indices of all blocks not read yet"""
+
+        return [i for i in range(self.blocks) if not self.done(i)]
+
+    def block_range(self, index):
+        """Return (address, length) of a block"""
+
+        offset = index * self.block_size
+        return self.base_addr + offset, min(self.block_size, self.size - offset)
+
+    def write_block(self, index, data):
+        """Store a block that has been read"""
+
+        addr, n = self.block_range(index)
+        if len(data) != n:
+            raise ValueError("block {} has {} bytes instead of {}".format(index, len(data), n))
+
+        offset = addr - self.base_addr
+        self.image[offset:offset + n] = data
+        if self.done(index):
+            return
+        self.hex.write(addr, data)
+        self.hex_file.flush()
+
+        # mark the block complete only after its data is in place
+        self.bitmap[MAP_HEADER_SIZE + (index >> 3)] |= 1 << (index & 7)
+        self.completed += 1
+
+    @property
+    def complete(self):
+        """True if all blocks have been read"""
+
+        return self.completed == self.blocks
+
+    def close(self):
+        """Finish the Intel HEX file and close all files"""
+
+        self.hex.close()
+        self.hex_file.close()
+        for m, f in ((self.image, self.bin_file), (self.bitmap, self.map_file)):
+            m.flush()
+            m.close()
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,228 @@
+"""
+  iCE, iCE Baby Glitcher - hardware sweep
+
+  sweep_engine.v runs the offset x duration sweep on the FPGA: it resets
+  and glitches the target, sends the probe of the protocol and compares
+  the response with the usual rejection by itself. The host uploads the
+  ranges once and only consumes the outcome records, so the attempt rate
+  does not depend on USB round trips. Attempts with any other response
+  are confirmed with host driven attempts before the flash is dumped.
+"""
+
+from datetime import datetime
+from itertools import product
+from sty import fg
+from struct import unpack
+from time import monotonic
+
+from .fpga import DEFAULT_RESET_WIDTH, FPGA_CLOCK
+from .protocols import REJECTED, UNEXPECTED, NO_SYNC, SUCCESS
+from .sweep import Statistics
+
+# outcome records of sweep_engine.v
+ENGINE_REJECTED = 0
+ENGINE_SILENT = 1
+ENGINE_OTHER = 2
+ENGINE_DONE = 0xFF
+ENGINE_OUTCOMES = {
+    ENGINE_REJECTED: REJECTED,
+    ENGINE_SILENT: NO_SYNC,
+    ENGINE_OTHER: UNEXPECTED,
+}
+
+# FPGA clock cycles from the end of the reset pulse until the probe (10 ms)
+BOOT_CYCLES = 1_000_000
+
+# quiet FPGA clock cycles that end a response (2 ms)
+RESPONSE_TIMEOUT = 200_000
+
+# host driven attempts to confirm a candidate
+CONFIRM_ATTEMPTS = 5
+
+# seconds between polls for the next record and for the rest of a record
+POLL_INTERVAL = 0.5
+RECORD_TIMEOUT = 1.0
+
+
+def remaining_segments(segment, done):
+    """Split the rest of a sweep segment after done attempts into segments
+
+    The engine always sweeps all durations and retries of an offset, so
+    the remaining retries of the current duration and the remaining
+    durations of the current offset become segments of their own.
+    """
+
+    offsets, durations, retries = segment
+    row, rest = divmod(done, len(durations) * retries)
+    index, retry = divmod(rest, retries)
+
+    segments = []
+    if row < len(offsets) and rest:
+        offset = offsets[row:row + 1]
+        if retry:
+            segments.append((offset, durations[index:index + 1], retries - retry))
+            index += 1
+        if index < len(durations):
+            segments.append((offset, durations[index:], retries))
+        row += 1
+    if row < len(offsets):
+        segments.append((offsets[row:], durations, retries))
+    return segments
+
+
+class HardwareSweep():
+    """Host side of the hardware sweep engine of a glitcher"""
+
+    def __init__(self, glitcher, hits_only=False, probe_delay=None, timeout=RESPONSE_TIMEOUT,
+            confirm_attempts=CONFIRM_ATTEMPTS):
+        """Initialize the sweep for the raster search of the glitcher
+
+        probe_delay and timeout are given in FPGA clock cycles, the probe
+        delay defaults to the reset pulse plus BOOT_CYCLES. With hits_only,
+        the engine does not report rejected attempts.
+        """
+
+        if glitcher.protocol.engine_probe is None:
+            raise ValueError("protocol '{}' does not support the hardware sweep".format(glitcher.protocol.name))
+        if min(glitcher.search.offsets.step, glitcher.search.durations.step) <= 0:
+            raise ValueError("the hardware sweep needs increasing offsets and durations")
+
+        self.glitcher = glitcher
+        self.fpga = glitcher.fpga
+        self.reader = glitcher.fpga.reader
+        self.hits_only = hits_only
+        if probe_delay is None:
+            probe_delay = (glitcher.reset_width or DEFAULT_RESET_WIDTH) + BOOT_CYCLES
+        self.probe_delay = probe_delay
+        self.timeout = timeout
+        self.confirm_attempts = confirm_attempts
+
+        # attempts reported by the engine in its last done record
+        self.engine_attempts = 0
+
+    def start(self, segment):
+        """Upload the configuration and start the engine on a segment (offsets, durations, retries)"""
+
+        offsets, durations, retries = segment
+        self.reader.flush()
+        with self.fpga.batch() as batch:
+            batch.sweep_setup(offsets, durations, retries, self.probe_delay, self.timeout)
+            batch.sweep_probe(*self.glitcher.protocol.engine_probe)
+            batch.sweep_start(self.hits_only)
+
+    def _read(self, n):
+        """Read the rest of a record"""
+
+        data = self.reader.read_exact(n, monotonic() + RECORD_TIMEOUT)
+        if data is None:
+            raise IOError("incomplete record from the hardware sweep engine")
+        return data
+
+    def records(self, segment):
+        """Yield (offset, duration, outcome) of all reported attempts until the engine is done"""
+
+        offsets, durations, retries = segment
+        attempts = len(offsets) * len(durations) * retries
+
+        # without hits_only, the records come in sweep order
+        params = product(offsets, durations, range(retries))
+
+        # longest time without a record: one attempt, with hits_only all of them
+        attempt_time = (self.probe_delay + self.timeout) / FPGA_CLOCK
+        stall = 2 * attempt_time * (attempts if self.hits_only else 1) + RECORD_TIMEOUT
+
+        last_record = monotonic()
+        while True:
+            head = self.reader.read_exact(1, monotonic() + POLL_INTERVAL)
+            if head is None:
+                if monotonic() - last_record > stall:
+                    raise IOError("no records from the hardware sweep engine")
+                continue
+            last_record = monotonic()
+
+            code = head[0]
+            if code == ENGINE_DONE:
+                self.engine_attempts = unpack("<L", self._read(4))[0]
+                return
+            if code not in ENGINE_OUTCOMES:
+                raise IOError("unknown record 0x{:02x} from the hardware sweep engine".format(code))
+
+            if self.hits_only:
+                offset, duration = unpack("<LL", self._read(8))
+            else:
+                offset, duration, retry = next(params)
+            yield offset, duration, ENGINE_OUTCOMES[code]
+
+    def confirm(self, offset, duration, start_time):
+        """Check a candidate with host driven attempts, dump the flash on success"""
+
+        glitcher = self.glitcher
+        print(fg.li_white + "[*] Confirming ({},{}) with {} attempts".format(
+                offset, duration, self.confirm_attempts) + fg.rs)
+
+        for i in range(self.confirm_attempts):
+            outcome, resp = glitcher.attempt(offset, duration)
+            glitcher.stats.add(outcome)
+            glitcher.record(offset, duration, outcome, resp)
+            if outcome == SUCCESS:
+                glitcher.success(offset, duration, resp, start_time)
+                return True
+        return False
+
+    def run(self):
+        """Sweep on the FPGA until a candidate is confirmed, return True on success"""
+
+        glitcher = self.glitcher
+        search = glitcher.search
+        start_time = datetime.now()
+        glitcher.stats = Statistics()
+        glitcher.timings = {}
+        if glitcher.store is not None:
+            glitcher.store.start_run(glitcher.protocol.name, "hardware sweep")
+
+        print(fg.li_white + "[*] Hardware sweep of {} attempts".format(
+                len(search.offsets) * len(search.durations) * max(1, search.retries)) + fg.rs)
+
+        # candidates that were not confirmed, the engine is not stopped for them again
+        checked = set()
+        segments = [(search.offsets, search.durations, max(1, search.retries))]
+        while segments:
+            segment = segments.pop(0)
+            self.start(segment)
+            candidate = None
+            reported = 0
+            try:
+                for offset, duration, outcome in self.records(segment):
+                    reported += 1
+                    glitcher.stats.add(outcome)
+                    glitcher.record(offset, duration, outcome, None)
+                    if outcome == UNEXPECTED and candidate is None and (offset, duration) not in checked:
+                        # finish the current attempt and report done
+                        candidate = (offset, duration)
+                        self.fpga.sweep_stop()
+            except KeyboardInterrupt:
+                self.fpga.sweep_stop()
+                raise
+            finally:
+                # the engine overwrote the glitch registers
+                self.fpga.invalidate()
+
+            # attempts the engine did not report were rejected
+            if self.hits_only:
+                glitcher.stats.attempts += self.engine_attempts - reported
+                glitcher.stats.outcomes[REJECTED] += self.engine_attempts - reported
+
+            if candidate is None:
+                continue
+
+            checked.add(candidate)
+            if self.confirm(*candidate, start_time):
+                return True
+
+            # continue after the last attempt of the engine
+            segments = remaining_segments(segment, self.engine_attempts) + segments
+
+        if glitcher.store is not None:
+            glitcher.store.flush()
+        glitcher.show_statistics()
+        return False
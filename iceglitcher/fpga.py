@@ -0,0 +1,463 @@
+"""
+  iCE, iCE Baby Glitcher - FPGA transport
+
+  Host side of the command processor in top.v. All commands are sent
+  over the FTDI USB-UART (interface B of the iCEstick), everything the
+  target sends back is relayed unchanged and read via a BufferedReader.
+  The baudrates of the link (host_link.v) and of the target UART can be
+  changed at runtime.
+"""
+
+import threading
+
+from abc import ABC, abstractmethod
+from pylibftdi import Device, Driver, INTERFACE_B
+from struct import pack
+from time import monotonic, sleep
+
+from .uart import BufferedReader
+
+# FPGA commands for iCEstick voltage glitcher
+CMD_PASSTHROUGH     = b"\x00"
+CMD_RESET           = b"\x01"
+CMD_SET_DURATION    = b"\x02"
+CMD_SET_OFFSET      = b"\x03"
+CMD_START_GLITCH    = b"\x04"
+CMD_SET_RESET_WIDTH = b"\x05"
+CMD_SET_TRIGGER     = b"\x06"
+CMD_SWEEP_SETUP     = b"\x07"
+CMD_SWEEP_PROBE     = b"\x08"
+CMD_SWEEP_START     = b"\x09"
+CMD_SWEEP_STOP      = b"\x0a"
+CMD_SET_BAUDRATE    = b"\x0b"
+CMD_PING            = b"\x0c"
+CMD_PASSTHROUGH_LONG = b"\x0d"
+CMD_SET_TARGET_BAUDRATE = b"\x0e"
+
+# answers of the host link to CMD_SET_BAUDRATE and CMD_PING
+BAUDRATE_ACK = b"\x5a"
+PONG = b"\xa5"
+
+# system clock of the FPGA (PLL output) in Hz
+FPGA_CLOCK = 100_000_000
+
+# reset pulse width in FPGA clock cycles after configuration (about 219 ms)
+DEFAULT_RESET_WIDTH = 21_900_000
+
+# UART lines the trigger of uart_trigger.v can watch
+TRIGGER_RX = "rx"           # target -> host (responses, echoes)
+TRIGGER_TX = "tx"           # host -> target (passthrough data)
+TRIGGER_SOURCES = (TRIGGER_RX, TRIGGER_TX)
+
+# longest trigger pattern in bytes
+MAX_TRIGGER_PATTERN = 4
+
+# longest probe and expected response of the hardware sweep engine
+MAX_SWEEP_PROBE = 16
+
+# most retries per parameter pair of the hardware sweep engine (16 bit)
+MAX_SWEEP_RETRIES = 0xFFFF
+
+# default baudrate of the FPGA command link
+BAUDRATE = 115200
+
+# highest baudrate of the FT2232H and largest baudrate error of the FPGA
+MAX_BAUDRATE = 12_000_000
+BAUDRATE_TOLERANCE = 0.02
+
+# seconds the FPGA waits for a ping at a new baudrate before it falls back
+BAUDRATE_CONFIRM_TIME = 0.1
+
+# seconds to wait for the answer of a ping
+PING_TIMEOUT = 0.05
+
+# maximum payload of a single passthrough frame (8 bit length field)
+MAX_PASSTHROUGH = 255
+
+# maximum payload of a long passthrough frame (16 bit length field)
+MAX_PASSTHROUGH_LONG = 0xFFFF
+
+# baudrate of the target UART and size of its transmit FIFO (target_link.v),
+# streamed payloads leave room for unpaced passthrough frames
+TARGET_BAUDRATE = 115200
+TARGET_FIFO_SIZE = 2048
+TARGET_FIFO_HEADROOM = 256
+
+# lowest baudrate of the target UART
+MIN_TARGET_BAUDRATE = 9600
+
+
+class Commands(ABC):
+    """Encoders for the commands of the FPGA command processor
+
+    glitch_ofs, glitch_dur, reset_width and trigger shadow the registers
+    of the same name in top.v (None if unknown). Setting a register to the
+    value it already holds is skipped and counted in saved_writes.
+    """
+
+    glitch_ofs = None
+    glitch_dur = None
+    reset_width = None
+    trigger = None
+    saved_writes = 0
+
+    @abstractmethod
+    def _send(self, data):
+        """Send encoded command bytes"""
+
+    def passthrough(self, data):
+        """Send data to the target via the FPGA passthrough commands
+
+        Up to 255 bytes go in a short frame, longer data in long frames
+        with a 16 bit length.
+        """
+
+        if len(data) <= MAX_PASSTHROUGH:
+            self._send(CMD_PASSTHROUGH + pack("B", len(data)) + data)
+            return
+        for i in range(0, len(data), MAX_PASSTHROUGH_LONG):
+            chunk = data[i:i + MAX_PASSTHROUGH_LONG]
+            self._send(CMD_PASSTHROUGH_LONG + pack("<H", len(chunk)) + chunk)
+
+    def reset_target(self):
+        """Reset target device"""
+
+        # send command
+        self._send(CMD_RESET)
+
+    def set_glitch_duration(self, duration):
+        """Send config command to set glitch duration in FPGA clock cycles"""
+
+        # the FPGA already holds this duration
+        if duration == self.glitch_dur:
+            self.saved_writes += 1
+            return
+
+        # send command
+        self._send(CMD_SET_DURATION + pack("<L", duration))
+        self.glitch_dur = duration
+
+    def set_glitch_offset(self, offset):
+        """Send config command to set glitch offset in FPGA clock cycles"""
+
+        # the FPGA already holds this offset
+        if offset == self.glitch_ofs:
+            self.saved_writes += 1
+            return
+
+        # send command
+        self._send(CMD_SET_OFFSET + pack("<L", offset))
+        self.glitch_ofs = offset
+
+    def start_glitch(self):
+        """Start glitch (actually start the offset counter)"""
+
+        # send command
+        self._send(CMD_START_GLITCH)
+
+    def set_reset_width(self, width):
+        """Send config command to set the reset pulse width in FPGA clock cycles"""
+
+        # the FPGA already holds this width
+        if width == self.reset_width:
+            self.saved_writes += 1
+            return
+
+        # send command
+        self._send(CMD_SET_RESET_WIDTH + pack("<L", width))
+        self.reset_width = width
+
+    def set_trigger(self, pattern=b"", source=TRIGGER_RX):
+        """Send config command to start the offset counter on a UART byte pattern
+
+        With a pattern, START_GLITCH only arms the trigger and the offset
+        counts from the last pattern byte seen on the source line. An
+        empty pattern counts the offset from START_GLITCH again.
+        """
+
+        if len(pattern) > MAX_TRIGGER_PATTERN:
+            raise ValueError("trigger pattern is longer than {} bytes".format(MAX_TRIGGER_PATTERN))
+        if source not in TRIGGER_SOURCES:
+            raise ValueError("unknown trigger source '{}'".format(source))
+
+        # the FPGA already holds this trigger
+        trigger = (bytes(pattern), source)
+        if trigger == self.trigger:
+            self.saved_writes += 1
+            return
+
+        # send command: length and source, pattern right aligned
+        config = len(pattern) | (0x80 if source == TRIGGER_TX else 0)
+        self._send(CMD_SET_TRIGGER + pack("B", config) + bytes(pattern).rjust(MAX_TRIGGER_PATTERN, b"\x00"))
+        self.trigger = trigger
+
+    def sweep_setup(self, offsets, durations, retries, probe_delay, timeout):
+        """Send config command with the ranges of a hardware sweep
+
+        offsets and durations are ranges, probe_delay (from the reset to
+        the probe) and timeout (quiet time ending a response) are given
+        in FPGA clock cycles.
+        """
+
+        # send command
+        self._send(CMD_SWEEP_SETUP + pack("<LLLLLLHLL", offsets.start, offsets.stop, offsets.step,
+                durations.start, durations.stop, durations.step, retries, probe_delay, timeout))
+
+    def sweep_probe(self, probe, expect):
+        """Send config command with the probe of a hardware sweep and the response tail of a rejection"""
+
+        if len(probe) > MAX_SWEEP_PROBE or len(expect) > MAX_SWEEP_PROBE:
+            raise ValueError("probe and expected response are limited to {} bytes".format(MAX_SWEEP_PROBE))
+
+        # send command: probe left aligned, expected response right aligned
+        self._send(CMD_SWEEP_PROBE + pack("B", len(probe)) + bytes(probe).ljust(MAX_SWEEP_PROBE, b"\x00") +
+                pack("B", len(expect)) + bytes(expect).rjust(MAX_SWEEP_PROBE, b"\x00"))
+
+    def sweep_start(self, hits_only=False):
+        """Start the hardware sweep, with hits_only rejected attempts are not reported"""
+
+        # send command
+        self._send(CMD_SWEEP_START + pack("B", 1 if hits_only else 0))
+
+    def sweep_stop(self):
+        """Stop the hardware sweep after the current attempt"""
+
+        # send command
+        self._send(CMD_SWEEP_STOP)
+
+
+class CommandBatch(Commands):
+    """FPGA commands collected in one buffer and sent with a single USB write
+
+    Used as context manager, the batch is sent when the block is left
+    without exception.
+    """
+
+    def __init__(self, fpga):
+        """Initialize an empty batch"""
+
+        self.fpga = fpga
+        self.buf = bytearray()
+
+        # the batch resets the target, which clears the target FIFO
+        self.target_reset = False
+
+        # registers as they will be after this batch was sent
+        self.glitch_ofs = fpga.glitch_ofs
+        self.glitch_dur = fpga.glitch_dur
+        self.reset_width = fpga.reset_width
+        self.trigger = fpga.trigger
+
+    def _send(self, data):
+        """Append encoded command bytes to the batch"""
+
+        self.buf += data
+
+    def reset_target(self):
+        """Reset target device"""
+
+        Commands.reset_target(self)
+        self.target_reset = True
+
+    def extend(self, data, target_reset=False):
+        """Append already encoded command bytes, target_reset tells if they reset the target"""
+
+        self.buf += data
+        self.target_reset |= target_reset
+
+    def send(self):
+        """Send all collected commands in one write"""
+
+        if self.buf:
+            self.fpga._send(bytes(self.buf))
+            self.buf.clear()
+        if self.target_reset:
+            self.fpga.target_free = monotonic()
+            self.target_reset = False
+
+        # the FPGA registers now hold the values of this batch
+        self.fpga.glitch_ofs = self.glitch_ofs
+        self.fpga.glitch_dur = self.glitch_dur
+        self.fpga.reset_width = self.reset_width
+        self.fpga.trigger = self.trigger
+        self.fpga.saved_writes += self.saved_writes
+        self.saved_writes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+
+class FPGA(Commands):
+    """USB-UART link to the iCEstick glitcher FPGA"""
+
+    def __init__(self, dev=None, baudrate=BAUDRATE, serial=None):
+        """Initialize the link
+
+        If no device is given, the iCEstick with the given FTDI serial
+        number (or the first one) is opened.
+        """
+
+        # set FTDI device for communication with iCEstick
+        if dev is None:
+            dev = Device(device_id=serial, mode='b', interface_select=INTERFACE_B)
+        self.dev = dev
+
+        # device access of the link and the thread of an AsyncReader
+        self.lock = threading.Lock()
+
+        # set baudrate
+        self.dev.baudrate = baudrate
+        self.baudrate = baudrate
+
+        # buffered reader for target responses
+        self.reader = BufferedReader(self.dev)
+
+        # time when the target FIFO of the FPGA is estimated to be empty
+        self.target_baudrate = TARGET_BAUDRATE
+        self.target_free = 0.0
+
+        # register contents of the FPGA are unknown until first set
+        self.invalidate()
+
+    def invalidate(self):
+        """Forget the shadowed FPGA registers (e.g. after reconfiguration)"""
+
+        self.glitch_ofs = None
+        self.glitch_dur = None
+        self.reset_width = None
+        self.trigger = None
+
+    def _send(self, data):
+        """Send encoded command bytes with one USB write"""
+
+        with self.lock:
+            self.dev.write(data)
+
+    def batch(self):
+        """Return a new command batch for this link"""
+
+        return CommandBatch(self)
+
+    def reset_target(self):
+        """Reset target device, which clears the target FIFO of the FPGA"""
+
+        Commands.reset_target(self)
+        self.target_free = monotonic()
+
+    def passthrough(self, data):
+        """Send data to the target
+
+        Data that fits into one frame goes out right away, the protocols
+        wait for the answer before they send more. Longer data is paced
+        to the target FIFO of the FPGA.
+        """
+
+        if len(data) > TARGET_FIFO_SIZE - TARGET_FIFO_HEADROOM:
+            self.stream((data,))
+            return
+
+        Commands.passthrough(self, data)
+        self.target_free = max(monotonic(), self.target_free) + len(data) * 10.0 / self.target_baudrate
+
+    def stream(self, chunks):
+        """Send a payload of any length to the target
+
+        chunks is an iterable of bytes objects (e.g. a generator reading a
+        file). The payload goes out in passthrough frames no larger than
+        the target FIFO, each one as soon as the FIFO has room for it at
+        the target baudrate.
+        """
+
+        capacity = TARGET_FIFO_SIZE - TARGET_FIFO_HEADROOM
+        byte_time = 10.0 / self.target_baudrate
+        for data in chunks:
+            for i in range(0, len(data), capacity):
+                frame = data[i:i + capacity]
+
+                # wait until the FIFO has room for this frame
+                delay = self.target_free - monotonic() - (capacity - len(frame)) * byte_time
+                if delay > 0:
+                    sleep(delay)
+
+                Commands.passthrough(self, frame)
+                self.target_free = max(monotonic(), self.target_free) + len(frame) * byte_time
+
+    def set_target_baudrate(self, baudrate):
+        """Switch the target UART of the FPGA to another baudrate
+
+        Queued passthrough bytes are sent at the old baudrate first. The
+        FPGA falls back to TARGET_BAUDRATE with every target reset.
+        """
+
+        divisor = baudrate_divisor(baudrate, MIN_TARGET_BAUDRATE)
+        if baudrate == self.target_baudrate:
+            return
+
+        # wait until the target FIFO is empty
+        delay = self.target_free - monotonic()
+        if delay > 0:
+            sleep(delay)
+
+        self._send(CMD_SET_TARGET_BAUDRATE + pack("<L", divisor))
+        self.target_baudrate = baudrate
+
+    def ping(self, timeout=PING_TIMEOUT):
+        """Return True if the FPGA answers a ping at the current baudrate"""
+
+        self.reader.flush()
+        self._send(CMD_PING)
+        return self.reader.read_exact(1, monotonic() + timeout) == PONG
+
+    def set_baudrate(self, baudrate):
+        """Switch the link to another baudrate in lockstep with the FPGA
+
+        The FPGA acknowledges the switch at the old baudrate, a ping at the
+        new one confirms it. Otherwise both sides fall back to the old
+        baudrate and False is returned. The FPGA keeps the baudrate until
+        it is switched back or reconfigured.
+        """
+
+        divisor = baudrate_divisor(baudrate)
+        if baudrate == self.baudrate:
+            return True
+
+        # the acknowledge is sent at the old baudrate
+        self.reader.flush()
+        self._send(CMD_SET_BAUDRATE + pack("<L", divisor))
+        if self.reader.read_exact(1) != BAUDRATE_ACK:
+            return False
+
+        # confirm at the new baudrate
+        old = self.baudrate
+        self.dev.baudrate = baudrate
+        if self.ping():
+            self.baudrate = baudrate
+            return True
+
+        # the FPGA falls back after the confirmation time
+        self.dev.baudrate = old
+        sleep(BAUDRATE_CONFIRM_TIME)
+        if not self.ping():
+            raise IOError("no answer from the FPGA at {} baud".format(old))
+        return False
+
+
+def baudrate_divisor(baudrate, lowest=BAUDRATE):
+    """Return the FPGA clocks per bit of a baudrate (of the host link by default)"""
+
+    if not lowest <= baudrate <= MAX_BAUDRATE:
+        raise ValueError("baudrate must be between {} and {}".format(lowest, MAX_BAUDRATE))
+    divisor = round(FPGA_CLOCK / baudrate)
+    if abs(FPGA_CLOCK / divisor - baudrate) > baudrate * BAUDRATE_TOLERANCE:
+        raise ValueError("baudrate {} is not possible with the FPGA clock".format(baudrate))
+    return divisor
+
+
+def list_serials():
+    """Return the serial numbers of all connected FTDI devices"""
+
+    return [serial for manufacturer, description, serial in Driver().list_devices()]
@@ -0,0 +1,53 @@
+"""
+  iCE, iCE Baby Glitcher - Intel HEX output
+"""
+
+
+def _record(addr16, rtype, data):
+    """Format a single Intel HEX record"""
+
+    b = bytes([len(data), (addr16 >> 8) & 0xFF, addr16 & 0xFF, rtype]) + data
+    cks = (~(sum(b) & 0xFF) + 1) & 0xFF
+    return ":" + "".join(f"{x:02X}" for x in b + bytes([cks])) + "\n"
+
+
+class IntelHexWriter():
+    """Incremental Intel HEX writer, data may be written in any order"""
+
+    def __init__(self, f, rec_len=16):
+        """Initialize the writer for an open text file"""
+
+        self.f = f
+        self.rec_len = rec_len
+        self.ext = 0
+
+    def write(self, addr, data):
+        """Write data records for data at the 32 bit address addr"""
+
+        i = 0
+        n = len(data)
+        while i < n:
+            # extended linear address record on every 64 KiB segment change
+            if (addr >> 16) != self.ext:
+                self.ext = addr >> 16
+                self.f.write(_record(0x0000, 0x04, bytes([(self.ext >> 8) & 0xFF, self.ext & 0xFF])))
+
+            # records must not cross a segment boundary
+            length = min(self.rec_len, n - i, 0x10000 - (addr & 0xFFFF))
+            self.f.write(_record(addr & 0xFFFF, 0x00, bytes(data[i:i + length])))
+            i += length
+            addr += length
+
+    def close(self):
+        """Write the end of file record"""
+
+        self.f.write(":00000001FF\n")
+
+
+def write_intel_hex(bin_bytes, out_path, base_addr=0, rec_len=16):
+    """Write binary data as Intel HEX file"""
+
+    with open(out_path, "w", newline="\n") as f:
+        writer = IntelHexWriter(f, rec_len)
+        writer.write(base_addr, bin_bytes)
+        writer.close()
@@ -0,0 +1,16 @@
+"""
+  iCE, iCE Baby Glitcher - target protocols
+"""
+
+from .base import Protocol, OUTCOMES, SUCCESS, REJECTED, UNEXPECTED, NO_SYNC
+from .lpc import LPC
+from .stm8 import STM8
+
+# available protocols by command line name
+PROTOCOLS = {
+    LPC.name: LPC,
+    STM8.name: STM8,
+}
+
+__all__ = ["Protocol", "LPC", "STM8", "PROTOCOLS",
+        "OUTCOMES", "SUCCESS", "REJECTED", "UNEXPECTED", "NO_SYNC"]
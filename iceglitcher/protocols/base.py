@@ -0,0 +1,114 @@
+"""
+  iCE, iCE Baby Glitcher - target protocol base class
+"""
+
+from abc import ABC, abstractmethod
+from sty import fg
+
+from ..aio import SyncReader
+from ..dump import DumpFile
+from ..timing import Timeouts
+
+# outcome classes of a single glitch attempt
+SUCCESS = "success"         # readout protection bypassed
+REJECTED = "rejected"       # target refused the read as usual (e.g. LPC return code 19)
+UNEXPECTED = "unexpected"   # any other response
+NO_SYNC = "no_sync"         # no bootloader synchronization (target crashed or still booting)
+
+OUTCOMES = (SUCCESS, REJECTED, UNEXPECTED, NO_SYNC)
+
+DUMP_FILE = "memory.bin"
+
+
+class Protocol(ABC):
+    """Bootloader protocol of a glitch target
+
+    Methods talking to the target are coroutines awaiting the reads of
+    self.reader, run them with aio.run_sync() on the synchronous reader.
+    """
+
+    # protocol name used on the command line
+    name = None
+
+    # default flash size in bytes
+    flash_size = 32 * 1024
+
+    # bytes starting the synchronization if they can be sent in the same
+    # USB write as the reset command, None otherwise
+    sync_request = None
+
+    # (probe, response tail of a rejected probe) sent by the hardware sweep
+    # engine after reset, None if the protocol needs a handshake first
+    engine_probe = None
+
+    # False if the last synchronization found the bootloader still
+    # synchronized from before, i.e. the target was not rebooted
+    rebooted = True
+
+    def __init__(self, fpga, timeouts=None, flash_size=None, dump_file=DUMP_FILE):
+        """Initialize the protocol on top of an FPGA link"""
+
+        self.fpga = fpga
+        self.reader = SyncReader(fpga.reader)
+        self.timeouts = timeouts or Timeouts()
+        if flash_size is not None:
+            self.flash_size = flash_size
+        self.dump_file = dump_file
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """Add protocol specific command line options"""
+
+        pass
+
+    @classmethod
+    def from_args(cls, fpga, timeouts, args):
+        """Create the protocol from parsed command line arguments"""
+
+        return cls(fpga, timeouts, flash_size=args.flash_size, dump_file=args.dump_file)
+
+    @abstractmethod
+    async def synchronize(self, triggered=False):
+        """Synchronize with the bootloader after reset, return True on success
+
+        triggered is True if sync_request was already sent together with
+        the reset command.
+        """
+
+    @abstractmethod
+    async def probe(self):
+        """Check whether the readout protection is bypassed
+
+        Returns a tuple (outcome, response) with outcome being one of
+        SUCCESS, REJECTED or UNEXPECTED.
+        """
+
+    def format_response(self, resp):
+        """Format a probe response for the results file"""
+
+        return str(resp)
+
+    @abstractmethod
+    async def dump_memory(self, resume=False):
+        """Dump the complete flash memory of the target
+
+        With resume, only the blocks missing in an existing dump are read.
+        Returns True if the dump is complete.
+        """
+
+    def open_dump(self, block_size, resume=False):
+        """Return a DumpFile for the flash memory in blocks of block_size"""
+
+        dump = DumpFile(self.dump_file, self.flash_size, block_size, resume=resume)
+        if dump.resumed:
+            print(fg.li_white + "[*] Resuming dump '{}', {} of {} blocks missing".format(
+                dump.path, dump.blocks - dump.completed, dump.blocks) + fg.rs)
+        return dump
+
+    def close_dump(self, dump):
+        """Finish the dump files, return True if the dump is complete"""
+
+        dump.close()
+        print(fg.li_white + "[*] Wrote '{}' and '{}' ({} of {} blocks)".format(
+            dump.path, dump.hex_path, dump.completed, dump.blocks) + fg.rs)
+        return dump.complete
@@ -0,0 +1,424 @@
+"""
+  iCE, iCE Baby Glitcher - NXP LPC ISP protocol
+
+  Text based in-system programming protocol of the NXP LPC boot ROM with
+  auto baudrate detection ("?" / "Synchronized") and uuencoded read data.
+
+  After the synchronization the command echo is turned off ("A 0"), so
+  responses arrive without the sent back command unless keep_echo is set.
+  Memory dumps switch the ISP UART to the highest dump baudrate the target
+  accepts ("B") and back to the autobaud rate afterwards.
+"""
+
+from sty import fg
+
+from ..fpga import MIN_TARGET_BAUDRATE, TARGET_BAUDRATE, baudrate_divisor
+from ..uucode import decode_group, line_length
+from .base import Protocol, SUCCESS, REJECTED, UNEXPECTED
+
+# some definitions
+CRLF = b"\r\n"
+SYNCHRONIZED = b"Synchronized"
+OK = b"OK"
+RESEND = b"RESEND"
+READ_FLASH_CHECK = b"R 0 4"
+ECHO_OFF = b"A 0"
+ECHO_ON = b"A 1"
+CRYSTAL_FREQ = 12000
+
+# ISP return codes
+CMD_SUCCESS = b"0"
+CODE_READ_PROTECTION_ENABLED = b"19"
+
+# bytes per read command during memory dumps (20 uuencoded lines of 45 bytes
+# share one checksum, so 900 bytes need a single acknowledgement)
+READ_SIZE = 900
+
+# uuencoded lines between two checksum lines
+LINES_PER_CHECKSUM = 20
+
+# RESEND requests per checksum group before a read fails
+RESEND_RETRIES = 3
+
+# baudrates tried for memory dumps, highest first
+DUMP_BAUDRATES = (460800, 230400)
+
+
+class LPC(Protocol):
+    """NXP LPC ISP bootloader"""
+
+    name = "lpc"
+    flash_size = 48 * 1024
+    sync_request = b"?"
+
+    def __init__(self, fpga, timeouts=None, crystal_freq=CRYSTAL_FREQ, read_size=READ_SIZE,
+            keep_echo=False, dump_baudrate=DUMP_BAUDRATES[0], **kwargs):
+        """Initialize the protocol"""
+
+        super().__init__(fpga, timeouts, **kwargs)
+
+        # crystal frequency in kHz sent during synchronization
+        self.crystal_freq = str(crystal_freq).encode("ascii") + CRLF
+
+        if read_size <= 0 or read_size % 4:
+            raise ValueError("LPC read size must be a positive multiple of 4")
+        self.read_size = read_size
+
+        # highest baudrate tried for memory dumps, 0 keeps the autobaud rate
+        if dump_baudrate:
+            baudrate_divisor(dump_baudrate, MIN_TARGET_BAUDRATE)
+        self.dump_baudrate = dump_baudrate
+
+        # highest baudrate left for the current dump after the target was
+        # lost at a higher one, None until then
+        self.baudrate_limit = None
+
+        # the checksum of the last read still has to be acknowledged with "OK"
+        self.ack_pending = False
+
+        # the target echoes commands after a boot until echo is turned off
+        self.keep_echo = keep_echo
+        self.echo = True
+
+        # unexpected answer to "A 0", reported by the probe
+        self.echo_off_response = None
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """Add LPC specific command line options"""
+
+        parser.add_argument('--crystal_freq', type=int, default=CRYSTAL_FREQ,
+                help='LPC crystal frequency in kHz (default is {})'.format(CRYSTAL_FREQ))
+        parser.add_argument('--read_size', type=int, default=READ_SIZE,
+                help='bytes per LPC read command during dumps, a multiple of 4 (default is {})'.format(READ_SIZE))
+        parser.add_argument('--keep_echo', action='store_true',
+                help='leave the LPC command echo on after the synchronization (for debugging)')
+        parser.add_argument('--dump_baudrate', type=int, default=DUMP_BAUDRATES[0],
+                help='highest LPC baudrate tried for memory dumps, 0 keeps the autobaud rate (default is {})'.format(
+                        DUMP_BAUDRATES[0]))
+
+    @classmethod
+    def from_args(cls, fpga, timeouts, args):
+        """Create the protocol from parsed command line arguments"""
+
+        return cls(fpga, timeouts, crystal_freq=args.crystal_freq, read_size=args.read_size,
+                keep_echo=args.keep_echo, dump_baudrate=args.dump_baudrate, flash_size=args.flash_size, dump_file=args.dump_file)
+
+    async def read_data(self, terminator=CRLF, echo=None, deadline=None):
+        """Read UART data (echo defaults to the echo state of the target)"""
+
+        # if echo is on, read the echo first
+        if echo is None:
+            echo = self.echo
+        if echo:
+            if await self.reader.read_until(b"\r", self.timeouts.deadline("echo")) is None:
+                return None
+
+        if deadline is None:
+            deadline = self.timeouts.deadline("payload")
+
+        data = await self.reader.read_until(terminator, deadline)
+        if data is None:
+            return None
+
+        # return read bytes without terminator
+        return data.replace(terminator, b"")
+
+    async def _wait_for(self, expected, deadline):
+        """Skip response lines until the expected one arrives"""
+
+        while True:
+            resp = await self.read_data(echo=False, deadline=deadline)
+            if resp is None:
+                return False
+            if resp.strip() == expected:
+                return True
+
+    async def synchronize(self, triggered=False):
+        """UART synchronization with auto baudrate detection"""
+
+        # a new boot has no pending read and echoes commands
+        self.ack_pending = False
+        self.echo = True
+        self.echo_off_response = None
+
+        if not triggered:
+            # drop stale data from previous attempts
+            self.reader.flush()
+
+            # use auto baudrate detection
+            self.fpga.passthrough(self.sync_request)
+
+        # receive synchronized message (the whole boot shares the sync deadline)
+        if not await self._wait_for(SYNCHRONIZED, self.timeouts.deadline("sync")):
+            return False
+
+        # respond with "Synchronized", the target echoes it before "OK"
+        self.fpga.passthrough(SYNCHRONIZED + CRLF)
+        if not await self._wait_for(OK, self.timeouts.deadline("retcode")):
+            return False
+
+        # send crystal frequency (in kHz), the target echoes it before "OK";
+        # turning echo off goes out with the same write
+        if self.keep_echo:
+            self.fpga.passthrough(self.crystal_freq)
+            return await self._wait_for(OK, self.timeouts.deadline("retcode"))
+
+        self.fpga.passthrough(self.crystal_freq + ECHO_OFF + b"\x0d")
+        if not await self._wait_for(OK, self.timeouts.deadline("retcode")):
+            return False
+
+        # "A 0" is still echoed, echo stays on if the target refused it
+        resp = await self.read_command_response(0, echo=True)
+        if resp is None:
+            return False
+        if resp[0] == CMD_SUCCESS:
+            self.echo = False
+        else:
+            self.echo_off_response = resp
+        return True
+
+    async def read_command_response(self, response_count, echo=None, terminator=CRLF):
+        """Read command response from target device, None on timeout"""
+
+        result = []
+
+        # if echo is on, read the sent back ISP command before the actual response
+        if echo is None:
+            echo = self.echo
+        if echo:
+            if await self.reader.read_until(b"\r", self.timeouts.deadline("echo")) is None:
+                return None
+
+        # read return code
+        data = await self.reader.read_until(terminator, self.timeouts.deadline("retcode"))
+        if data is None:
+            return None
+
+        # add return code to result
+        return_code = data.replace(CRLF, b"")
+        result.append(return_code)
+
+        # check return code and return immediately if it is not "CMD_SUCCESS"
+        if return_code != CMD_SUCCESS:
+            return result
+
+        # read specified number of responses
+        for i in range(response_count):
+            data = await self.reader.read_until(terminator, self.timeouts.deadline("payload"))
+            if data is None:
+                return None
+
+            # add response to result
+            result.append(data.replace(CRLF, b""))
+
+        return result
+
+    async def send_target_command(self, command, response_count=0, echo=None, terminator=CRLF):
+        """Send command to target device"""
+
+        if echo is None:
+            echo = self.echo
+
+        # acknowledge the checksum of a preceding read with the same USB write
+        ack = self.ack_pending
+        self.ack_pending = False
+        if ack:
+            command = OK + CRLF + command
+
+        # send command
+        self.fpga.passthrough(command + b"\x0d")
+
+        # skip the echo of the acknowledgement
+        if ack and echo:
+            if await self.reader.read_until(CRLF, self.timeouts.deadline("echo")) is None:
+                return None
+
+        # read response
+        return await self.read_command_response(response_count, echo, terminator)
+
+    async def _check_uart(self):
+        """Send a command that changes nothing, True if the target answers it"""
+
+        # drop garbage received during a baudrate switch
+        self.reader.flush()
+        resp = await self.send_target_command(ECHO_ON if self.echo else ECHO_OFF)
+        return resp is not None and resp[0] == CMD_SUCCESS
+
+    async def set_baudrate(self, baudrate):
+        """Switch the ISP UART of target and FPGA to another baudrate
+
+        The target answers "B" at the old baudrate, a command at the new
+        one verifies the switch. If it fails, the FPGA falls back to the
+        old baudrate. Returns True if switched, False if still at the old
+        baudrate and None if the target does not answer at either one.
+        """
+
+        old = self.fpga.target_baudrate
+        resp = await self.send_target_command("B {} 1".format(baudrate).encode("ascii"))
+        if resp is None:
+            return None
+        if resp[0] != CMD_SUCCESS:
+            return False
+
+        self.fpga.set_target_baudrate(baudrate)
+        if await self._check_uart():
+            return True
+
+        self.fpga.set_target_baudrate(old)
+        return False if await self._check_uart() else None
+
+    async def raise_baudrate(self):
+        """Switch to the highest dump baudrate the target accepts
+
+        The host link is raised to the target baudrate if it is slower.
+        Returns True if switched, False if the autobaud rate is kept and
+        None if the target was lost (a lower baudrate is tried until the
+        dump is complete).
+        """
+
+        ceiling = self.dump_baudrate if self.baudrate_limit is None else self.baudrate_limit
+        baudrates = sorted({b for b in DUMP_BAUDRATES + (self.dump_baudrate,)
+                if TARGET_BAUDRATE < b <= ceiling}, reverse=True)
+        for baudrate in baudrates:
+            # target bytes must not arrive faster than the host link sends them
+            if baudrate > self.fpga.baudrate and not self.fpga.set_baudrate(baudrate):
+                continue
+
+            switched = await self.set_baudrate(baudrate)
+            if switched:
+                print(fg.li_white + "[*] Dumping at {} baud".format(baudrate) + fg.rs)
+                return True
+            if switched is None:
+                print(fg.li_red + "[-] No answer from the target after switching to {} baud".format(
+                        baudrate) + fg.rs)
+                self.baudrate_limit = max((b for b in baudrates if b < baudrate), default=0)
+                return None
+        return False
+
+    async def _read_group(self, count):
+        """Read uuencoded lines for count bytes and their checksum line
+
+        Returns the decoded data, None on timeout or checksum mismatch.
+        """
+
+        lines = []
+        size = 0
+        while size < count:
+            line = await self.reader.read_until(CRLF, self.timeouts.deadline("payload"))
+            if line is None:
+                return None
+            lines.append(line[:-2])
+            size += line_length(line)
+
+        checksum = await self.reader.read_until(CRLF, self.timeouts.deadline("payload"))
+        if checksum is None:
+            return None
+
+        data = decode_group(lines, checksum)
+        if data is None or len(data) != count:
+            return None
+        return data
+
+    async def read_memory(self, addr, count, echo=None):
+        """Read count bytes at addr with a single read command, None on failure
+
+        Every group of 20 uuencoded lines is checked against its checksum
+        line and requested again on mismatch. The last checksum is
+        acknowledged together with the next command.
+        """
+
+        if echo is None:
+            echo = self.echo
+
+        resp = await self.send_target_command("R {} {}".format(addr, count).encode("ascii"), 0, echo)
+        if resp is None or resp[0] != CMD_SUCCESS:
+            return None
+
+        group_size = 45 * LINES_PER_CHECKSUM
+        data = bytearray()
+        while len(data) < count:
+            n = min(group_size, count - len(data))
+            for retry in range(RESEND_RETRIES + 1):
+                group = await self._read_group(n)
+                if group is not None:
+                    break
+
+                # drop the rest of the broken group and ask for it again
+                self.reader.flush()
+                self.fpga.passthrough(RESEND + CRLF)
+                if echo and await self.reader.read_until(CRLF, self.timeouts.deadline("echo")) is None:
+                    return None
+            else:
+                return None
+
+            data += group
+            if len(data) < count:
+                # acknowledge the checksum, the target continues with the next group
+                self.fpga.passthrough(OK + CRLF)
+                if echo and await self.reader.read_until(CRLF, self.timeouts.deadline("echo")) is None:
+                    return None
+
+        self.ack_pending = True
+        return bytes(data)
+
+    async def probe(self):
+        """Try to read flash memory, which fails with code 19 under CRP"""
+
+        # a glitch that garbled the answer to "A 0"
+        if self.echo_off_response is not None:
+            return UNEXPECTED, self.echo_off_response
+
+        resp = await self.send_target_command(READ_FLASH_CHECK, 1)
+
+        if resp is None:
+            return UNEXPECTED, resp
+        if resp[0] == CMD_SUCCESS:
+            # skip the checksum line, it is acknowledged with the next command
+            await self.reader.read_until(CRLF, self.timeouts.deadline("payload"))
+            self.ack_pending = True
+            return SUCCESS, resp
+        if resp[0] == CODE_READ_PROTECTION_ENABLED:
+            return REJECTED, resp
+        return UNEXPECTED, resp
+
+    def format_response(self, resp):
+        """Format a probe response for the results file"""
+
+        return ",".join(r.decode("ascii", "replace") for r in resp)
+
+    async def dump_memory(self, resume=False):
+        """Dump the target device memory"""
+
+        dump = self.open_dump(self.read_size, resume)
+        missing = dump.missing()
+
+        # read at a higher baudrate than the autobaud rate of the boot
+        link_baudrate = self.fpga.baudrate
+        raised = bool(missing and self.dump_baudrate) and await self.raise_baudrate()
+        if raised is None:
+            # the blocks are read after the next glitch
+            missing = []
+        try:
+            for i in missing:
+                addr, n = dump.block_range(i)
+                data = await self.read_memory(addr, n)
+                if data is not None:
+                    print(fg.li_blue + bytes.hex(data) + fg.rs)
+                    dump.write_block(i, data)
+                else:
+                    # unread blocks stay 0xFF at their offset
+                    print(fg.li_red + f"[!] Block {i} read failed, left unread" + fg.rs)
+        finally:
+            # back to the autobaud rate (a reset of the target does that as well)
+            if raised:
+                await self.set_baudrate(TARGET_BAUDRATE)
+                self.fpga.set_target_baudrate(TARGET_BAUDRATE)
+            if self.fpga.baudrate != link_baudrate:
+                self.fpga.set_baudrate(link_baudrate)
+
+        complete = self.close_dump(dump)
+        if complete:
+            # the next dump starts at the requested baudrate again
+            self.baudrate_limit = None
+        return complete
@@ -0,0 +1,248 @@
+"""
+  iCE, iCE Baby Glitcher - STM8 bootloader protocol
+
+  Binary UART protocol of the STM8 boot ROM: every command is sent with
+  its complement and acknowledged with ACK (0x79) or NACK (0x1F),
+  addresses are sent big-endian followed by an XOR checksum.
+"""
+
+from sty import fg
+from time import monotonic
+
+from .base import Protocol, SUCCESS, REJECTED, UNEXPECTED
+
+# STM8 bootloader protocol constants
+STM8_BYTE_SYNCH = 0x7F
+STM8_BYTE_ACK   = 0x79
+STM8_BYTE_NACK  = 0x1F
+STM8_CMD_GET    = 0x00
+STM8_CMD_READ   = 0x11
+
+# maximum number of bytes per READ command
+MAX_BLOCK_SIZE = 256
+
+# READ command and its complement
+READ_FRAME = bytes([STM8_CMD_READ, STM8_CMD_READ ^ 0xFF])
+
+# bytes read as success check after synchronization
+PROBE_SIZE = 16
+
+
+class STM8(Protocol):
+    """STM8 UART bootloader"""
+
+    name = "stm8"
+    flash_size = 32 * 1024
+
+    # sync and READ, a protected device NACKs the READ command
+    engine_probe = (bytes([STM8_BYTE_SYNCH]) + READ_FRAME, bytes([STM8_BYTE_ACK, STM8_BYTE_NACK]))
+
+    def __init__(self, fpga, timeouts=None, block_size=MAX_BLOCK_SIZE, pipeline=False, **kwargs):
+        """Initialize the protocol
+
+        With pipeline, the READ command, address and length of a block are
+        sent in one go instead of waiting for the ACK of every frame.
+        """
+
+        super().__init__(fpga, timeouts, **kwargs)
+
+        if not (1 <= block_size <= MAX_BLOCK_SIZE):
+            raise ValueError("block size must be 1..{} bytes".format(MAX_BLOCK_SIZE))
+        self.block_size = block_size
+        self.pipeline = pipeline
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """Add STM8 specific command line options"""
+
+        parser.add_argument('--block_size', type=int, default=MAX_BLOCK_SIZE,
+                help='STM8 read block size 1..256 (default is {})'.format(MAX_BLOCK_SIZE))
+        parser.add_argument('--pipeline', action='store_true',
+                help='send the STM8 READ frames of a block without waiting for each ACK')
+
+    @classmethod
+    def from_args(cls, fpga, timeouts, args):
+        """Create the protocol from parsed command line arguments"""
+
+        return cls(fpga, timeouts, block_size=args.block_size, pipeline=args.pipeline,
+                flash_size=args.flash_size, dump_file=args.dump_file)
+
+    async def _rx_byte(self, phase="retcode", deadline=None):
+        """Read a single byte, None if the deadline (or phase deadline) is missed"""
+
+        b = await self.reader.read_exact(1, deadline or self.timeouts.deadline(phase))
+        if b is None:
+            return None
+        return b[0]
+
+    async def _expect_ack(self, phase="retcode"):
+        """Expect an ACK (0x79)"""
+
+        return await self._rx_byte(phase) == STM8_BYTE_ACK
+
+    @staticmethod
+    def _addr_frame(addr):
+        """Address (big-endian) followed by XOR checksum"""
+
+        a = addr.to_bytes(4, "big")
+        return a + bytes([a[0] ^ a[1] ^ a[2] ^ a[3]])
+
+    @classmethod
+    def _read_frames(cls, addr, n):
+        """READ command, address and length frames of a block"""
+
+        ln = (n - 1) & 0xFF
+        return READ_FRAME, cls._addr_frame(addr), bytes([ln, ln ^ 0xFF])
+
+    async def synchronize(self, triggered=False):
+        """Send 0x7F until the bootloader answers or the sync deadline passes
+
+        The first answer completes the synchronization either way: ACK
+        means the target was rebooted into the bootloader, NACK that the
+        bootloader was already synchronized and rejected the sync bytes as
+        invalid command, i.e. the target was not rebooted. self.rebooted
+        tells the two apart. Silence means the boot ROM is not listening yet.
+        """
+
+        # drop stale data from previous attempts
+        self.reader.flush()
+
+        start = monotonic()
+        deadline = self.timeouts.deadline("sync")
+        sent = 0
+        while monotonic() < deadline:
+            self.fpga.passthrough(bytes([STM8_BYTE_SYNCH]))
+            sent += 1
+
+            # the boot ROM measures the baudrate on the sync byte, bytes sent
+            # before it listens are lost
+            answer = await self._rx_byte(deadline=min(deadline, self.timeouts.deadline("retcode")))
+            if answer in (STM8_BYTE_ACK, STM8_BYTE_NACK):
+                self.rebooted = answer == STM8_BYTE_ACK
+                if sent == 1:
+                    return True
+
+                # a late answer belongs to an earlier sync byte, the later
+                # ones went to the synchronized bootloader
+                return await self._realign(self.timeouts.retcode / 1000.0 + monotonic() - start)
+
+            # no answer while the boot ROM starts up, or noise: try again
+        return False
+
+    async def _realign(self, window):
+        """Get rid of the sync bytes sent after the one the bootloader answered
+
+        The synchronized bootloader takes them as command and complement
+        and NACKs every pair, an odd one waits for its complement. window
+        is the time in seconds to wait for an answer. Returns True once the
+        NACK of a pair completed by an extra sync byte arrived.
+        """
+
+        # answers to the pairs already complete
+        while await self._rx_byte(deadline=monotonic() + window) is not None:
+            pass
+
+        # complete a waiting sync byte, or start a pair and complete it
+        for i in range(2):
+            self.fpga.passthrough(bytes([STM8_BYTE_SYNCH]))
+            if await self._rx_byte(deadline=monotonic() + window) == STM8_BYTE_NACK:
+                return True
+        return False
+
+    async def stm8_read_block(self, addr, n, frames=None):
+        """Read a block of 1..256 bytes, None on failure
+
+        READ(0x11)+~ -> ACK -> Addr4+XOR -> ACK -> (n-1)+~ -> ACK -> Data(n)
+        """
+
+        if not (1 <= n <= MAX_BLOCK_SIZE):
+            raise ValueError("block size must be 1..{} bytes".format(MAX_BLOCK_SIZE))
+        command, address, length = frames or self._read_frames(addr, n)
+
+        # READ command and its complement
+        self.fpga.passthrough(command)
+        if not await self._expect_ack():
+            return None
+        return await self._read_block_data(n, address, length)
+
+    async def _read_block_data(self, n, address, length):
+        """Rest of a READ after its command was acknowledged, None on failure"""
+
+        # address frame
+        self.fpga.passthrough(address)
+        if not await self._expect_ack():
+            return None
+
+        # number of bytes (n-1) and its complement, the ACK and the data
+        # arrive in the same bulk read
+        self.fpga.passthrough(length)
+        if not await self._expect_ack("payload"):
+            return None
+        return await self.reader.read_exact(n, self.timeouts.deadline("payload"))
+
+    async def stm8_read_pipelined(self, n, frames):
+        """Send all READ frames of a block with one USB write, None on failure
+
+        The bootloader has to accept the address and length while it is
+        still sending the ACK of the previous frame.
+        """
+
+        self.fpga.passthrough(b"".join(frames))
+        for i in range(len(frames)):
+            if not await self._expect_ack("payload"):
+                return None
+        return await self.reader.read_exact(n, self.timeouts.deadline("payload"))
+
+    async def probe(self):
+        """Try to read the first bytes of flash memory"""
+
+        command, address, length = self._read_frames(0x00000000, PROBE_SIZE)
+        self.fpga.passthrough(command)
+        answer = await self._rx_byte()
+
+        # a protected device NACKs the READ command, a timeout or any
+        # other byte is not the usual rejection
+        if answer == STM8_BYTE_NACK:
+            return REJECTED, None
+        if answer != STM8_BYTE_ACK:
+            return UNEXPECTED, None if answer is None else bytes([answer])
+
+        probe = await self._read_block_data(PROBE_SIZE, address, length)
+        if probe is not None:
+            return SUCCESS, probe
+        return UNEXPECTED, probe
+
+    def format_response(self, resp):
+        """Format a probe response for the results file"""
+
+        return bytes.hex(resp)
+
+    async def dump_memory(self, resume=False):
+        """Read the complete flash memory"""
+
+        dump = self.open_dump(self.block_size, resume)
+
+        # build all frames up front, the next READ goes out as soon as a block is in
+        blocks = [(i, *dump.block_range(i)) for i in dump.missing()]
+        frames = [self._read_frames(addr, n) for i, addr, n in blocks]
+
+        pipeline = self.pipeline
+        for (i, addr, n), f in zip(blocks, frames):
+            data = None
+            if pipeline:
+                data = await self.stm8_read_pipelined(n, f)
+                if data is None:
+                    # the bootloader cannot keep up, continue in lockstep
+                    print(fg.li_red + "[!] Pipelined read failed, falling back to lockstep reads" + fg.rs)
+                    pipeline = False
+                    self.reader.flush()
+            if data is None:
+                data = await self.stm8_read_block(addr, n, f)
+
+            if data is None:
+                # unread blocks stay 0xFF at their offset
+                print(fg.li_red + f"[!] Block at 0x{addr:08x} read failed, left unread" + fg.rs)
+            else:
+                dump.write_block(i, data)
+
+        return self.close_dump(dump)
@@ -0,0 +1,338 @@
+"""
+  iCE, iCE Baby Glitcher - multi-rig orchestrator
+
+  Runs one worker process per iCEstick + target rig. The workers share
+  the offset x duration space in chunks of offsets: every rig claims the
+  next unswept chunk when it is done with its current one, so fast rigs
+  take over the work of slow ones. The chunk of a rig that dies is handed
+  out again. All attempts are sent to the orchestrator and merged into
+  one result store.
+"""
+
+import multiprocessing
+import os
+import queue
+from copy import copy
+from itertools import product
+from sty import fg
+from time import monotonic, time
+
+from .protocols import SUCCESS
+from .search import Search
+from .store import COMMIT_EVERY, ResultStore
+
+# offsets per work unit
+CHUNK_SIZE = 16
+
+# seconds after which a worker sends its attempts even if the batch is not full
+FLUSH_INTERVAL = 1.0
+
+# seconds a rig without chunk waits for the chunk of a rig that died
+POLL_INTERVAL = 0.1
+
+# messages from the workers
+MSG_ATTEMPTS = "attempts"
+MSG_DONE = "done"
+
+
+class ChunkPool():
+    """Chunks of offsets shared by the rigs
+
+    Chunks are claimed from a shared counter. The chunk a rig sweeps is
+    kept in shared memory, so the orchestrator can hand it out again if
+    the rig dies. A rig without chunk waits for such chunks as long as
+    another rig still holds one.
+    """
+
+    def __init__(self, rigs, chunks):
+        """Initialize the pool of chunks 0..chunks-1 for the given number of rigs"""
+
+        self.chunks = chunks
+        self.next_chunk = multiprocessing.Value("L", 0)
+
+        # chunks of rigs that died, the counter is exact while the queue
+        # delivers them with a delay
+        self.requeued = multiprocessing.Queue()
+        self.waiting = multiprocessing.Value("L", 0)
+
+        # chunk held by every rig (-1 for none), chunks held or requeued
+        self.held = multiprocessing.Array("l", [-1] * rigs)
+        self.active = multiprocessing.Value("L", 0)
+
+    def claim(self, rig, stop):
+        """Release the chunk of the rig and return its next one, None when there is none left"""
+
+        self.release(rig)
+
+        # chunks of rigs that died come first
+        while not stop.is_set():
+            with self.waiting.get_lock():
+                requeued = self.waiting.value > 0
+                if requeued:
+                    self.waiting.value -= 1
+            if requeued:
+                chunk = self.requeued.get()
+                self.held[rig] = chunk
+                return chunk
+
+            with self.next_chunk.get_lock():
+                if self.next_chunk.value < self.chunks:
+                    chunk = self.next_chunk.value
+                    self.next_chunk.value += 1
+                    with self.active.get_lock():
+                        self.active.value += 1
+                    self.held[rig] = chunk
+                    return chunk
+
+            if self.active.value == 0:
+                return None
+            stop.wait(POLL_INTERVAL)
+        return None
+
+    def release(self, rig):
+        """The rig swept its chunk"""
+
+        if self.held[rig] >= 0:
+            self.held[rig] = -1
+            with self.active.get_lock():
+                self.active.value -= 1
+
+    def requeue(self, rig):
+        """Hand out the chunk of a rig that died again, return it (None if it held none)"""
+
+        chunk = self.held[rig]
+        if chunk < 0:
+            return None
+        self.held[rig] = -1
+        with self.waiting.get_lock():
+            self.requeued.put(chunk)
+            self.waiting.value += 1
+        return chunk
+
+
+class SharedRaster(Search):
+    """Raster sweep over chunks of offsets claimed from a pool shared by all rigs"""
+
+    name = "raster"
+
+    def __init__(self, offsets, durations, retries, pool, rig, stop, chunk_size=CHUNK_SIZE):
+        """Initialize the search of rig (its index) with the shared chunk pool and stop event"""
+
+        super().__init__(offsets, durations, retries)
+        self.pool = pool
+        self.rig = rig
+        self.stop = stop
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        while True:
+            chunk = self.pool.claim(self.rig, self.stop)
+            if chunk is None:
+                return
+            offsets = self.offsets[chunk * self.chunk_size:(chunk + 1) * self.chunk_size]
+
+            for offset, duration, i in product(offsets, self.durations, range(self.retries)):
+                # another rig found the glitch
+                if self.stop.is_set():
+                    return
+                self.position += 1
+                yield offset, duration
+
+
+class RigStore():
+    """Result store of a worker, forwards all attempts to the orchestrator
+
+    Attempts are sent in batches of batch_size, or after flush_interval
+    seconds. A success is sent right away and sets stop, so the other rigs
+    stop glitching while this one dumps the flash memory.
+    """
+
+    def __init__(self, serial, results, stop=None, batch_size=COMMIT_EVERY, flush_interval=FLUSH_INTERVAL):
+        """Initialize the store with the result queue of the orchestrator"""
+
+        self.serial = serial
+        self.results = results
+        self.stop = stop
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.last_flush = monotonic()
+        self.run = None
+        self.pending = []
+
+        # (offset, duration) of the last successful attempt of this rig
+        self.success = None
+
+    def start_run(self, protocol=None, description=None, run=None):
+        """Runs are started by the orchestrator"""
+
+        pass
+
+    def record(self, offset, duration, retry, outcome, response=None, timings=None):
+        """Record a glitch attempt, sent with the next batch"""
+
+        self.pending.append((offset, duration, retry, outcome, response, timings, time()))
+        if outcome == SUCCESS:
+            self.success = (offset, duration)
+            self.flush()
+            if self.stop is not None:
+                self.stop.set()
+        elif len(self.pending) >= self.batch_size or monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def last_success(self, protocol=None):
+        """Return (offset, duration) of the last successful attempt of this rig or None"""
+
+        return self.success
+
+    def flush(self):
+        """Send all pending attempts"""
+
+        if self.pending:
+            self.results.put((MSG_ATTEMPTS, self.serial, self.pending))
+            self.pending = []
+        self.last_flush = monotonic()
+
+
+def rig_worker(args, serial, index, pool, stop, results):
+    """Sweep with one rig until the space is exhausted or a rig succeeded
+
+    MSG_DONE is only sent if the sweep ended, the chunk of a rig that fails
+    on the way is handed out again by the orchestrator.
+    """
+
+    # the command line module imports this one
+    from .cli import build_glitcher, calibrate_reset, close_fpga, open_fpga
+
+    success = False
+    done = False
+    fpga = None
+    store = RigStore(serial, results, stop)
+    try:
+        # separate dump file per rig
+        args = copy(args)
+        stem, ext = os.path.splitext(args.dump_file)
+        args.dump_file = "{}-{}{}".format(stem, serial, ext)
+
+        sim_seed = None if args.sim_seed is None else args.sim_seed + index
+        fpga = open_fpga(args, serial, sim_seed)
+        search = SharedRaster(range(args.start_offset, args.end_offset, args.offset_step),
+                range(args.start_duration, args.end_duration, args.duration_step),
+                args.retries, pool, index, stop, args.chunk_size)
+        glitcher = build_glitcher(args, fpga, search, store=store)
+
+        # every rig has its own target and reset circuit
+        if args.calibrate_reset and not calibrate_reset(glitcher):
+            done = True
+            return
+
+        success = glitcher.run()
+        if success:
+            stop.set()
+        done = True
+    finally:
+        store.flush()
+        if done:
+            results.put((MSG_DONE, serial, success))
+        close_fpga(fpga)
+
+
+def run_rigs(args, serials):
+    """Sweep with all given rigs in parallel, return True on success"""
+
+    print(fg.li_white + "[*] Glitching with {} rigs: {}".format(len(serials), ", ".join(serials)) + fg.rs)
+
+    offsets = range(args.start_offset, args.end_offset, args.offset_step)
+    pool = ChunkPool(len(serials), (len(offsets) + args.chunk_size - 1) // args.chunk_size)
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=rig_worker, name=serial,
+            args=(args, serial, index, pool, stop, results))
+            for index, serial in enumerate(serials)]
+
+    for worker in workers:
+        worker.start()
+
+    # merge the results of all rigs
+    attempts = 0
+    winners = []
+    store = None
+
+    # rigs that sent MSG_DONE and rigs that died
+    finished = set()
+    lost = set()
+
+    def receive():
+        """Handle the next message of a worker, return False if there is none"""
+
+        nonlocal attempts
+        try:
+            msg, serial, data = results.get(timeout=0.5)
+        except queue.Empty:
+            return False
+
+        if msg == MSG_ATTEMPTS:
+            attempts += len(data)
+            if store is not None:
+                for offset, duration, retry, outcome, response, timings, when in data:
+                    store.record(offset, duration, retry, outcome, response, timings, when, rig=serial)
+        elif msg == MSG_DONE:
+            finished.add(serial)
+            if data:
+                winners.append(serial)
+        return True
+
+    def requeue_lost():
+        """Hand out the chunk of every rig that exited without MSG_DONE again"""
+
+        for index, worker in enumerate(workers):
+            serial = worker.name
+            if worker.is_alive() or serial in finished or serial in lost:
+                continue
+
+            # its last messages may still be on the way
+            while receive():
+                pass
+            if serial in finished:
+                continue
+
+            lost.add(serial)
+            chunk = pool.requeue(index)
+            if chunk is not None and not winners:
+                print(fg.li_red + "[-] Rig {} failed, its chunk {} goes to the other rigs".format(
+                        serial, chunk) + fg.rs)
+
+    try:
+        # the workers must not inherit the database connection
+        if args.store:
+            store = ResultStore(args.store)
+            store.start_run(args.protocol, "rigs " + ",".join(serials))
+
+        while any(worker.is_alive() for worker in workers):
+            receive()
+            requeue_lost()
+    finally:
+        # workers only exit after their messages have been received
+        stop.set()
+        while receive() or any(worker.is_alive() for worker in workers):
+            pass
+        for worker in workers:
+            worker.join()
+        if store is not None:
+            store.close()
+
+    # chunks of rigs that died when no other rig was left to take them
+    requeue_lost()
+    unswept = []
+    while True:
+        try:
+            unswept.append(pool.requeued.get(timeout=0.1))
+        except queue.Empty:
+            break
+    if unswept and not winners:
+        print(fg.li_red + "[-] Offsets not swept: {}".format(", ".join(
+                "{}..{}".format(o[0], o[-1]) for o in (offsets[c * args.chunk_size:(c + 1) * args.chunk_size]
+                for c in sorted(unswept)))) + fg.rs)
+
+    print(fg.li_white + "[*] {} attempts with {} rigs, successful rigs: {}".format(
+            attempts, len(serials), ", ".join(winners) or "none") + fg.rs)
+    return bool(winners)
@@ -0,0 +1,274 @@
+"""
+  iCE, iCE Baby Glitcher - glitch parameter search strategies
+
+  A search yields (offset, duration) pairs to try and is told the
+  outcome of every attempt. Raster is the classic exhaustive sweep,
+  Adaptive samples the parameter space coarse to fine and concentrates
+  attempts around parameters with anomalous responses.
+"""
+
+import heapq
+import random
+from abc import ABC, abstractmethod
+from itertools import islice, product
+
+from .protocols import SUCCESS, REJECTED, UNEXPECTED, NO_SYNC
+
+# how interesting an outcome is for the adaptive search
+OUTCOME_WEIGHTS = {
+    SUCCESS: 10.0,
+    UNEXPECTED: 1.0,        # the glitch had an effect on the target
+    NO_SYNC: 0.5,           # target crashed, the glitch is probably too strong
+    REJECTED: 0.0,
+}
+
+
+class Search(ABC):
+    """Glitch parameter search"""
+
+    name = None
+
+    def __init__(self, offsets, durations, retries=1):
+        """Initialize the search over ranges of offsets and durations"""
+
+        self.offsets = offsets
+        self.durations = durations
+        self.retries = retries
+
+        # number of attempts yielded so far
+        self.position = 0
+
+    @abstractmethod
+    def __iter__(self):
+        """Yield (offset, duration) pairs to attempt"""
+
+    def observe(self, offset, duration, outcome):
+        """Take the outcome of an attempt into account"""
+
+        pass
+
+    def learn(self, history):
+        """Take recorded (offset, duration, outcome) attempts into account"""
+
+        for offset, duration, outcome in history:
+            if offset in self.offsets and duration in self.durations:
+                self.observe(offset, duration, outcome)
+
+    def config(self):
+        """Return the parameters of the search a checkpoint has to match"""
+
+        return {}
+
+    def state(self):
+        """Return the progress of the search as JSON serializable dict"""
+
+        return {"name": self.name, "position": self.position}
+
+    def restore(self, state):
+        """Continue from a state returned by state()"""
+
+        self.position = state["position"]
+
+    @property
+    def size(self):
+        """Number of parameter pairs in the search space"""
+
+        return len(self.offsets) * len(self.durations)
+
+
+class Raster(Search):
+    """Exhaustive sweep over offset x duration x retries"""
+
+    name = "raster"
+
+    def __iter__(self):
+        # duration in 10 ns increments, better test more than once,
+        # continue after the attempts already made
+        attempts = product(self.offsets, self.durations, range(self.retries))
+        for offset, duration, i in islice(attempts, self.position, None):
+            self.position += 1
+            yield offset, duration
+
+
+class Adaptive(Search):
+    """Coarse to fine search refining around anomalous responses
+
+    The parameter grid is visited in passes with decreasing stride,
+    starting with every coarse_step-th offset and duration, so the whole
+    space is covered eventually. Every anomalous outcome scores its
+    parameters and queues them and their neighbours within radius grid
+    steps as hotspots, until a point has been tried max_tries times.
+    Hotspots are attempted before the next regular grid point, except for
+    an explore share of attempts that continue the grid.
+    """
+
+    name = "adaptive"
+
+    def __init__(self, offsets, durations, retries=1, coarse_step=8, radius=None,
+            explore=0.2, max_tries=None, seed=None):
+        """Initialize the search"""
+
+        super().__init__(offsets, durations, retries)
+        self.coarse_step = max(1, coarse_step)
+        self.radius = radius or max(1, self.coarse_step // 2)
+        self.explore = explore
+        self.max_tries = max_tries or 4 * retries
+
+        # the grid order only depends on the seed, so it can be replayed on resume,
+        # a random seed is taken from the checkpoint
+        self.given_seed = seed
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.random = random.Random(self.seed)
+        self.grid_taken = 0
+
+        # parameters currently attempted and their remaining retries
+        self.current = None
+        self.remaining = 0
+
+        # per parameter index pair: [attempts, anomaly weight]
+        self.scores = {}
+
+        # hotspot queue of (-priority, sequence, (offset index, duration index))
+        self.hotspots = []
+        self.sequence = 0
+
+        # grid points currently waiting in the hotspot queue
+        self.queued = set()
+
+    def _grid(self):
+        """Yield grid index pairs coarse to fine, each pass shuffled"""
+
+        rng = random.Random(self.seed)
+        done = set()
+        stride = self.coarse_step
+        while True:
+            level = [(i, j)
+                    for i in range(0, len(self.offsets), stride)
+                    for j in range(0, len(self.durations), stride)
+                    if (i, j) not in done]
+            rng.shuffle(level)
+            for point in level:
+                done.add(point)
+                yield point
+            if stride == 1:
+                return
+            stride //= 2
+
+    def _push(self, point, priority):
+        """Queue a hotspot"""
+
+        if priority <= 0 or self.scores.get(point, (0, 0))[0] >= self.max_tries:
+            return
+        self.queued.add(point)
+        self.sequence += 1
+        heapq.heappush(self.hotspots, (-priority, self.sequence, point))
+
+    def _pop(self):
+        """Return the best queued hotspot that may still be tried, or None"""
+
+        while self.hotspots:
+            _, _, point = heapq.heappop(self.hotspots)
+            self.queued.discard(point)
+            if self.scores.get(point, (0, 0))[0] < self.max_tries:
+                return point
+        return None
+
+    def score(self, point):
+        """Posterior anomaly rate of a grid point"""
+
+        attempts, weight = self.scores.get(point, (0, 0.0))
+        return weight / (attempts + 1)
+
+    def __iter__(self):
+        grid = islice(self._grid(), self.grid_taken, None)
+        while True:
+            if not self.remaining:
+                point = None
+                if self.hotspots and self.random.random() >= self.explore:
+                    point = self._pop()
+
+                if point is None:
+                    point = next(grid, None)
+                    if point is None:
+                        point = self._pop()
+                        if point is None:
+                            return
+                    else:
+                        self.grid_taken += 1
+
+                self.current, self.remaining = point, self.retries
+
+            i, j = self.current
+            self.remaining -= 1
+            self.position += 1
+            yield self.offsets[i], self.durations[j]
+
+    def observe(self, offset, duration, outcome):
+        """Update the score of the parameters and queue hotspots"""
+
+        i = (offset - self.offsets.start) // self.offsets.step
+        j = (duration - self.durations.start) // self.durations.step
+        point = (i, j)
+
+        attempts, weight = self.scores.get(point, (0, 0.0))
+        w = OUTCOME_WEIGHTS.get(outcome, 0.0)
+        self.scores[point] = (attempts + 1, weight + w)
+        if not w:
+            return
+
+        # retry the anomalous parameters and explore their neighbourhood
+        score = self.score(point)
+        if point not in self.queued:
+            self._push(point, score)
+        radius = self.radius
+        for di in range(-radius, radius + 1):
+            for dj in range(-radius, radius + 1):
+                n = (i + di, j + dj)
+                if n in self.queued:
+                    continue
+                if 0 <= n[0] < len(self.offsets) and 0 <= n[1] < len(self.durations):
+                    distance = max(abs(di), abs(dj))
+                    self._push(n, score * (1 - distance / (radius + 1)))
+
+    def config(self):
+        return {
+            "coarse_step": self.coarse_step,
+            "explore": self.explore,
+            "radius": self.radius,
+            "max_tries": self.max_tries,
+            "seed": self.given_seed,
+        }
+
+    def state(self):
+        state = super().state()
+        state.update(
+            seed=self.seed,
+            random=self.random.getstate(),
+            grid_taken=self.grid_taken,
+            current=self.current,
+            remaining=self.remaining,
+            scores=[[i, j, attempts, weight] for (i, j), (attempts, weight) in self.scores.items()],
+            hotspots=[[priority, sequence, i, j] for priority, sequence, (i, j) in self.hotspots],
+            sequence=self.sequence,
+            queued=list(self.queued))
+        return state
+
+    def restore(self, state):
+        super().restore(state)
+        self.seed = state["seed"]
+        version, internal, gauss = state["random"]
+        self.random.setstate((version, tuple(internal), gauss))
+        self.grid_taken = state["grid_taken"]
+        self.current = tuple(state["current"]) if state["current"] else None
+        self.remaining = state["remaining"]
+        self.scores = {(i, j): (attempts, weight) for i, j, attempts, weight in state["scores"]}
+        self.hotspots = [(priority, sequence, (i, j)) for priority, sequence, i, j in state["hotspots"]]
+        self.sequence = state["sequence"]
+        self.queued = set(map(tuple, state["queued"]))
+
+
+# available search strategies by command line name
+SEARCHES = {
+    Raster.name: Raster,
+    Adaptive.name: Adaptive,
+}
@@ -0,0 +1,797 @@
+"""
+  iCE, iCE Baby Glitcher - offline hardware simulator
+
+  SimulatedDevice stands in for the pylibftdi Device of the iCEstick. It
+  decodes the FPGA command set of top.v (passthrough, reset, set
+  duration, set offset, start glitch, set reset width, set trigger, the
+  hardware sweep of sweep_engine.v, the baudrate switch of host_link.v
+  and the target baudrate) and forwards passthrough data to
+  an emulated target bootloader (NXP LPC ISP or STM8). Whether a glitch
+  bypasses the readout protection is decided by a GlitchModel with
+  configurable success probabilities over (offset, duration).
+
+  Without a baudrate, responses are available immediately, which
+  measures the pure host overhead. With a baudrate, response bytes
+  become readable only after their UART wire time, responses to a
+  command only start after the command bytes crossed the host link and
+  the passthrough data the target UART, and passthrough data that does
+  not fit into the target FIFO of target_link.v is dropped.
+"""
+
+import random
+import threading
+
+from abc import ABC, abstractmethod
+from binascii import b2a_uu
+from itertools import product
+from struct import pack, unpack
+from time import monotonic
+
+from .fpga import (CMD_PASSTHROUGH, CMD_RESET, CMD_SET_DURATION, CMD_SET_OFFSET,
+        CMD_START_GLITCH, CMD_SET_RESET_WIDTH, CMD_SET_TRIGGER, CMD_SWEEP_SETUP, CMD_SWEEP_PROBE,
+        CMD_SWEEP_START, CMD_SWEEP_STOP, CMD_SET_BAUDRATE, CMD_PING, CMD_PASSTHROUGH_LONG, BAUDRATE, BAUDRATE_ACK,
+        BAUDRATE_CONFIRM_TIME, BAUDRATE_TOLERANCE, DEFAULT_RESET_WIDTH, FPGA_CLOCK, MAX_SWEEP_PROBE,
+        MAX_TRIGGER_PATTERN, PONG, TARGET_BAUDRATE, TARGET_FIFO_SIZE, TRIGGER_RX, TRIGGER_TX,
+        CMD_SET_TARGET_BAUDRATE)
+from .sweep import RESET_GLITCH_DURATION
+
+# glitch effects on a single boot of the target
+GLITCH_SUCCESS = "success"      # readout protection bypassed
+GLITCH_FAULT = "fault"          # target misbehaves (unexpected response)
+GLITCH_CRASH = "crash"          # target hangs, no synchronization
+
+
+class GlitchModel():
+    """Probabilities of glitch effects over (offset, duration)"""
+
+    def __init__(self, hits=None, radius=2, crash_duration=None, seed=None):
+        """Initialize the model
+
+        hits maps (offset, duration) to the probability of bypassing the
+        readout protection. Parameters within radius (in both offset and
+        duration) of a hit cause faults with a probability decreasing with
+        the distance. Glitches of at least crash_duration crash the target.
+        """
+
+        self.hits = dict(hits or {})
+        self.radius = radius
+        self.crash_duration = crash_duration
+        self.random = random.Random(seed)
+
+    def effect(self, offset, duration):
+        """Return the glitch effect for one boot, None if it has no effect"""
+
+        if self.crash_duration is not None and duration >= self.crash_duration:
+            return GLITCH_CRASH
+
+        p = self.hits.get((offset, duration))
+        if p is not None and self.random.random() < p:
+            return GLITCH_SUCCESS
+
+        for (hit_offset, hit_duration), p in self.hits.items():
+            distance = max(abs(offset - hit_offset), abs(duration - hit_duration))
+            if 0 < distance <= self.radius:
+                if self.random.random() < p * (1 - distance / (self.radius + 1)):
+                    return GLITCH_FAULT
+
+        return None
+
+
+class Target(ABC):
+    """Emulated target bootloader behind the FPGA passthrough"""
+
+    def __init__(self, memory, locked=True):
+        """Initialize the target with its flash memory content"""
+
+        self.memory = bytes(memory)
+        self.locked = locked
+        self.device = None
+        self.reset(None)
+
+    def reset(self, effect):
+        """Boot the target, effect is the glitch effect on this boot"""
+
+        self.effect = effect
+        self.rx = bytearray()
+        self.baudrate = TARGET_BAUDRATE
+
+    @property
+    def readable(self):
+        """Whether the readout protection is (glitched) off"""
+
+        return not self.locked or self.effect == GLITCH_SUCCESS
+
+    def send(self, data):
+        """Send data from the target to the host"""
+
+        self.device.transmit(data)
+
+    def receive(self, data):
+        """Data from the host arrived at the target"""
+
+        if self.effect == GLITCH_CRASH:
+            return
+        self.rx += data
+        self.process()
+
+    @abstractmethod
+    def process(self):
+        """Handle received data"""
+
+
+class LPCTarget(Target):
+    """NXP LPC ISP bootloader with code read protection"""
+
+    # ISP return codes
+    CMD_SUCCESS = b"0"
+    INVALID_COMMAND = b"1"
+    PARAM_ERROR = b"7"
+    INVALID_BAUD_RATE = b"17"
+    INVALID_STOP_BIT = b"18"
+    CODE_READ_PROTECTION_ENABLED = b"19"
+
+    # baudrates accepted by the set baudrate command
+    BAUDRATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800)
+
+    # uuencoded lines between two checksums
+    LINES_PER_CHECKSUM = 20
+
+    def reset(self, effect):
+        """Boot into the auto baudrate detection"""
+
+        super().reset(effect)
+        self.state = "autobaud"
+        self.echo = True
+        self.pending = b""
+
+    def _lines(self):
+        """Yield complete lines received from the host (CR and/or LF terminated)"""
+
+        while True:
+            pos = min((p for p in (self.rx.find(b"\r"), self.rx.find(b"\n")) if p >= 0), default=-1)
+            if pos < 0:
+                return
+            if self.rx[pos:pos + 2] == b"\r\n":
+                pos += 1
+            raw = bytes(self.rx[:pos + 1])
+            del self.rx[:pos + 1]
+            yield raw
+
+    def process(self):
+        """Run the ISP state machine on the received data"""
+
+        if self.state == "autobaud":
+            pos = self.rx.find(b"?")
+            if pos < 0:
+                self.rx.clear()
+                return
+            del self.rx[:pos + 1]
+            self.send(b"Synchronized\r\n")
+            self.state = "synchronized"
+
+        for raw in self._lines():
+            if self.echo:
+                self.send(raw)
+
+            # extra CR / LF characters are ignored
+            line = raw.strip()
+            if not line:
+                continue
+
+            if self.state == "synchronized":
+                if line == b"Synchronized":
+                    self.send(b"OK\r\n")
+                    self.state = "frequency"
+            elif self.state == "frequency":
+                if line.isdigit():
+                    self.send(b"OK\r\n")
+                    self.state = "command"
+            elif self.state == "checksum":
+                if line == b"OK":
+                    self._send_data()
+                elif line == b"RESEND":
+                    self.pending = self.last_chunk + self.pending
+                    self._send_data()
+            else:
+                self.command(line)
+
+    def command(self, line):
+        """Execute an ISP command"""
+
+        if self.effect == GLITCH_FAULT:
+            # answer the first command after a faulty glitch with garbage
+            self.effect = None
+            self.send(b"\xff\x00" + line + b"\r\n")
+            return
+
+        args = line.split()
+        if not args:
+            return
+
+        if args[0] == b"A" and len(args) == 2 and args[1] in (b"0", b"1"):
+            self.send(self.CMD_SUCCESS + b"\r\n")
+            self.echo = args[1] == b"1"
+
+        elif args[0] == b"B" and len(args) == 3:
+            if not args[1].isdigit() or int(args[1]) not in self.BAUDRATES:
+                self.send(self.INVALID_BAUD_RATE + b"\r\n")
+            elif args[2] not in (b"1", b"2"):
+                self.send(self.INVALID_STOP_BIT + b"\r\n")
+            else:
+                # the answer still goes out at the old baudrate
+                self.send(self.CMD_SUCCESS + b"\r\n")
+                self.baudrate = int(args[1])
+
+        elif args[0] == b"R" and len(args) == 3:
+            try:
+                addr, count = int(args[1]), int(args[2])
+            except ValueError:
+                self.send(self.PARAM_ERROR + b"\r\n")
+                return
+            if not self.readable:
+                self.send(self.CODE_READ_PROTECTION_ENABLED + b"\r\n")
+                return
+            if addr % 4 or count % 4 or addr + count > len(self.memory):
+                self.send(self.PARAM_ERROR + b"\r\n")
+                return
+            self.send(self.CMD_SUCCESS + b"\r\n")
+            self.pending = self.memory[addr:addr + count]
+            self._send_data()
+
+        else:
+            self.send(self.INVALID_COMMAND + b"\r\n")
+
+    def _send_data(self):
+        """Send up to 20 uuencoded lines followed by their checksum"""
+
+        if not self.pending:
+            self.state = "command"
+            return
+
+        chunk = self.pending[:45 * self.LINES_PER_CHECKSUM]
+        self.pending = self.pending[len(chunk):]
+        self.last_chunk = chunk
+
+        out = bytearray()
+        for i in range(0, len(chunk), 45):
+            out += b2a_uu(chunk[i:i + 45]).rstrip(b"\n") + b"\r\n"
+        out += str(sum(chunk)).encode("ascii") + b"\r\n"
+        self.send(bytes(out))
+        self.state = "checksum"
+
+
+class STM8Target(Target):
+    """STM8 UART bootloader with readout protection"""
+
+    ACK = 0x79
+    NACK = 0x1F
+    SYNCH = 0x7F
+
+    CMD_GET = 0x00
+    CMD_READ = 0x11
+
+    # bootloader version and supported commands answered to GET
+    VERSION = 0x10
+    COMMANDS = bytes([0x00, 0x11, 0x21, 0x31, 0x43])
+
+    def reset(self, effect):
+        """Boot into the bootloader waiting for the sync byte"""
+
+        super().reset(effect)
+        self.state = "synch"
+
+    def _answer(self, byte):
+        """Send ACK or NACK, a faulty glitch corrupts the first command answer"""
+
+        if self.effect == GLITCH_FAULT and self.state != "synch":
+            self.effect = None
+            byte ^= 0xA5
+        self.send(bytes([byte]))
+
+    def process(self):
+        """Run the bootloader state machine on the received data"""
+
+        while self.rx:
+            if self.state == "synch":
+                b = self.rx.pop(0)
+                if b == self.SYNCH:
+                    self._answer(self.ACK)
+                    self.state = "command"
+
+            elif self.state == "command":
+                if len(self.rx) < 2:
+                    return
+                cmd, inv = self.rx[0], self.rx[1]
+                del self.rx[:2]
+                if cmd ^ inv != 0xFF:
+                    self._answer(self.NACK)
+                elif cmd == self.CMD_GET:
+                    self._answer(self.ACK)
+                    self.send(bytes([len(self.COMMANDS), self.VERSION]) + self.COMMANDS + bytes([self.ACK]))
+                elif cmd == self.CMD_READ and self.readable:
+                    self._answer(self.ACK)
+                    self.state = "address"
+                else:
+                    self._answer(self.NACK)
+
+            elif self.state == "address":
+                if len(self.rx) < 5:
+                    return
+                a = bytes(self.rx[:5])
+                del self.rx[:5]
+                self.addr = unpack(">L", a[:4])[0]
+                if a[0] ^ a[1] ^ a[2] ^ a[3] != a[4] or self.addr >= len(self.memory):
+                    self._answer(self.NACK)
+                    self.state = "command"
+                else:
+                    self._answer(self.ACK)
+                    self.state = "length"
+
+            elif self.state == "length":
+                if len(self.rx) < 2:
+                    return
+                n, inv = self.rx[0], self.rx[1]
+                del self.rx[:2]
+                if n ^ inv != 0xFF:
+                    self._answer(self.NACK)
+                else:
+                    self._answer(self.ACK)
+                    data = self.memory[self.addr:self.addr + n + 1]
+                    self.send(data + b"\xff" * (n + 1 - len(data)))
+                self.state = "command"
+
+
+class SimulatedDevice():
+    """pylibftdi Device replacement emulating iCEstick FPGA and target"""
+
+    def __init__(self, target, model=None, baudrate=None, boot_time=0.0, latency=0.0,
+            min_reset_width=0, max_link_baudrate=None, max_target_baudrate=None):
+        """Initialize the simulated device
+
+        baudrate (if given) of the UART link from the target to the host
+        sets the wire time of every response byte at the default target
+        baudrate (scaled with the target baudrate), latency in seconds
+        delays every response byte on its way through USB, boot_time is
+        the time in seconds from a reset until the bootloader accepts data.
+        Reset pulses shorter than min_reset_width FPGA clock cycles do not
+        reboot the target. Above max_link_baudrate, all data on the host
+        link is garbled, above max_target_baudrate all data on the target
+        UART.
+        """
+
+        self.target = target
+        self.target.device = self
+        self.model = model or GlitchModel()
+        self.wire_baudrate = baudrate
+        self.latency = latency
+        self.timed = baudrate is not None or latency > 0
+        self.wire_free = 0.0
+        self.boot_time = boot_time
+        self.min_reset_width = min_reset_width
+        self.baudrate = BAUDRATE
+
+        # host link: baudrate of the FPGA, pending switch after the
+        # acknowledge and fallback of an unconfirmed switch
+        self.link_baudrate = BAUDRATE
+        self.max_link_baudrate = max_link_baudrate
+        self.link_pending = None
+        self.link_fallback = None
+        self.cmd_free = 0.0
+
+        # time when the target FIFO is empty, dropped passthrough bytes
+        self.target_free = 0.0
+        self.fifo_overflows = 0
+
+        # target UART of the FPGA, bytes are lost unless the target uses
+        # the same baudrate
+        self.target_baudrate = TARGET_BAUDRATE
+        self.max_target_baudrate = max_target_baudrate
+
+        # FPGA registers as in the command processor of top.v
+        self.glitch_ofs = 0
+        self.glitch_dur = 0
+        self.reset_width = 0
+        self.armed = None
+
+        # UART trigger: pattern, watched line, armed glitch and last bytes seen
+        self.trigger = b""
+        self.trigger_source = TRIGGER_RX
+        self.trigger_armed = None
+        self.trigger_window = b""
+
+        # hardware sweep engine: ranges and retries, probe and expected
+        # rejection, running sweep (generator of outcome records)
+        self.sweep_ranges = (range(0), range(0), 0)
+        self.sweep_probe = (b"", b"")
+        self.engine = None
+        self.engine_stop = False
+        self.capture = None
+
+        # the reader of the asyncio transport calls read() from its own thread
+        self.lock = threading.RLock()
+
+        self.cmd_buf = bytearray()
+        self.out = bytearray()
+        self.out_times = []
+
+        # the target is powered up without glitch
+        self.booted = True
+        self.boot_done = 0.0
+
+        # counters for benchmarks
+        self.writes = 0
+        self.reads = 0
+        self.resets = 0
+
+    # ------------------------------------------------------------------
+    # pylibftdi Device interface
+    # ------------------------------------------------------------------
+    def write(self, data):
+        """Receive FPGA command bytes from the host"""
+
+        with self.lock:
+            self.writes += 1
+            if not self._link_ok():
+                return len(data)
+
+            if self.timed and self.wire_baudrate:
+                # responses start after the command bytes crossed the host link
+                t = max(monotonic(), self.cmd_free) + 10.0 * len(data) / self.link_baudrate
+                self.cmd_free = t
+                self.wire_free = max(self.wire_free, t)
+
+            self.cmd_buf += data
+            self._decode()
+            return len(data)
+
+    def read(self, length):
+        """Return up to length bytes the target has sent so far"""
+
+        with self.lock:
+            self.reads += 1
+
+            # the sweep engine runs until it has something to report
+            while self.engine is not None and not self.out:
+                record = next(self.engine, None)
+                if record is None:
+                    self.engine = None
+                else:
+                    self._to_host(record)
+
+            if not self._link_ok():
+                self.out.clear()
+                self.out_times.clear()
+                return b""
+
+            n = min(length, len(self.out))
+            if self.timed and n:
+                now = monotonic()
+                while n and self.out_times[n - 1] > now:
+                    n -= 1
+                del self.out_times[:n]
+            data = bytes(self.out[:n])
+            del self.out[:n]
+
+            # the acknowledge has been sent, switch the baudrate
+            if self.link_pending is not None and not self.out:
+                self.link_fallback = (self.link_baudrate, monotonic() + BAUDRATE_CONFIRM_TIME)
+                self.link_baudrate = self.link_pending
+                self.link_pending = None
+            return data
+
+    def flush_input(self):
+        """Drop everything not yet read by the host"""
+
+        with self.lock:
+            if not self.timed:
+                self.out.clear()
+            else:
+                # bytes still on the wire arrive after the flush
+                now = monotonic()
+                n = 0
+                while n < len(self.out) and self.out_times[n] <= now:
+                    n += 1
+                del self.out[:n]
+                del self.out_times[:n]
+
+    def flush(self, flush_what=None):
+        """Drop all pending data"""
+
+        self.flush_input()
+
+    def close(self):
+        """Nothing to close"""
+
+        pass
+
+    # ------------------------------------------------------------------
+    # Host link
+    # ------------------------------------------------------------------
+    def _link_ok(self):
+        """Return True if host and FPGA use the same working baudrate"""
+
+        # an unconfirmed switch falls back after the confirmation time
+        if self.link_fallback is not None and monotonic() >= self.link_fallback[1]:
+            self.link_baudrate = self.link_fallback[0]
+            self.link_fallback = None
+
+        if self.max_link_baudrate is not None and self.link_baudrate > self.max_link_baudrate:
+            return False
+        return abs(self.baudrate - self.link_baudrate) <= self.link_baudrate * BAUDRATE_TOLERANCE
+
+    # ------------------------------------------------------------------
+    # Target UART
+    # ------------------------------------------------------------------
+    def _target_uart_ok(self):
+        """Return True if FPGA and target use the same working baudrate"""
+
+        baudrate = self.target.baudrate
+        if self.max_target_baudrate is not None and baudrate > self.max_target_baudrate:
+            return False
+        return abs(self.target_baudrate - baudrate) <= baudrate * BAUDRATE_TOLERANCE
+
+    def _byte_time(self):
+        """Wire time of a byte on the target UART, 0 without a wire baudrate"""
+
+        if not self.wire_baudrate:
+            return 0.0
+        return 10.0 / self.wire_baudrate * TARGET_BAUDRATE / self.target_baudrate
+
+    # ------------------------------------------------------------------
+    # FPGA command processor
+    # ------------------------------------------------------------------
+    def _decode(self):
+        """Execute all complete commands in the command buffer"""
+
+        buf = self.cmd_buf
+        while buf:
+            cmd = bytes(buf[:1])
+            if cmd == CMD_PASSTHROUGH:
+                if len(buf) < 2 or len(buf) < 2 + buf[1]:
+                    return
+                data = bytes(buf[2:2 + buf[1]])
+                del buf[:2 + buf[1]]
+                self._passthrough(data)
+            elif cmd == CMD_PASSTHROUGH_LONG:
+                if len(buf) < 3:
+                    return
+                n = unpack("<H", buf[1:3])[0]
+                if len(buf) < 3 + n:
+                    return
+                data = bytes(buf[3:3 + n])
+                del buf[:3 + n]
+                self._passthrough(data)
+            elif cmd == CMD_RESET:
+                del buf[:1]
+                self._reset()
+            elif cmd in (CMD_SET_DURATION, CMD_SET_OFFSET, CMD_SET_RESET_WIDTH):
+                if len(buf) < 5:
+                    return
+                value = unpack("<L", buf[1:5])[0]
+                del buf[:5]
+                if cmd == CMD_SET_DURATION:
+                    self.glitch_dur = value
+                elif cmd == CMD_SET_OFFSET:
+                    self.glitch_ofs = value
+                else:
+                    self.reset_width = value
+            elif cmd == CMD_SET_TRIGGER:
+                if len(buf) < 2 + MAX_TRIGGER_PATTERN:
+                    return
+                length = buf[1] & 0x07
+                self.trigger_source = TRIGGER_TX if buf[1] & 0x80 else TRIGGER_RX
+                self.trigger = bytes(buf[2 + MAX_TRIGGER_PATTERN - length:2 + MAX_TRIGGER_PATTERN])
+                del buf[:2 + MAX_TRIGGER_PATTERN]
+            elif cmd == CMD_START_GLITCH:
+                del buf[:1]
+                self._start_glitch()
+            elif cmd == CMD_SWEEP_SETUP:
+                if len(buf) < 35:
+                    return
+                values = unpack("<LLLLLLHLL", buf[1:35])
+                del buf[:35]
+                self.sweep_ranges = (range(*values[0:3]), range(*values[3:6]), values[6])
+            elif cmd == CMD_SWEEP_PROBE:
+                if len(buf) < 3 + 2 * MAX_SWEEP_PROBE:
+                    return
+                probe = bytes(buf[2:2 + buf[1]])
+                n = buf[2 + MAX_SWEEP_PROBE]
+                expect = bytes(buf[3 + 2 * MAX_SWEEP_PROBE - n:3 + 2 * MAX_SWEEP_PROBE])
+                del buf[:3 + 2 * MAX_SWEEP_PROBE]
+                self.sweep_probe = (probe, expect)
+            elif cmd == CMD_SWEEP_START:
+                if len(buf) < 2:
+                    return
+                hits_only = bool(buf[1] & 1)
+                del buf[:2]
+                self.engine_stop = False
+                self.engine = self._engine(hits_only)
+            elif cmd == CMD_SWEEP_STOP:
+                del buf[:1]
+                self.engine_stop = True
+            elif cmd == CMD_SET_BAUDRATE:
+                if len(buf) < 5:
+                    return
+                divisor = unpack("<L", buf[1:5])[0]
+                del buf[:5]
+                self._to_host(BAUDRATE_ACK)
+                self.link_pending = FPGA_CLOCK / divisor
+            elif cmd == CMD_PING:
+                del buf[:1]
+                self._to_host(PONG)
+                self.link_fallback = None
+            elif cmd == CMD_SET_TARGET_BAUDRATE:
+                if len(buf) < 5:
+                    return
+                divisor = unpack("<L", buf[1:5])[0]
+                del buf[:5]
+                self.target_baudrate = FPGA_CLOCK / divisor
+            else:
+                raise ValueError("unknown FPGA command 0x{:02x}".format(buf[0]))
+
+    def _reset(self):
+        """Reset pulse of resetter.v"""
+
+        # top.v sets the target UART back to the default baudrate and
+        # clears the target FIFO
+        self.target_baudrate = TARGET_BAUDRATE
+        self.target_free = 0.0
+
+        # resetter.v uses the default width for 0
+        if (self.reset_width or DEFAULT_RESET_WIDTH) >= self.min_reset_width:
+            self._boot()
+
+    def _start_glitch(self):
+        """Start the offset counter with the current glitch registers"""
+
+        if self.glitch_dur >= RESET_GLITCH_DURATION:
+            # a glitch this long power-cycles the target
+            self._boot()
+        elif self.trigger:
+            # the glitch hits when the trigger pattern passes
+            self.trigger_armed = (self.glitch_ofs, self.glitch_dur)
+            self.trigger_window = b""
+        else:
+            self.armed = (self.glitch_ofs, self.glitch_dur)
+
+    def _engine(self, hits_only):
+        """Sweep like sweep_engine.v, yield the outcome record of every reported attempt"""
+
+        offsets, durations, retries = self.sweep_ranges
+        probe, expect = self.sweep_probe
+        attempts = 0
+        for offset, duration, retry in product(offsets, durations, range(max(1, retries))):
+            self.glitch_ofs = offset
+            self.glitch_dur = duration
+            self._start_glitch()
+            self._reset()
+
+            # the engine consumes the response of the target
+            self.capture = bytearray()
+            self._to_target(probe)
+            response = bytes(self.capture)
+            self.capture = None
+            attempts += 1
+
+            # rejected (0), no response (1) or any other response (2)
+            if not response:
+                outcome = 1
+            elif expect and response.endswith(expect):
+                outcome = 0
+            else:
+                outcome = 2
+
+            if not hits_only:
+                yield bytes([outcome])
+            elif outcome:
+                yield pack("<BLL", outcome, offset, duration)
+
+            if self.engine_stop:
+                break
+
+        yield pack("<BL", 0xFF, attempts)
+
+    def _boot(self):
+        """Restart the target, the glitch effect is decided on first contact"""
+
+        self.resets += 1
+        self.booted = False
+        self.boot_done = monotonic() + self.boot_time
+
+    def _passthrough(self, data):
+        """Queue passthrough data in the target FIFO"""
+
+        if self.timed and self.wire_baudrate:
+            byte_time = self._byte_time()
+            t = max(monotonic(), self.cmd_free)
+            room = max(0, TARGET_FIFO_SIZE - int(max(0.0, self.target_free - t) / byte_time))
+            if len(data) > room:
+                self.fifo_overflows += len(data) - room
+                data = data[:room]
+            self.target_free = max(t, self.target_free) + len(data) * byte_time
+
+            # the target answers after it received the data
+            self.wire_free = max(self.wire_free, self.target_free)
+
+        self._to_target(data)
+
+    def _to_target(self, data):
+        """Forward passthrough data to the target"""
+
+        if not self.booted:
+            if self.boot_time and monotonic() < self.boot_done:
+                # the target is still in reset or booting
+                return
+            effect = None
+            if self.armed is not None:
+                effect = self.model.effect(*self.armed)
+                self.armed = None
+            self.target.reset(effect)
+            self.booted = True
+
+        self._watch(data, TRIGGER_TX)
+        if self._target_uart_ok():
+            self.target.receive(data)
+
+    def _watch(self, data, source):
+        """Apply an armed glitch when the trigger pattern passes on the source line"""
+
+        if self.trigger_armed is None or source != self.trigger_source:
+            return
+        for b in data:
+            self.trigger_window = (self.trigger_window + bytes([b]))[-len(self.trigger):]
+            if self.trigger_window == self.trigger:
+                self.target.effect = self.model.effect(*self.trigger_armed)
+                self.trigger_armed = None
+                return
+
+    def transmit(self, data):
+        """Queue target response bytes for the host"""
+
+        if not self._target_uart_ok():
+            return
+        self._watch(data, TRIGGER_RX)
+        if self.capture is not None:
+            self.capture += data
+        else:
+            self._to_host(data)
+
+    def _to_host(self, data):
+        """Queue bytes for the host"""
+
+        self.out += data
+        if self.timed:
+            # 10 bit times per byte (start, 8 data, stop bit)
+            byte_time = self._byte_time()
+            t = max(monotonic(), self.wire_free)
+            self.out_times.extend(t + byte_time * (i + 1) + self.latency for i in range(len(data)))
+            self.wire_free = t + byte_time * len(data)
+
+
+# emulated targets by protocol name
+TARGETS = {
+    "lpc": LPCTarget,
+    "stm8": STM8Target,
+}
+
+
+def simulate(protocol, flash_size, hits=None, seed=None, locked=True, **kwargs):
+    """Create a simulated iCEstick with a target of the given protocol
+
+    The flash memory is filled with pseudo random data derived from seed,
+    further keyword arguments are passed to SimulatedDevice.
+    """
+
+    memory = random.Random(seed).randbytes(flash_size)
+    model = GlitchModel(hits, seed=seed)
+    return SimulatedDevice(TARGETS[protocol](memory, locked), model, **kwargs)
+
+
+def parse_hit(text):
+    """Parse OFFSET,DURATION[,PROBABILITY] into ((offset, duration), probability)"""
+
+    parts = text.split(",")
+    if len(parts) not in (2, 3):
+        raise ValueError("expected OFFSET,DURATION[,PROBABILITY]")
+    probability = float(parts[2]) if len(parts) == 3 else 1.0
+    return (int(parts[0], 0), int(parts[1], 0)), probability
@@ -0,0 +1,153 @@
+"""
+  iCE, iCE Baby Glitcher - results store
+
+  Every glitch attempt (parameters, outcome, response, phase timings and
+  the rig that made it) is recorded in a SQLite database. The database runs in WAL mode and
+  inserts are committed in batches, so recording costs a few
+  microseconds per attempt. Attempts are indexed by (offset, duration)
+  for heatmaps and success-rate queries over millions of rows.
+"""
+
+import sqlite3
+from datetime import datetime
+from time import time
+
+from .protocols import OUTCOMES, SUCCESS
+from .sweep import PHASES
+
+STORE_FILE = "results.db"
+
+# attempts per transaction
+COMMIT_EVERY = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL,
+    protocol TEXT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs(id),
+    time REAL NOT NULL,
+    offset INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    retry INTEGER NOT NULL,
+    outcome TEXT NOT NULL,
+    response TEXT,
+    t_reset REAL,
+    t_arm REAL,
+    t_sync REAL,
+    t_probe REAL,
+    rig TEXT
+);
+CREATE INDEX IF NOT EXISTS attempts_params ON attempts (offset, duration);
+"""
+
+
+class ResultStore():
+    """SQLite store of all glitch attempts"""
+
+    def __init__(self, path=STORE_FILE, commit_every=COMMIT_EVERY):
+        """Open (or create) the store"""
+
+        self.path = path
+        self.commit_every = commit_every
+        self.db = sqlite3.connect(path)
+
+        # WAL allows readers (e.g. a heatmap script) while the sweep is running,
+        # a crash may only lose the last uncommitted batch
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+        # stores created before attempts were tagged with their rig
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(attempts)")]
+        if "rig" not in columns:
+            self.db.execute("ALTER TABLE attempts ADD COLUMN rig TEXT")
+
+        self.run = None
+        self.pending = []
+
+    def start_run(self, protocol=None, description=None, run=None):
+        """Start a new glitching run (or continue run), return its id"""
+
+        if run is not None:
+            self.run = run
+            return run
+
+        cur = self.db.execute("INSERT INTO runs (started, protocol, description) VALUES (?, ?, ?)",
+                (datetime.now().isoformat(), protocol, description))
+        self.db.commit()
+        self.run = cur.lastrowid
+        return self.run
+
+    def record(self, offset, duration, retry, outcome, response=None, timings=None, when=None, rig=None):
+        """Record a glitch attempt (of the rig with the given serial), committed with the next batch"""
+
+        timings = timings or {}
+        self.pending.append((self.run, when or time(), offset, duration, retry, outcome, response,
+                *(timings.get(phase) for phase in PHASES), rig))
+        if len(self.pending) >= self.commit_every:
+            self.flush()
+
+    def flush(self):
+        """Commit all pending attempts"""
+
+        if not self.pending:
+            return
+        with self.db:
+            self.db.executemany("INSERT INTO attempts (run, time, offset, duration, retry, outcome, response, "
+                    "t_reset, t_arm, t_sync, t_probe, rig) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self.pending)
+        self.pending.clear()
+
+    def close(self):
+        """Commit pending attempts and close the database"""
+
+        self.flush()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def history(self, protocol=None):
+        """Yield (offset, duration, outcome) of all recorded attempts"""
+
+        self.flush()
+        if protocol is None:
+            cur = self.db.execute("SELECT offset, duration, outcome FROM attempts ORDER BY id")
+        else:
+            cur = self.db.execute("SELECT a.offset, a.duration, a.outcome FROM attempts a "
+                    "JOIN runs r ON a.run = r.id WHERE r.protocol = ? ORDER BY a.id", (protocol,))
+        yield from cur
+
+    def last_success(self, protocol=None):
+        """Return (offset, duration) of the last successful attempt or None"""
+
+        self.flush()
+        return self.db.execute("SELECT a.offset, a.duration FROM attempts a JOIN runs r ON a.run = r.id "
+                "WHERE a.outcome = ? AND (? IS NULL OR r.protocol = ?) ORDER BY a.id DESC LIMIT 1",
+                (SUCCESS, protocol, protocol)).fetchone()
+
+    def heatmap(self, outcome=SUCCESS):
+        """Return {(offset, duration): (attempts, rate of outcome)}"""
+
+        self.flush()
+        cur = self.db.execute("SELECT offset, duration, COUNT(*), SUM(outcome = ?) FROM attempts "
+                "GROUP BY offset, duration", (outcome,))
+        return {(offset, duration): (n, hits / n) for offset, duration, n, hits in cur}
+
+    def outcomes(self, offset, duration):
+        """Return the outcome counts of the given glitch parameters"""
+
+        self.flush()
+        counts = dict.fromkeys(OUTCOMES, 0)
+        cur = self.db.execute("SELECT outcome, COUNT(*) FROM attempts WHERE offset = ? AND duration = ? "
+                "GROUP BY outcome", (offset, duration))
+        counts.update(cur)
+        return counts
@@ -0,0 +1,563 @@
+"""
+  iCE, iCE Baby Glitcher - glitch parameter sweep
+
+  Target independent part of the glitching process: arm the FPGA with a
+  glitch offset and duration, reset the target and let the protocol
+  plugin decide whether the readout protection was bypassed.
+
+  run() drives the protocol coroutines synchronously, run_async() runs
+  the sweep in an event loop with the asyncio transport (aio.py).
+"""
+
+import asyncio
+import signal
+from datetime import datetime
+from sty import fg, ef
+from time import perf_counter
+
+from .aio import AsyncReader, run_sync
+from .fpga import DEFAULT_RESET_WIDTH, FPGA_CLOCK, TRIGGER_RX
+from .protocols import OUTCOMES, SUCCESS, UNEXPECTED, NO_SYNC
+from .search import Raster
+
+RESULTS_FILE = "results.txt"
+
+# ways to reset the target into its bootloader
+RESET_PIN = "pin"           # reset line driven by resetter.v (CMD_RESET)
+RESET_GLITCH = "glitch"     # power-cycle the target with a very long glitch
+RESET_MODES = (RESET_PIN, RESET_GLITCH)
+
+# glitch duration in FPGA clock cycles used to power-cycle the target
+RESET_GLITCH_DURATION = 2_000_000
+
+# reset pulse width calibration: search range and resolution in FPGA clock
+# cycles, resets that all have to reboot the target, and the safety factor
+# applied to the shortest working pulse
+MIN_RESET_WIDTH = 100
+RESET_RESOLUTION = 1000
+CALIBRATION_TRIALS = 10
+RESET_MARGIN = 2
+
+# timed phases of an attempt (with pin reset, the reset is part of "arm")
+PHASES = ("reset", "arm", "sync", "probe")
+
+# glitch attempts to complete a dump with missing blocks
+FILL_ATTEMPTS = 1000
+
+
+class Statistics():
+    """Counters of a glitching run"""
+
+    def __init__(self):
+        """Initialize the counters"""
+
+        self.start_time = datetime.now()
+        self.attempts = 0
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+
+        # glitch parameter uploads skipped because the FPGA already held the value
+        self.saved_writes = 0
+
+    def add(self, outcome):
+        """Count a glitch attempt"""
+
+        self.attempts += 1
+        self.outcomes[outcome] += 1
+
+    def __str__(self):
+        elapsed = datetime.now() - self.start_time
+        rate = self.attempts / max(elapsed.total_seconds(), 1e-9)
+        return ("{} attempts in {} ({:.1f}/s), ".format(self.attempts, elapsed, rate) +
+                ", ".join("{} {}".format(n, outcome) for outcome, n in self.outcomes.items()) +
+                ", {} parameter uploads saved".format(self.saved_writes))
+
+
+class Glitcher():
+    """Simple iCEstick voltage glitcher"""
+
+    def __init__(self, fpga, protocol, start_offset=0, end_offset=5000, offset_step=1,
+            duration_step=1, start_duration=1, end_duration=30, retries=2,
+            reset_mode=RESET_PIN, results_file=RESULTS_FILE, search=None, store=None,
+            checkpoint=None, fill_attempts=FILL_ATTEMPTS, reset_width=None, trigger=None,
+            trigger_source=TRIGGER_RX):
+        """Initialize the glitcher, search defaults to a Raster sweep
+
+        All attempts are recorded in store (a ResultStore) and the progress
+        is saved to checkpoint (a Checkpoint) if given. reset_width sets the
+        reset pulse in FPGA clock cycles (None keeps the FPGA default).
+        With a trigger pattern, offsets count from the pattern on the
+        trigger_source line instead of from the reset.
+        """
+
+        self.fpga = fpga
+        self.protocol = protocol
+        self.store = store
+        self.checkpoint = checkpoint
+        self.interrupted = False
+        self.fill_attempts = fill_attempts
+
+        # last glitch parameters and their retry index
+        self.last = None
+        self.retry = 0
+
+        # run in the store that a resumed sweep continues
+        self.resumed_run = None
+
+        # set offset and duration steps
+        self.offset_step = offset_step
+        self.duration_step = duration_step
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+        self.start_duration = start_duration
+        self.end_duration = end_duration
+        self.retries = retries
+
+        # order in which glitch parameters are tried
+        if search is None:
+            search = Raster(range(start_offset, end_offset, offset_step),
+                    range(start_duration, end_duration, duration_step), retries)
+        self.search = search
+
+        if reset_mode not in RESET_MODES:
+            raise ValueError("unknown reset mode '{}'".format(reset_mode))
+        self.reset_mode = reset_mode
+        self.reset_width = reset_width
+        self.trigger = trigger
+        self.trigger_source = trigger_source
+        self.results_file = results_file
+
+        # with pin reset, the sync request goes out with the arm sequence
+        self.triggered = reset_mode == RESET_PIN and protocol.sync_request is not None
+
+        # static part of every attempt, packed once
+        self.attempt_tail = self._pack_attempt_tail()
+
+        self.stats = Statistics()
+
+        # duration of the phases of the last attempt in seconds
+        self.timings = {}
+
+    def _pack_attempt_tail(self):
+        """Pack the commands following the glitch parameters of an attempt"""
+
+        batch = self.fpga.batch()
+
+        # start glitch (start the offset counter)
+        batch.start_glitch()
+
+        if self.reset_mode == RESET_PIN:
+            # reset target device
+            batch.reset_target()
+        else:
+            batch.passthrough(b"\x00")
+
+        if self.triggered:
+            batch.passthrough(self.protocol.sync_request)
+
+        return bytes(batch.buf)
+
+    def reset_target(self):
+        """Reset target device"""
+
+        if self.reset_mode == RESET_PIN:
+            self.fpga.reset_target()
+        else:
+            # power-cycle the target with a long glitch, this overwrites
+            # the glitch parameters
+            with self.fpga.batch() as batch:
+                batch.set_glitch_offset(0)
+                batch.set_glitch_duration(RESET_GLITCH_DURATION)
+                batch.start_glitch()
+                batch.passthrough(b"\x00")
+            self.protocol.reader.skip(2)
+
+    def attempt(self, offset, duration):
+        """Perform a single glitch attempt, return (outcome, response)"""
+
+        return run_sync(self.attempt_async(offset, duration))
+
+    async def attempt_async(self, offset, duration):
+        """Perform a single glitch attempt, return (outcome, response)"""
+
+        timings = self.timings = {}
+        t0 = perf_counter()
+
+        if self.reset_mode == RESET_GLITCH:
+            # power-cycle first, then arm the actual glitch
+            self.reset_target()
+            t1 = perf_counter()
+            timings["reset"] = t1 - t0
+            t0 = t1
+
+        # set glitch config (only if changed), start the offset counter,
+        # reset the target and request synchronization with a single USB write
+        batch = self.fpga.batch()
+        if self.reset_width is not None and self.reset_mode == RESET_PIN:
+            batch.set_reset_width(self.reset_width)
+        if self.trigger is not None:
+            batch.set_trigger(self.trigger, self.trigger_source)
+        batch.set_glitch_offset(offset)
+        batch.set_glitch_duration(duration)
+        batch.extend(self.attempt_tail, target_reset=self.reset_mode == RESET_PIN)
+
+        if self.triggered:
+            # drop stale data before the target answers the sync request
+            self.protocol.reader.flush()
+        batch.send()
+
+        if self.reset_mode == RESET_GLITCH:
+            self.protocol.reader.skip(2)
+
+        t1 = perf_counter()
+        timings["arm"] = t1 - t0
+
+        # synchronize with target
+        synchronized = await self.protocol.synchronize(self.triggered)
+        t0 = perf_counter()
+        timings["sync"] = t0 - t1
+        if not synchronized:
+            return NO_SYNC, None
+
+        # check whether the readout protection is bypassed
+        result = await self.protocol.probe()
+        timings["probe"] = perf_counter() - t0
+        return result
+
+    def reset_works(self, width, trials=CALIBRATION_TRIALS):
+        """Return True if all trials of a reset with the given pulse width reboot into the bootloader"""
+
+        self.fpga.set_reset_width(width)
+        for i in range(trials):
+            self.fpga.reset_target()
+
+            # a target that was not rebooted is still synchronized from the
+            # previous trial and rejects or ignores the sync request
+            if not run_sync(self.protocol.synchronize()) or not self.protocol.rebooted:
+                return False
+        return True
+
+    def calibrate_reset_width(self, low=MIN_RESET_WIDTH, high=DEFAULT_RESET_WIDTH,
+            trials=CALIBRATION_TRIALS, resolution=RESET_RESOLUTION, margin=RESET_MARGIN):
+        """Find the shortest reset pulse that reliably reboots the target
+
+        Bisects the pulse width between low and high (FPGA clock cycles),
+        uses the shortest working width times margin (at most high) for
+        all further attempts and returns it, None if even high does not work.
+        """
+
+        if self.reset_mode != RESET_PIN:
+            raise ValueError("reset width calibration requires reset mode '{}'".format(RESET_PIN))
+
+        print(fg.li_white + "[*] Calibrating the reset pulse width ({} resets per width)".format(trials) + fg.rs)
+        if not self.reset_works(high, trials):
+            print(fg.li_red + "[-] Target does not reboot with a reset pulse of {} cycles".format(high) + fg.rs)
+            return None
+
+        limit = high
+        while high - low > resolution:
+            width = (low + high) // 2
+            if self.reset_works(width, trials):
+                high = width
+            else:
+                low = width
+
+        self.reset_width = min(high * margin, limit)
+        self.fpga.set_reset_width(self.reset_width)
+        print(fg.li_white + "[*] Shortest working reset pulse: {} cycles, using {} cycles ({:.3f} ms)".format(
+                high, self.reset_width, self.reset_width * 1000.0 / FPGA_CLOCK) + fg.rs)
+        return self.reset_width
+
+    def save_result(self, offset, duration, resp):
+        """Save successful glitching configuration in file"""
+
+        config = "{},{},{}\n".format(offset, duration, self.protocol.format_response(resp))
+        with open(self.results_file, "a") as f:
+            f.write(config)
+
+    def config(self):
+        """Return the sweep configuration a checkpoint has to match"""
+
+        offsets, durations = self.search.offsets, self.search.durations
+        return {
+            "protocol": self.protocol.name,
+            "search": self.search.name,
+            "offsets": [offsets.start, offsets.stop, offsets.step],
+            "durations": [durations.start, durations.stop, durations.step],
+            "retries": self.search.retries,
+            "parameters": self.search.config(),
+        }
+
+    def save_checkpoint(self):
+        """Save the progress of the sweep"""
+
+        # attempts in the store must not be ahead of the checkpoint
+        if self.store is not None:
+            self.store.flush()
+
+        self.checkpoint.save({
+            "config": self.config(),
+            "search": self.search.state(),
+            "run": None if self.store is None else self.store.run,
+            "last": self.last,
+            "retry": self.retry,
+        })
+
+    def resume(self):
+        """Continue the sweep saved in the checkpoint with the next run()
+
+        Raise ValueError if the checkpoint belongs to another sweep.
+        """
+
+        state = self.checkpoint.load()
+        if state is None:
+            print(fg.li_white + "[*] No checkpoint found, starting a new sweep" + fg.rs)
+            return
+
+        if state["config"] != self.config():
+            raise ValueError("checkpoint '{}' belongs to a different sweep: {}".format(
+                    self.checkpoint.path, state["config"]))
+
+        self.search.restore(state["search"])
+        self.last = tuple(state["last"]) if state["last"] else None
+        self.retry = state["retry"]
+        self.resumed_run = state["run"]
+        print(fg.li_white + "[*] Resuming sweep after {} attempts".format(self.search.position) + fg.rs)
+
+    def _interrupt(self, signum, frame):
+        """Stop after the current attempt on Ctrl-C, immediately on the second"""
+
+        if self.interrupted:
+            raise KeyboardInterrupt
+        self.interrupted = True
+
+    def run(self):
+        """Run the glitching process with the current configuration"""
+
+        # measure the time
+        start_time = datetime.now()
+        self.stats = Statistics()
+        saved_writes = self.fpga.saved_writes
+
+        if self.store is not None:
+            self.store.start_run(self.protocol.name, run=self.resumed_run)
+
+        if self.checkpoint is None:
+            return self._sweep(start_time, saved_writes)
+
+        # finish the current attempt on Ctrl-C, so the checkpoint is exact
+        self.interrupted = False
+        handler = signal.signal(signal.SIGINT, self._interrupt)
+        try:
+            return self._sweep(start_time, saved_writes)
+        finally:
+            signal.signal(signal.SIGINT, handler)
+
+    def _sweep(self, start_time, saved_writes):
+        """Glitching loop of run()"""
+
+        for offset, duration in self.search:
+            print(fg.li_white + "[*] Set glitch configuration ({},{})".format(offset, duration) + fg.rs)
+
+            outcome, resp = self.attempt(offset, duration)
+            self.search.observe(offset, duration, outcome)
+            self.stats.add(outcome)
+            self.stats.saved_writes = self.fpga.saved_writes - saved_writes
+
+            self.record(offset, duration, outcome, resp)
+
+            if self.checkpoint is not None and (self.interrupted or self.checkpoint.due()):
+                self.save_checkpoint()
+                if self.interrupted:
+                    print(fg.li_white + "[*] Interrupted, resume with --resume from '{}'".format(
+                            self.checkpoint.path) + fg.rs)
+                    self.show_statistics()
+                    return False
+
+            if outcome == SUCCESS:
+                self.success(offset, duration, resp, start_time)
+                return True
+            self.report(outcome, resp)
+
+        if self.store is not None:
+            self.store.flush()
+        if self.checkpoint is not None:
+            # the sweep is complete
+            self.checkpoint.clear()
+        self.show_statistics()
+        return False
+
+    async def run_async(self):
+        """Run the glitching process in an event loop with the asyncio transport
+
+        The log output and the store record of an attempt are done while
+        the next attempt waits for the target. Checkpoints are not used.
+        The flash memory is dumped with the synchronous transport, which
+        the baudrate switches of the dump need.
+        """
+
+        start_time = datetime.now()
+        self.stats = Statistics()
+        saved_writes = self.fpga.saved_writes
+
+        if self.store is not None:
+            self.store.start_run(self.protocol.name, "asyncio")
+
+        sync_reader = self.protocol.reader
+        async with AsyncReader(self.fpga.dev, lock=self.fpga.lock) as reader:
+            self.protocol.reader = reader
+            try:
+                hit = await self._sweep_async(saved_writes)
+            finally:
+                self.protocol.reader = sync_reader
+
+        if hit is None:
+            return False
+        await self.success_async(*hit, start_time)
+        return True
+
+    async def _sweep_async(self, saved_writes):
+        """Glitching loop of run_async(), return (offset, duration, response) of a success or None"""
+
+        previous = None
+        for offset, duration in self.search:
+            attempt = asyncio.ensure_future(self.attempt_async(offset, duration))
+
+            # let the attempt send its commands, then log the previous one
+            await asyncio.sleep(0)
+            if previous is not None:
+                self._log_attempt(*previous)
+
+            outcome, resp = await attempt
+            self.search.observe(offset, duration, outcome)
+            self.stats.add(outcome)
+            self.stats.saved_writes = self.fpga.saved_writes - saved_writes
+            previous = (offset, duration, outcome, resp, self.timings)
+
+            if outcome == SUCCESS:
+                self._log_attempt(*previous)
+                return offset, duration, resp
+
+        if previous is not None:
+            self._log_attempt(*previous)
+        if self.store is not None:
+            self.store.flush()
+        self.show_statistics()
+        return None
+
+    def _log_attempt(self, offset, duration, outcome, resp, timings):
+        """Print and record an attempt of run_async()"""
+
+        print(fg.li_white + "[*] Set glitch configuration ({},{})".format(offset, duration) + fg.rs)
+        self.record(offset, duration, outcome, resp, timings)
+        self.report(outcome, resp)
+
+    def report(self, outcome, resp):
+        """Print a failed attempt"""
+
+        if outcome == NO_SYNC:
+            print(fg.li_red + "[-] Error during synchronisation" + fg.rs)
+        elif outcome == UNEXPECTED:
+            print(fg.li_red + "[?] Unexpected response: {}".format(resp) + fg.rs)
+
+    def success(self, offset, duration, resp, start_time):
+        """Report a successful glitch and dump the flash memory"""
+
+        run_sync(self.success_async(offset, duration, resp, start_time))
+
+    async def success_async(self, offset, duration, resp, start_time):
+        """Report a successful glitch and dump the flash memory"""
+
+        # measure the time again
+        end_time = datetime.now()
+
+        print(ef.bold + fg.green + "[*] Glitching success!\n"
+                "    Bypassed the readout protection with the following glitch parameters:\n"
+                "        offset   = {}\n        duration = {}\n".format(offset, duration) +
+                "    Time to find this glitch: {}".format(end_time - start_time) + fg.rs)
+
+        self.save_result(offset, duration, resp)
+        if self.checkpoint is not None:
+            self.save_checkpoint()
+        elif self.store is not None:
+            self.store.flush()
+        self.show_statistics()
+
+        # dump memory, glitch again for blocks that could not be read
+        print(fg.li_white + "[*] Dumping the flash memory ..." + fg.rs)
+        if not await self.protocol.dump_memory():
+            await self.fill_dump_async(offset, duration)
+
+    def record(self, offset, duration, outcome, resp, timings=None):
+        """Record an attempt in the result store (with the timings of the last attempt by default)"""
+
+        if self.store is None:
+            return
+
+        # retry counts repeated attempts with the same parameters
+        self.retry = self.retry + 1 if self.last == (offset, duration) else 0
+        self.last = (offset, duration)
+        self.store.record(offset, duration, self.retry, outcome,
+                None if resp is None else self.protocol.format_response(resp),
+                self.timings if timings is None else timings)
+
+    def last_success(self):
+        """Return the last successful (offset, duration) or None"""
+
+        if self.store is not None:
+            params = self.store.last_success(self.protocol.name)
+            if params is not None:
+                return params
+
+        try:
+            with open(self.results_file) as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+
+        for line in reversed(lines):
+            try:
+                offset, duration = line.split(",")[:2]
+                return int(offset), int(duration)
+            except ValueError:
+                continue
+        return None
+
+    def fill_dump(self, offset, duration):
+        """Glitch with the given parameters until all missing blocks of the dump are read
+
+        Returns True if the dump is complete.
+        """
+
+        return run_sync(self.fill_dump_async(offset, duration))
+
+    async def fill_dump_async(self, offset, duration):
+        """Glitch with the given parameters until all missing blocks of the dump are read
+
+        Returns True if the dump is complete.
+        """
+
+        if self.store is not None and self.store.run is None:
+            self.store.start_run(self.protocol.name, "fill dump")
+
+        for i in range(self.fill_attempts):
+            print(fg.li_white + "[*] Glitching with ({},{}) to read the missing blocks".format(
+                    offset, duration) + fg.rs)
+
+            outcome, resp = await self.attempt_async(offset, duration)
+            self.stats.add(outcome)
+            self.record(offset, duration, outcome, resp)
+
+            if outcome == SUCCESS and await self.protocol.dump_memory(resume=True):
+                if self.store is not None:
+                    self.store.flush()
+                return True
+
+        if self.store is not None:
+            self.store.flush()
+        print(fg.li_red + "[-] Dump still incomplete after {} glitch attempts".format(self.fill_attempts) + fg.rs)
+        return False
+
+    def show_statistics(self):
+        """Show the statistics of the current run"""
+
+        print(fg.li_white + "[*] Statistics: {}".format(self.stats) + fg.rs)
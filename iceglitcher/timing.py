@@ -0,0 +1,61 @@
+"""
+  iCE, iCE Baby Glitcher - per-phase wall-clock deadlines
+
+  Every glitch attempt consists of a few UART phases (synchronization
+  after reset, command echo, return code and payload). Each phase gets
+  its own timeout in milliseconds, turned into an absolute
+  time.monotonic() deadline when the phase starts. A read that misses
+  its deadline fails the attempt immediately, so the time spent on a
+  failed attempt does not depend on the speed of the host.
+"""
+
+from time import monotonic
+
+# default timeouts per phase in milliseconds
+SYNC_TIMEOUT = 300          # reset pulse + boot ROM start-up until the sync response
+ECHO_TIMEOUT = 10           # echo of the sent command
+RETCODE_TIMEOUT = 10        # return code / ACK after the echo
+PAYLOAD_TIMEOUT = 50        # response lines or data bytes
+
+PHASES = ("sync", "echo", "retcode", "payload")
+
+
+class Timeouts():
+    """Timeouts for the UART phases of a glitch attempt"""
+
+    def __init__(self, sync=SYNC_TIMEOUT, echo=ECHO_TIMEOUT,
+            retcode=RETCODE_TIMEOUT, payload=PAYLOAD_TIMEOUT):
+        """Initialize the timeouts (in milliseconds)"""
+
+        self.sync = sync
+        self.echo = echo
+        self.retcode = retcode
+        self.payload = payload
+
+    def deadline(self, phase):
+        """Return the absolute monotonic deadline for a phase starting now"""
+
+        return monotonic() + getattr(self, phase) / 1000.0
+
+    @classmethod
+    def from_args(cls, args):
+        """Create timeouts from parsed command line arguments"""
+
+        return cls(**{phase: getattr(args, phase + "_timeout") for phase in PHASES})
+
+    def __repr__(self):
+        return "Timeouts({})".format(", ".join(
+            "{}={}".format(phase, getattr(self, phase)) for phase in PHASES))
+
+
+def add_timeout_arguments(parser):
+    """Add the per-phase timeout options to an argparse parser"""
+
+    parser.add_argument('--sync_timeout', type=float, default=SYNC_TIMEOUT,
+            help='timeout in ms for the sync response after reset (default is {})'.format(SYNC_TIMEOUT))
+    parser.add_argument('--echo_timeout', type=float, default=ECHO_TIMEOUT,
+            help='timeout in ms for the command echo (default is {})'.format(ECHO_TIMEOUT))
+    parser.add_argument('--retcode_timeout', type=float, default=RETCODE_TIMEOUT,
+            help='timeout in ms for the return code (default is {})'.format(RETCODE_TIMEOUT))
+    parser.add_argument('--payload_timeout', type=float, default=PAYLOAD_TIMEOUT,
+            help='timeout in ms for response data (default is {})'.format(PAYLOAD_TIMEOUT))
@@ -0,0 +1,98 @@
+"""
+  iCE, iCE Baby Glitcher - buffered UART reader
+
+  The FTDI chip on the iCEstick collects all bytes received from the
+  FPGA in its FIFO. Instead of fetching them one by one with a USB
+  round-trip per byte, the reader below drains the whole FIFO with one
+  bulk read and serves line and fixed-size reads from a local buffer.
+"""
+
+from time import monotonic
+
+CRLF = b"\r\n"
+
+# maximum number of bytes fetched from the FTDI FIFO per bulk read
+READ_CHUNK_SIZE = 4096
+
+# timeout in seconds for reads without an explicit deadline
+READ_TIMEOUT = 0.5
+
+
+class BufferedReader():
+    """Buffered reader on top of a pylibftdi Device"""
+
+    def __init__(self, dev, chunk_size=READ_CHUNK_SIZE, timeout=READ_TIMEOUT):
+        """Initialize the reader"""
+
+        self.dev = dev
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.buf = bytearray()
+
+    def fill(self):
+        """Move everything the FTDI FIFO currently holds into the buffer"""
+
+        data = self.dev.read(self.chunk_size)
+        if data:
+            self.buf += data
+        return len(data)
+
+    def read_until(self, terminator=CRLF, deadline=None):
+        """Read data including the terminator, None on timeout
+
+        deadline is an absolute time.monotonic() value. Without deadline,
+        the reader's default timeout applies. An incomplete line is dropped
+        on timeout.
+        """
+
+        if deadline is None:
+            deadline = monotonic() + self.timeout
+
+        start = 0
+        while True:
+            pos = self.buf.find(terminator, start)
+            if pos >= 0:
+                end = pos + len(terminator)
+                data = bytes(self.buf[:end])
+                del self.buf[:end]
+                return data
+
+            # only search the new part of the buffer next time
+            start = max(0, len(self.buf) - len(terminator) + 1)
+
+            if monotonic() >= deadline:
+                self.buf.clear()
+                return None
+            self.fill()
+
+    def read_exact(self, n, deadline=None):
+        """Read exactly n bytes, None on timeout (dropping the partial data)"""
+
+        if deadline is None:
+            deadline = monotonic() + self.timeout
+
+        while len(self.buf) < n:
+            if monotonic() >= deadline:
+                self.buf.clear()
+                return None
+            self.fill()
+
+        data = bytes(self.buf[:n])
+        del self.buf[:n]
+        return data
+
+    def skip(self, n):
+        """Drop up to n bytes that are already available without waiting"""
+
+        if len(self.buf) < n:
+            self.fill()
+        del self.buf[:n]
+
+    def flush(self):
+        """Discard buffered data and the content of the FTDI input FIFO"""
+
+        self.buf.clear()
+        try:
+            self.dev.flush_input()
+        except Exception:
+            pass
@@ -0,0 +1,40 @@
+"""
+  iCE, iCE Baby Glitcher - ISP uudecoding
+
+  The NXP LPC ISP sends read data as uuencoded lines of up to 45 bytes,
+  followed by a checksum line with the decimal sum of the raw bytes
+  after every 20 lines. The lines are decoded with binascii instead of
+  wrapping them into a "begin ... end" file for the deprecated "uu" codec.
+"""
+
+from binascii import a2b_uu, Error
+
+
+def line_length(line):
+    """Return the number of data bytes of a uuencoded line"""
+
+    return (line[0] - 0x20) & 0x3F
+
+
+def uudecode(lines):
+    """Decode uuencoded lines (without line terminators), None if malformed"""
+
+    try:
+        return b"".join([a2b_uu(line) for line in lines])
+    except Error:
+        return None
+
+
+def checksum_matches(data, checksum):
+    """Check decoded data against an ISP checksum line"""
+
+    return checksum.strip() == b"%d" % sum(data)
+
+
+def decode_group(lines, checksum):
+    """Decode the uuencoded lines of a checksum group, None on checksum mismatch"""
+
+    data = uudecode(lines)
+    if data is None or not checksum_matches(data, checksum):
+        return None
+    return data
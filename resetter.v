@@ -1,17 +1,22 @@
-module resetter (
+module resetter #(
+    parameter DEFAULT_WIDTH = 32'd21_900_000   // ~219 ms at 100 MHz
+) (
     input wire clk,
     input wire enable,
+    input wire [31:0] width,    // pulse width in clock cycles, 0 = DEFAULT_WIDTH
     output reg reset_line
 );
 
-    reg [23:0] counter = 0;
+    reg [31:0] counter = 0;
+    reg [31:0] limit = DEFAULT_WIDTH;
     reg active = 0;
 
     always @(posedge clk) begin
         if (enable) begin
             counter <= 0;
             active <= 1;
-        end else if (active && counter < 24'd21_900_000) begin
+            limit <= (width == 0) ? DEFAULT_WIDTH : width;
+        end else if (active && counter < limit) begin
             counter <= counter + 1;
         end else begin
             active <= 0;
@@ -0,0 +1,292 @@
+/*
+  iCEstick Glitcher (sweep_engine.v)
+
+  Autonomous glitch parameter sweep. For every offset x duration x retry
+  (offsets outermost, retries innermost) the engine starts the offset
+  counter, resets the target one command byte time later (like the host
+  sends START_GLITCH and RESET), sends the probe bytes after probe_delay
+  cycles and compares the tail of the target response with the expected
+  rejection once the target was quiet for timeout cycles.
+
+  Outcome records are queued in the FIFO of the host link (host_link.v):
+
+    all attempts:  outcome (1 byte) of every attempt in sweep order
+    hits only:     outcome, offset (LE32), duration (LE32) of every
+                   attempt that was not rejected
+    end of sweep:  0xFF, number of attempts (LE32)
+
+  Outcomes: 0 = rejected, 1 = no response, 2 = other response
+*/
+
+`default_nettype none
+
+module sweep_engine #(
+    parameter CLKS_PER_BIT = 868        // 115200 baud at 100 MHz
+) (
+    input  wire         clk,
+    input  wire         rst,
+
+    // configuration (CMD_SWEEP_SETUP, CMD_SWEEP_PROBE)
+    input  wire [31:0]  ofs_start,
+    input  wire [31:0]  ofs_end,
+    input  wire [31:0]  ofs_step,
+    input  wire [31:0]  dur_start,
+    input  wire [31:0]  dur_end,
+    input  wire [31:0]  dur_step,
+    input  wire [15:0]  retries,
+    input  wire [31:0]  probe_delay,    // cycles from the reset until the probe is sent
+    input  wire [31:0]  timeout,        // quiet cycles that end the response
+    input  wire [127:0] probe,          // first probe byte in bits 7:0
+    input  wire [4:0]   probe_len,
+    input  wire [127:0] expect,         // last expected byte in bits 7:0
+    input  wire [4:0]   expect_len,
+
+    // clocks per bit of the host link (host_link.v)
+    input  wire [15:0]  host_clks_per_bit,
+
+    // control (CMD_SWEEP_START, CMD_SWEEP_STOP)
+    input  wire         start,
+    input  wire         hits_only,
+    input  wire         stop,
+    output reg          busy = 1'b0,
+
+    // glitch chain
+    output reg  [31:0]  glitch_ofs = 32'd0,
+    output reg  [31:0]  glitch_dur = 32'd0,
+    output reg          start_glitch = 1'b0,
+    output reg          target_reset = 1'b0,
+
+    // target UART
+    input  wire         target_rx,
+    output wire         target_tx,
+
+    // outcome records to the host link
+    output reg          rec_wr = 1'b0,
+    output reg  [7:0]   rec_data = 8'd0,
+    input  wire         rec_full
+);
+
+    localparam [7:0] OUT_REJECTED = 8'd0;
+    localparam [7:0] OUT_SILENT   = 8'd1;
+    localparam [7:0] OUT_OTHER    = 8'd2;
+    localparam [7:0] REC_DONE     = 8'hFF;
+
+    // time of one command byte on the host link
+    wire [31:0] command_gap = 10 * host_clks_per_bit;
+
+    localparam [3:0] S_IDLE      = 4'd0;
+    localparam [3:0] S_GLITCH    = 4'd1;
+    localparam [3:0] S_RESET     = 4'd2;
+    localparam [3:0] S_DELAY     = 4'd3;
+    localparam [3:0] S_SEND      = 4'd4;
+    localparam [3:0] S_SEND_WAIT = 4'd5;
+    localparam [3:0] S_RECV      = 4'd6;
+    localparam [3:0] S_REPORT    = 4'd7;
+    localparam [3:0] S_NEXT      = 4'd8;
+    localparam [3:0] S_DONE      = 4'd9;
+    localparam [3:0] S_FINISH    = 4'd10;
+
+    reg [3:0]  state = S_IDLE;
+    reg [31:0] counter = 32'd0;
+    reg [15:0] retry = 16'd0;
+    reg [31:0] attempts = 32'd0;
+    reg [4:0]  index = 5'd0;
+    reg        stop_req = 1'b0;
+    reg        hits = 1'b0;
+
+    /* ───────────────────────────────
+       Target UART
+       ─────────────────────────────── */
+    reg        probe_en = 1'b0;
+    reg  [7:0] probe_byte = 8'd0;
+    wire       probe_rdy;
+
+    uart_tx PROBE_TX (
+        .clk    (clk),
+        .rst    (rst),
+        .dout   (target_tx),
+        .data_in(probe_byte),
+        .en     (probe_en),
+        .rdy    (probe_rdy)
+    );
+
+    wire [7:0] rx_data;
+    wire       rx_valid;
+
+    uart_rx_byte #(.CLKS_PER_BIT(CLKS_PER_BIT)) RESP_RX (
+        .clk  (clk),
+        .rst  (rst),
+        .rx   (target_rx),
+        .data (rx_data),
+        .valid(rx_valid)
+    );
+
+    // response tail (newest byte in bits 7:0) and its length
+    reg [127:0] history = 128'd0;
+    reg [4:0]   received = 5'd0;
+
+    wire [127:0] mask = (expect_len >= 5'd16) ? {128{1'b1}} : ((128'd1 << {expect_len, 3'b000}) - 128'd1);
+    wire rejected = (expect_len != 5'd0) && (received >= expect_len) && ((history & mask) == (expect & mask));
+
+    /* ───────────────────────────────
+       Outcome records
+       ─────────────────────────────── */
+    reg  [71:0] record = 72'd0;         // first byte in bits 7:0
+    reg  [3:0]  record_len = 4'd0;
+
+    /* ───────────────────────────────
+       Sweep state machine
+       ─────────────────────────────── */
+    always @(posedge clk) begin
+        start_glitch <= 1'b0;
+        target_reset <= 1'b0;
+        probe_en <= 1'b0;
+        rec_wr <= 1'b0;
+
+        if (stop)
+            stop_req <= 1'b1;
+
+        if (rx_valid) begin
+            history <= {history[119:0], rx_data};
+            if (received != 5'd16)
+                received <= received + 1;
+        end
+
+        if (rst) begin
+            state <= S_IDLE;
+            busy <= 1'b0;
+        end else begin
+            case (state)
+                S_IDLE: begin
+                    if (start) begin
+                        busy <= 1'b1;
+                        hits <= hits_only;
+                        stop_req <= 1'b0;
+                        attempts <= 32'd0;
+                        retry <= 16'd0;
+                        glitch_ofs <= ofs_start;
+                        glitch_dur <= dur_start;
+                        state <= (ofs_start < ofs_end && dur_start < dur_end) ? S_GLITCH : S_DONE;
+                    end
+                end
+
+                S_GLITCH: begin
+                    start_glitch <= 1'b1;
+                    counter <= 32'd0;
+                    state <= S_RESET;
+                end
+
+                S_RESET: begin
+                    if (counter == command_gap) begin
+                        target_reset <= 1'b1;
+                        counter <= 32'd0;
+                        state <= S_DELAY;
+                    end else begin
+                        counter <= counter + 1;
+                    end
+                end
+
+                S_DELAY: begin
+                    if (counter == probe_delay) begin
+                        index <= 5'd0;
+                        received <= 5'd0;
+                        state <= S_SEND;
+                    end else begin
+                        counter <= counter + 1;
+                    end
+                end
+
+                S_SEND: begin
+                    counter <= 32'd0;
+                    if (index == probe_len) begin
+                        state <= S_RECV;
+                    end else if (probe_rdy) begin
+                        probe_byte <= probe[{index[3:0], 3'b000} +: 8];
+                        probe_en <= 1'b1;
+                        index <= index + 1;
+                        state <= S_SEND_WAIT;
+                    end
+                end
+
+                // wait until the UART took the byte
+                S_SEND_WAIT: begin
+                    if (!probe_rdy)
+                        state <= S_SEND;
+                end
+
+                // the response ends after timeout quiet cycles
+                S_RECV: begin
+                    if (rx_valid) begin
+                        counter <= 32'd0;
+                    end else if (counter == timeout) begin
+                        attempts <= attempts + 1;
+                        index <= 5'd0;
+                        if (received == 5'd0) begin
+                            record <= {glitch_dur, glitch_ofs, OUT_SILENT};
+                            record_len <= hits ? 4'd9 : 4'd1;
+                        end else if (rejected) begin
+                            record <= {glitch_dur, glitch_ofs, OUT_REJECTED};
+                            record_len <= hits ? 4'd0 : 4'd1;
+                        end else begin
+                            record <= {glitch_dur, glitch_ofs, OUT_OTHER};
+                            record_len <= hits ? 4'd9 : 4'd1;
+                        end
+                        state <= S_REPORT;
+                    end else begin
+                        counter <= counter + 1;
+                    end
+                end
+
+                S_REPORT: begin
+                    if (index == record_len) begin
+                        state <= S_NEXT;
+                    end else if (!rec_full && !rec_wr) begin
+                        rec_data <= record[{index[3:0], 3'b000} +: 8];
+                        rec_wr <= 1'b1;
+                        index <= index + 1;
+                    end
+                end
+
+                // same order as the raster search of the host
+                S_NEXT: begin
+                    state <= S_GLITCH;
+                    if (stop_req) begin
+                        state <= S_DONE;
+                    end else if (retry + 1 < retries) begin
+                        retry <= retry + 1;
+                    end else begin
+                        retry <= 16'd0;
+                        if (glitch_dur + dur_step < dur_end) begin
+                            glitch_dur <= glitch_dur + dur_step;
+                        end else begin
+                            glitch_dur <= dur_start;
+                            if (glitch_ofs + ofs_step < ofs_end)
+                                glitch_ofs <= glitch_ofs + ofs_step;
+                            else
+                                state <= S_DONE;
+                        end
+                    end
+                end
+
+                S_DONE: begin
+                    record <= {32'd0, attempts, REC_DONE};
+                    record_len <= 4'd5;
+                    index <= 5'd0;
+                    state <= S_FINISH;
+                end
+
+                S_FINISH: begin
+                    if (index == record_len) begin
+                        busy <= 1'b0;
+                        state <= S_IDLE;
+                    end else if (!rec_full && !rec_wr) begin
+                        rec_data <= record[{index[3:0], 3'b000} +: 8];
+                        rec_wr <= 1'b1;
+                        index <= index + 1;
+                    end
+                end
+            endcase
+        end
+    end
+
+endmodule
@@ -0,0 +1,71 @@
+/*
+  iCEstick Glitcher (target_link.v)
+
+  Transmit side of the target UART. Passthrough bytes of the command
+  processor (CMD_PASSTHROUGH and CMD_PASSTHROUGH_LONG) are queued in a
+  FIFO, so the host link may deliver them faster than the target
+  baudrate. The host paces long payloads to the FIFO size; bytes written
+  to a full FIFO are dropped. The baudrate (clks_per_bit) is latched at
+  the start of every byte. top.v clears the FIFO with every target reset.
+*/
+
+`default_nettype none
+
+module target_link #(
+    parameter DEPTH_LOG2 = 11           // 2048 bytes
+) (
+    input  wire        clk,
+    input  wire        rst,
+    input  wire [15:0] clks_per_bit,
+
+    // passthrough bytes from the command processor
+    input  wire        wr,
+    input  wire [7:0]  din,
+    output wire        full,
+
+    output wire        target_tx
+);
+
+    reg        fifo_rd = 1'b0;
+    wire [7:0] fifo_dout;
+    wire       fifo_empty;
+
+    fifo #(.WIDTH(8), .DEPTH_LOG2(DEPTH_LOG2)) TX_FIFO (
+        .clk  (clk),
+        .rst  (rst),
+        .wr   (wr),
+        .din  (din),
+        .rd   (fifo_rd),
+        .dout (fifo_dout),
+        .empty(fifo_empty),
+        .full (full)
+    );
+
+    // read an entry, send it one cycle later
+    reg  tx_en = 1'b0;
+    reg  tx_pending = 1'b0;
+    wire tx_rdy;
+
+    uart_tx_var TARGET_TX (
+        .clk         (clk),
+        .rst         (rst),
+        .clks_per_bit(clks_per_bit),
+        .data_in     (fifo_dout),
+        .en          (tx_en),
+        .rdy         (tx_rdy),
+        .dout        (target_tx)
+    );
+
+    always @(posedge clk) begin
+        fifo_rd <= 1'b0;
+        tx_en <= 1'b0;
+        if (tx_pending) begin
+            tx_en <= 1'b1;
+            tx_pending <= 1'b0;
+        end else if (!fifo_empty && tx_rdy && !tx_en && !fifo_rd) begin
+            fifo_rd <= 1'b1;
+            tx_pending <= 1'b1;
+        end
+    end
+
+endmodule
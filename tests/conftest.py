@@ -0,0 +1,34 @@
+"""
+  iCE, iCE Baby Glitcher - test fixtures
+
+  The tests run the host stack against the simulated iCEstick and
+  targets of iceglitcher.sim, no hardware is needed.
+"""
+
+import pytest
+
+from iceglitcher.aio import run_sync
+from iceglitcher.fpga import FPGA
+from iceglitcher.protocols import PROTOCOLS
+from iceglitcher.sim import simulate
+from iceglitcher.timing import Timeouts
+
+
+@pytest.fixture
+def target(tmp_path):
+    """Return a function creating (device, protocol) of a simulated, synchronized target
+
+    sim holds further keyword arguments of the SimulatedDevice, kwargs
+    the ones of the protocol.
+    """
+
+    def create(protocol_name, flash_size=4096, locked=True, hits=None, sim=None, **kwargs):
+        dev = simulate(protocol_name, flash_size, hits, seed=1, locked=locked, **(sim or {}))
+        protocol = PROTOCOLS[protocol_name](FPGA(dev), Timeouts(), flash_size=flash_size,
+                dump_file=str(tmp_path / "memory.bin"), **kwargs)
+
+        protocol.fpga.reset_target()
+        assert run_sync(protocol.synchronize())
+        return dev, protocol
+
+    return create
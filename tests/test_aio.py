@@ -0,0 +1,71 @@
+"""
+  iCE, iCE Baby Glitcher - asyncio transport tests
+"""
+
+import asyncio
+import threading
+from time import sleep
+
+from iceglitcher.aio import AsyncReader
+from iceglitcher.fpga import FPGA
+
+
+class SlowDevice():
+    """Device whose reads take a while, returning the given chunks one per read"""
+
+    def __init__(self, *chunks, read_time=0.001):
+        self.chunks = list(chunks)
+        self.read_time = read_time
+        self.reading = threading.Event()
+        self.proceed = threading.Event()
+        self.proceed.set()
+        self.overlaps = 0
+        self.writes = []
+
+    def read(self, length):
+        self.reading.set()
+        self.proceed.wait(1)
+        sleep(self.read_time)
+        self.reading.clear()
+        return self.chunks.pop(0) if self.chunks else b""
+
+    def write(self, data):
+        if self.reading.is_set():
+            self.overlaps += 1
+        self.writes.append(data)
+
+    def flush_input(self):
+        pass
+
+
+def test_flush_drops_data_read_before():
+    dev = SlowDevice(b"stale\r\n", b"fresh\r\n")
+    dev.proceed.clear()
+
+    async def sweep():
+        async with AsyncReader(dev) as reader:
+            # the executor thread is reading stale data while the flush waits
+            while not dev.reading.is_set():
+                await asyncio.sleep(0.001)
+            threading.Timer(0.05, dev.proceed.set).start()
+            reader.flush()
+            return await reader.read_until()
+
+    assert asyncio.run(sweep()) == b"fresh\r\n"
+
+
+def test_writes_do_not_overlap_reads():
+    dev = SlowDevice()
+    fpga = FPGA(dev)
+
+    async def sweep():
+        async with AsyncReader(dev, lock=fpga.lock):
+            for i in range(50):
+                fpga.reset_target()
+                with fpga.batch() as batch:
+                    batch.set_glitch_offset(i)
+                await asyncio.sleep(0.001)
+
+    asyncio.run(sweep())
+    assert len(dev.writes) == 100
+    assert dev.overlaps == 0
@@ -0,0 +1,87 @@
+"""
+  iCE, iCE Baby Glitcher - sweep checkpoint tests
+"""
+
+from itertools import islice
+
+import pytest
+
+from iceglitcher.checkpoint import Checkpoint
+from iceglitcher.fpga import FPGA
+from iceglitcher.protocols import PROTOCOLS
+from iceglitcher.search import Adaptive
+from iceglitcher.sim import simulate
+from iceglitcher.sweep import Glitcher
+from iceglitcher.timing import Timeouts
+
+
+def glitcher(tmp_path, checkpoint, end_offset=20, search=None):
+    """Glitcher on a simulated LPC target that is glitched at (15, 2)"""
+
+    dev = simulate("lpc", 4096, {(15, 2): 1.0}, seed=1)
+    fpga = FPGA(dev)
+    protocol = PROTOCOLS["lpc"](fpga, Timeouts(), flash_size=4096, dump_file=str(tmp_path / "memory.bin"))
+    return Glitcher(fpga, protocol, start_offset=10, end_offset=end_offset, start_duration=1,
+            end_duration=4, retries=1, results_file=str(tmp_path / "results.txt"), checkpoint=checkpoint,
+            search=search)
+
+
+def test_resume_continues_the_sweep(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"), 0)
+
+    # save the progress after the first 4 attempts
+    first = glitcher(tmp_path, checkpoint)
+    for offset, duration in islice(iter(first.search), 4):
+        first.last = (offset, duration)
+    first.save_checkpoint()
+
+    second = glitcher(tmp_path, checkpoint)
+    second.resume()
+    assert second.search.position == 4
+    assert next(iter(second.search)) == (11, 2)
+
+    # (15, 2) is attempt 17 of the sweep
+    second = glitcher(tmp_path, checkpoint)
+    second.resume()
+    assert second.run()
+    assert second.stats.attempts == 13
+
+
+def test_resume_another_sweep(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"), 0)
+    glitcher(tmp_path, checkpoint).save_checkpoint()
+
+    with pytest.raises(ValueError, match="different sweep"):
+        glitcher(tmp_path, checkpoint, end_offset=30).resume()
+
+
+def test_no_checkpoint(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"), 0)
+
+    first = glitcher(tmp_path, checkpoint)
+    first.resume()
+    assert first.search.position == 0
+
+
+def test_resume_another_adaptive_search(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"), 0)
+    glitcher(tmp_path, checkpoint, search=Adaptive(range(10, 20), range(1, 4), seed=7)).save_checkpoint()
+
+    # same ranges, other search parameters
+    for search in (Adaptive(range(10, 20), range(1, 4), coarse_step=4, seed=7),
+            Adaptive(range(10, 20), range(1, 4), explore=0.5, seed=7),
+            Adaptive(range(10, 20), range(1, 4), seed=8)):
+        with pytest.raises(ValueError, match="different sweep"):
+            glitcher(tmp_path, checkpoint, search=search).resume()
+
+    glitcher(tmp_path, checkpoint, search=Adaptive(range(10, 20), range(1, 4), seed=7)).resume()
+
+
+def test_resume_adaptive_search_with_random_seed(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"), 0)
+    first = glitcher(tmp_path, checkpoint, search=Adaptive(range(10, 20), range(1, 4)))
+    first.save_checkpoint()
+
+    second = glitcher(tmp_path, checkpoint, search=Adaptive(range(10, 20), range(1, 4)))
+    second.resume()
+    assert second.search.seed == first.search.seed
@@ -0,0 +1,63 @@
+"""
+  iCE, iCE Baby Glitcher - streaming memory dump tests
+"""
+
+import pytest
+
+from iceglitcher.dump import DumpFile
+
+
+def test_resume_keeps_read_blocks(tmp_path):
+    path = str(tmp_path / "memory.bin")
+
+    dump = DumpFile(path, 1000, 256)
+    dump.write_block(1, b"\x11" * 256)
+    dump.close()
+
+    dump = DumpFile(path, 1000, 256, resume=True)
+    assert dump.resumed
+    assert dump.completed == 1
+    assert dump.missing() == [0, 2, 3]
+
+    dump.write_block(3, b"\x33" * 232)
+    dump.close()
+    with open(path, "rb") as f:
+        assert f.read() == b"\xff" * 256 + b"\x11" * 256 + b"\xff" * 256 + b"\x33" * 232
+
+
+def test_without_resume_starts_over(tmp_path):
+    path = str(tmp_path / "memory.bin")
+
+    dump = DumpFile(path, 1000, 256)
+    dump.write_block(0, b"\x00" * 256)
+    dump.close()
+
+    dump = DumpFile(path, 1000, 256)
+    assert not dump.resumed
+    assert dump.missing() == [0, 1, 2, 3]
+    dump.close()
+
+
+def test_resume_with_another_block_size(tmp_path):
+    path = str(tmp_path / "memory.bin")
+
+    dump = DumpFile(path, 1024, 256)
+    dump.write_block(0, b"\x00" * 256)
+    dump.close()
+
+    with pytest.raises(ValueError, match="blocks of 256 bytes, not 128"):
+        DumpFile(path, 1024, 128, resume=True)
+
+    # the existing dump is left alone
+    dump = DumpFile(path, 1024, 256, resume=True)
+    assert dump.completed == 1
+    dump.close()
+
+
+def test_resume_with_another_size(tmp_path):
+    path = str(tmp_path / "memory.bin")
+
+    DumpFile(path, 1024, 256).close()
+
+    with pytest.raises(ValueError, match="keep the flash size"):
+        DumpFile(path, 2048, 256, resume=True)
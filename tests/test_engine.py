@@ -0,0 +1,65 @@
+"""
+  iCE, iCE Baby Glitcher - hardware sweep tests
+"""
+
+from collections import Counter
+from itertools import product, takewhile
+
+from iceglitcher.engine import HardwareSweep, remaining_segments
+from iceglitcher.fpga import FPGA
+from iceglitcher.protocols import PROTOCOLS
+from iceglitcher.sim import GLITCH_FAULT, GLITCH_SUCCESS, simulate
+from iceglitcher.sweep import Glitcher
+from iceglitcher.timing import Timeouts
+
+
+class FixedModel():
+    """Glitch model with a fault at one parameter pair and a hit at another"""
+
+    def __init__(self, fault, hit):
+        self.fault = fault
+        self.hit = hit
+
+    def effect(self, offset, duration):
+        if (offset, duration) == self.fault:
+            return GLITCH_FAULT
+        if (offset, duration) == self.hit:
+            return GLITCH_SUCCESS
+        return None
+
+
+def expand(segments):
+    """All (offset, duration, retry) attempts of segments, retries counted per segment"""
+
+    return [attempt for offsets, durations, retries in segments
+            for attempt in product(offsets, durations, range(retries))]
+
+
+def test_remaining_segments():
+    segment = (range(10, 20), range(1, 4), 2)
+    attempts = [(offset, duration) for offset, duration, retry in expand([segment])]
+
+    for done in range(len(attempts) + 1):
+        rest = [(offset, duration) for offset, duration, retry in expand(remaining_segments(segment, done))]
+        assert rest == attempts[done:]
+
+
+def test_sweep_continues_after_a_candidate(tmp_path):
+    dev = simulate("stm8", 4096, seed=1)
+    dev.model = FixedModel((12, 2), (15, 2))
+    fpga = FPGA(dev)
+    protocol = PROTOCOLS["stm8"](fpga, Timeouts(), flash_size=4096, dump_file=str(tmp_path / "memory.bin"))
+    glitcher = Glitcher(fpga, protocol, start_offset=10, end_offset=20, start_duration=1, end_duration=4,
+            retries=2, results_file=str(tmp_path / "results.txt"))
+
+    recorded = []
+    glitcher.record = lambda offset, duration, outcome, resp, timings=None: recorded.append((offset, duration))
+    assert HardwareSweep(glitcher).run()
+
+    # the fault at (12, 2) is confirmed in vain, the sweep goes on without
+    # repeating attempts up to the first attempt at (15, 2)
+    sweep = list(takewhile(lambda params: params != (15, 2), product(range(10, 20), range(1, 4))))
+    expected = Counter({params: 2 for params in sweep})
+    expected[(12, 2)] += 5
+    expected[(15, 2)] = 2
+    assert Counter(recorded) == expected
@@ -0,0 +1,77 @@
+"""
+  iCE, iCE Baby Glitcher - FPGA transport tests
+"""
+
+from time import monotonic
+
+import pytest
+
+from iceglitcher import fpga as fpga_module
+from iceglitcher.bench import bench_sweep
+from iceglitcher.fpga import FPGA, TARGET_FIFO_SIZE
+from iceglitcher.sim import simulate
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record the delays the FPGA link sleeps"""
+
+    delays = []
+    monkeypatch.setattr(fpga_module, "sleep", delays.append)
+    return delays
+
+
+def test_small_passthroughs_are_not_paced(sleeps):
+    fpga = FPGA(simulate("lpc", 4096))
+
+    # far more than the target FIFO takes at the target baudrate
+    for i in range(1000):
+        fpga.passthrough(b"R 0 4\r\n")
+    assert sleeps == []
+
+
+def test_reset_clears_the_target_fifo(sleeps):
+    fpga = FPGA(simulate("lpc", 4096))
+
+    fpga.passthrough(b"\x00" * 1000)
+    assert fpga.target_free > monotonic()
+
+    fpga.reset_target()
+    assert fpga.target_free <= monotonic()
+
+    fpga.passthrough(b"\x00" * 1000)
+    with fpga.batch() as batch:
+        batch.reset_target()
+    assert fpga.target_free <= monotonic()
+
+
+def test_long_payloads_are_paced(sleeps):
+    dev = simulate("lpc", 4096)
+    fpga = FPGA(dev)
+
+    fpga.passthrough(b"\x00" * (4 * TARGET_FIFO_SIZE))
+    assert len(sleeps) >= 3
+
+
+def test_sweep_does_not_sleep(sleeps):
+    bench_sweep("lpc", 200)
+    assert sleeps == []
+
+
+def test_baudrate_switch():
+    dev = simulate("lpc", 4096)
+    fpga = FPGA(dev)
+
+    assert fpga.set_baudrate(3_000_000)
+    assert fpga.baudrate == dev.baudrate == 3_000_000
+    assert fpga.ping()
+
+
+def test_baudrate_falls_back():
+    dev = simulate("lpc", 4096, max_link_baudrate=1_000_000)
+    fpga = FPGA(dev)
+
+    # the ping at the new baudrate is garbled
+    assert not fpga.set_baudrate(3_000_000)
+    assert fpga.baudrate == dev.baudrate == 115200
+    assert fpga.ping()
@@ -0,0 +1,61 @@
+"""
+  iCE, iCE Baby Glitcher - NXP LPC ISP protocol tests
+"""
+
+from iceglitcher.aio import run_sync
+from iceglitcher.protocols import REJECTED, SUCCESS
+
+
+def test_probe_under_crp(target):
+    dev, lpc = target("lpc")
+
+    outcome, resp = run_sync(lpc.probe())
+    assert outcome == REJECTED
+
+
+def test_probe_without_crp(target):
+    dev, lpc = target("lpc", locked=False)
+
+    outcome, resp = run_sync(lpc.probe())
+    assert outcome == SUCCESS
+
+
+def test_multi_line_read(target):
+    dev, lpc = target("lpc", locked=False)
+
+    # two checksum groups of 20 lines and 100 bytes
+    data = run_sync(lpc.read_memory(0, 1000))
+    assert data == dev.target.memory[:1000]
+
+    # the last checksum is acknowledged with the next command
+    assert run_sync(lpc.read_memory(1000, 48)) == dev.target.memory[1000:1048]
+
+
+def test_read_resends_a_corrupted_group(target):
+    dev, lpc = target("lpc", locked=False)
+    lpc_target = dev.target
+
+    # garble a data character of the first group on the wire
+    send = lpc_target.send
+    garbled = []
+
+    def send_garbled(data):
+        if not garbled and lpc_target.state == "checksum":
+            garbled.append(data)
+            data = data[:1] + bytes([0x20 + ((data[1] - 0x20 + 1) & 0x3F)]) + data[2:]
+        send(data)
+
+    lpc_target.send = send_garbled
+    resends = []
+    process = lpc_target.process
+
+    def count_resends():
+        resends.append(lpc_target.rx.count(b"RESEND"))
+        process()
+
+    lpc_target.process = count_resends
+
+    data = run_sync(lpc.read_memory(0, 1000))
+    assert garbled
+    assert sum(resends) == 1
+    assert data == lpc_target.memory[:1000]
@@ -0,0 +1,113 @@
+"""
+  iCE, iCE Baby Glitcher - multi-rig orchestrator tests
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import threading
+from itertools import product
+
+from iceglitcher.cli import main
+from iceglitcher.rigs import MSG_ATTEMPTS, ChunkPool, RigStore, SharedRaster
+from iceglitcher.protocols import REJECTED, SUCCESS
+
+
+def sweep_args(tmp_path, *extra):
+    """Command line of a simulated sweep with two rigs over offsets 0..63"""
+
+    return ["--simulate", "--sim_rigs", "2", "--sim_seed", "1", "--start_offset", "0", "--end_offset", "64",
+            "--end_duration", "4", "--retries", "1", "--chunk_size", "4",
+            "--store", str(tmp_path / "results.db"), "--dump_file", str(tmp_path / "memory.bin"),
+            "--results_file", str(tmp_path / "results.txt"), "--checkpoint", "", *extra]
+
+
+def attempts(tmp_path):
+    """(rig, offset, duration) of all attempts in the store"""
+
+    with sqlite3.connect(str(tmp_path / "results.db")) as db:
+        return db.execute("SELECT rig, offset, duration FROM attempts").fetchall()
+
+
+def test_chunks_are_claimed_once():
+    pool = ChunkPool(2, 4)
+    stop = multiprocessing.Event()
+    searches = [SharedRaster(range(0, 10), range(1, 3), 1, pool, rig, stop, 3) for rig in range(2)]
+
+    # an idle rig waits for the chunk of the other one
+    params = []
+    rigs = [threading.Thread(target=params.extend, args=(search,)) for search in searches]
+    for rig in rigs:
+        rig.start()
+    for rig in rigs:
+        rig.join(5)
+
+    assert sorted(params) == list(product(range(0, 10), range(1, 3)))
+    assert pool.active.value == 0
+
+
+def test_chunk_of_a_dead_rig_comes_first():
+    pool = ChunkPool(2, 3)
+    stop = multiprocessing.Event()
+
+    # rig 0 dies while sweeping chunk 0
+    assert pool.claim(0, stop) == 0
+    assert pool.requeue(0) == 0
+
+    search = SharedRaster(range(0, 12), range(1, 2), 1, pool, 1, stop, 4)
+    assert [offset for offset, duration in search] == [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11]
+
+
+def test_success_stops_the_other_rigs():
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    store = RigStore("rig0", results, stop)
+
+    store.record(10, 1, 0, REJECTED)
+    assert not stop.is_set()
+    store.record(10, 2, 0, SUCCESS)
+    assert stop.is_set()
+
+    # the success is sent right away
+    msg, serial, data = results.get(timeout=1)
+    assert (msg, serial, len(data)) == (MSG_ATTEMPTS, "rig0", 2)
+    assert store.last_success() == (10, 2)
+
+
+def test_attempts_are_flushed_after_the_interval():
+    results = multiprocessing.Queue()
+    store = RigStore("rig0", results, flush_interval=0)
+
+    store.record(10, 1, 0, REJECTED)
+    msg, serial, data = results.get(timeout=1)
+    assert len(data) == 1
+
+
+def test_merged_sweep(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert main(sweep_args(tmp_path)) == 1
+
+    rows = attempts(tmp_path)
+    assert sorted((offset, duration) for rig, offset, duration in rows) == list(product(range(64), range(1, 4)))
+    assert {rig for rig, offset, duration in rows} == {"sim0", "sim1"}
+
+
+def test_chunk_of_a_dead_rig_is_swept(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    record = RigStore.record
+
+    def crash(self, offset, duration, *args, **kwargs):
+        # sim1 dies in the middle of its second chunk, its messages are out
+        if self.serial == "sim1" and offset >= 6:
+            self.flush()
+            self.results.close()
+            self.results.join_thread()
+            os._exit(1)
+        record(self, offset, duration, *args, **kwargs)
+
+    # the workers are forked with the patched store
+    monkeypatch.setattr(RigStore, "record", crash)
+    assert main(sweep_args(tmp_path)) == 1
+
+    swept = {(offset, duration) for rig, offset, duration in attempts(tmp_path)}
+    assert swept == set(product(range(64), range(1, 4)))
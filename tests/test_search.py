@@ -0,0 +1,73 @@
+"""
+  iCE, iCE Baby Glitcher - glitch parameter search tests
+"""
+
+import json
+from itertools import islice
+
+from iceglitcher.protocols import NO_SYNC, REJECTED, UNEXPECTED
+from iceglitcher.search import Adaptive, Raster
+
+
+def test_adaptive_queues_a_point_once():
+    search = Adaptive(range(0, 100), range(1, 10), 1, seed=7)
+
+    for i in range(3):
+        search.observe(40, 5, UNEXPECTED)
+    points = [point for priority, sequence, point in search.hotspots]
+    assert len(points) == len(set(points))
+
+
+def test_adaptive_covers_the_grid():
+    search = Adaptive(range(0, 20), range(1, 6), 2, coarse_step=4, seed=7)
+
+    params = list(search)
+    assert len(params) == 2 * 20 * 5
+    assert set(params) == {(offset, duration) for offset in range(0, 20) for duration in range(1, 6)}
+
+
+def test_adaptive_tries_hotspots_first():
+    search = Adaptive(range(0, 100), range(1, 10), 1, explore=0.0, seed=7)
+
+    search.observe(40, 5, UNEXPECTED)
+    offset, duration = next(iter(search))
+    assert abs(offset - 40) <= search.radius and abs(duration - 5) <= search.radius
+
+
+def outcome(offset, duration):
+    """Anomalies around (40, 5)"""
+
+    if abs(offset - 40) <= 2 and abs(duration - 5) <= 1:
+        return UNEXPECTED
+    if duration >= 9:
+        return NO_SYNC
+    return REJECTED
+
+
+def sweep(search, n):
+    """Run n attempts of the search, return their parameters"""
+
+    params = []
+    for offset, duration in islice(iter(search), n):
+        search.observe(offset, duration, outcome(offset, duration))
+        params.append((offset, duration))
+    return params
+
+
+def roundtrip(search, restored, before=150, after=200):
+    """Check that restored continues a saved search like the original"""
+
+    sweep(search, before)
+    restored.restore(json.loads(json.dumps(search.state())))
+
+    assert restored.position == search.position
+    assert sweep(restored, after) == sweep(search, after)
+
+
+def test_raster_state():
+    roundtrip(Raster(range(0, 100), range(1, 10), 2), Raster(range(0, 100), range(1, 10), 2))
+
+
+def test_adaptive_state():
+    roundtrip(Adaptive(range(0, 100), range(1, 10), 2, seed=7),
+            Adaptive(range(0, 100), range(1, 10), 2, seed=7))
@@ -0,0 +1,70 @@
+"""
+  iCE, iCE Baby Glitcher - STM8 bootloader protocol tests
+"""
+
+from iceglitcher.aio import run_sync
+from iceglitcher.protocols import REJECTED, SUCCESS, UNEXPECTED
+from iceglitcher.sim import GLITCH_CRASH, GLITCH_FAULT
+
+
+def test_sync_after_reset(target):
+    dev, stm8 = target("stm8")
+
+    assert stm8.rebooted
+
+
+def test_sync_nack_without_reboot(target):
+    dev, stm8 = target("stm8")
+
+    # the bootloader is still synchronized and NACKs the sync bytes
+    assert run_sync(stm8.synchronize())
+    assert not stm8.rebooted
+
+    stm8.fpga.reset_target()
+    assert run_sync(stm8.synchronize())
+    assert stm8.rebooted
+
+
+def test_probe_nack_is_rejected(target):
+    dev, stm8 = target("stm8")
+
+    assert run_sync(stm8.probe()) == (REJECTED, None)
+
+
+def test_probe_garbage_is_unexpected(target):
+    dev, stm8 = target("stm8")
+
+    # a faulty glitch corrupts the answer to the READ command
+    dev.target.effect = GLITCH_FAULT
+    outcome, resp = run_sync(stm8.probe())
+    assert outcome == UNEXPECTED
+    assert resp is not None
+
+
+def test_probe_timeout_is_unexpected(target):
+    dev, stm8 = target("stm8")
+
+    dev.target.effect = GLITCH_CRASH
+    assert run_sync(stm8.probe()) == (UNEXPECTED, None)
+
+
+def test_probe_without_protection(target):
+    dev, stm8 = target("stm8", locked=False)
+
+    outcome, resp = run_sync(stm8.probe())
+    assert outcome == SUCCESS
+    assert resp == dev.target.memory[:len(resp)]
+
+
+def test_sync_with_a_late_ack(target):
+    dev, stm8 = target("stm8", locked=False, sim={"latency": 0.015})
+
+    # the ACK arrives after the next sync byte went out
+    stm8.fpga.reset_target()
+    assert run_sync(stm8.synchronize())
+    assert stm8.rebooted
+
+    # the extra sync byte does not garble the READ command
+    stm8.timeouts.retcode = 50
+    outcome, resp = run_sync(stm8.probe())
+    assert outcome == SUCCESS
@@ -0,0 +1,74 @@
+"""
+  iCE, iCE Baby Glitcher - results store tests
+"""
+
+import sqlite3
+
+import pytest
+
+from iceglitcher.protocols import NO_SYNC, REJECTED, SUCCESS, UNEXPECTED
+from iceglitcher.store import ResultStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Store with an LPC and an STM8 run"""
+
+    with ResultStore(str(tmp_path / "results.db"), commit_every=3) as store:
+        store.start_run("lpc")
+        store.record(10, 1, 0, REJECTED)
+        store.record(10, 1, 1, SUCCESS, "00112233", {"reset": 0.1, "probe": 0.2})
+        store.record(10, 2, 0, UNEXPECTED, rig="rig0")
+        store.record(11, 1, 0, NO_SYNC)
+
+        store.start_run("stm8")
+        store.record(20, 5, 0, SUCCESS)
+        store.record(10, 1, 0, REJECTED)
+        yield store
+
+
+def test_history(store):
+    assert list(store.history("lpc")) == [(10, 1, REJECTED), (10, 1, SUCCESS), (10, 2, UNEXPECTED),
+            (11, 1, NO_SYNC)]
+    assert len(list(store.history())) == 6
+
+
+def test_last_success(store):
+    assert store.last_success("lpc") == (10, 1)
+    assert store.last_success("stm8") == (20, 5)
+    assert store.last_success() == (20, 5)
+    assert store.last_success("other") is None
+
+
+def test_heatmap(store):
+    heatmap = store.heatmap()
+    assert heatmap[(10, 1)] == (3, pytest.approx(1 / 3))
+    assert heatmap[(11, 1)] == (1, 0.0)
+
+    assert store.heatmap(UNEXPECTED)[(10, 2)] == (1, 1.0)
+
+
+def test_outcomes(store):
+    assert store.outcomes(10, 1) == {SUCCESS: 1, REJECTED: 2, UNEXPECTED: 0, NO_SYNC: 0}
+    assert store.outcomes(99, 1) == {SUCCESS: 0, REJECTED: 0, UNEXPECTED: 0, NO_SYNC: 0}
+
+
+def test_columns(store, tmp_path):
+    store.flush()
+    with sqlite3.connect(str(tmp_path / "results.db")) as db:
+        rows = db.execute("SELECT response, t_reset, t_probe, rig FROM attempts WHERE offset = 10 "
+                "AND duration < 3 AND outcome != ? ORDER BY id", (REJECTED,)).fetchall()
+    assert rows == [("00112233", 0.1, 0.2, None), (None, None, None, "rig0")]
+
+
+def test_old_store_gets_the_rig_column(tmp_path):
+    path = str(tmp_path / "results.db")
+    with sqlite3.connect(path) as db:
+        db.execute("CREATE TABLE attempts (id INTEGER PRIMARY KEY, run INTEGER NOT NULL, time REAL NOT NULL, "
+                "offset INTEGER NOT NULL, duration INTEGER NOT NULL, retry INTEGER NOT NULL, "
+                "outcome TEXT NOT NULL, response TEXT, t_reset REAL, t_arm REAL, t_sync REAL, t_probe REAL)")
+
+    with ResultStore(path) as store:
+        store.start_run("lpc")
+        store.record(10, 1, 0, REJECTED, rig="rig0")
+        assert list(store.history()) == [(10, 1, REJECTED)]
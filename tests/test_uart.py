@@ -0,0 +1,52 @@
+"""
+  iCE, iCE Baby Glitcher - buffered UART reader tests
+"""
+
+from time import monotonic
+
+from iceglitcher.uart import BufferedReader
+
+
+class ChunkDevice():
+    """Device returning the given chunks, one per read"""
+
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+
+    def read(self, length):
+        return self.chunks.pop(0) if self.chunks else b""
+
+    def flush_input(self):
+        self.chunks.clear()
+
+
+def test_read_until_across_chunks():
+    reader = BufferedReader(ChunkDevice(b"Synchro", b"nized\r", b"\nOK\r\n"))
+
+    assert reader.read_until() == b"Synchronized\r\n"
+    assert reader.read_until() == b"OK\r\n"
+
+
+def test_read_exact_keeps_the_rest():
+    reader = BufferedReader(ChunkDevice(b"\x79\x01\x02", b"\x03"))
+
+    assert reader.read_exact(1) == b"\x79"
+    assert reader.read_exact(3) == b"\x01\x02\x03"
+
+
+def test_skip_drops_available_bytes():
+    reader = BufferedReader(ChunkDevice(b"\x00\x00\x79"))
+
+    reader.skip(2)
+    assert reader.read_exact(1) == b"\x79"
+
+
+def test_timeout_drops_partial_data():
+    reader = BufferedReader(ChunkDevice(b"partial", b"\r\n"))
+
+    assert reader.read_exact(16, monotonic() + 0.05) is None
+    assert reader.read_until(deadline=monotonic() + 0.01) is None
+
+    reader = BufferedReader(ChunkDevice(b"no line end"))
+    assert reader.read_until(deadline=monotonic() + 0.05) is None
+    assert reader.buf == b""
@@ -0,0 +1,39 @@
+"""
+  iCE, iCE Baby Glitcher - ISP uudecoding tests
+"""
+
+from binascii import b2a_uu
+
+from iceglitcher.uucode import decode_group, line_length, uudecode
+
+
+def encode(data):
+    """uuencoded lines of 45 bytes and the ISP checksum line"""
+
+    lines = [b2a_uu(data[i:i + 45]).rstrip(b"\n") for i in range(0, len(data), 45)]
+    return lines, b"%d\r\n" % sum(data)
+
+
+def test_line_length():
+    lines, checksum = encode(bytes(range(50)))
+
+    assert [line_length(line) for line in lines] == [45, 5]
+
+
+def test_decode_group():
+    data = bytes(range(256)) * 2
+    lines, checksum = encode(data)
+
+    assert decode_group(lines, checksum) == data
+
+
+def test_checksum_mismatch():
+    data = bytes(range(90))
+    lines, checksum = encode(data)
+
+    assert decode_group(lines, b"%d\r\n" % (sum(data) + 1)) is None
+
+
+def test_malformed_line():
+    assert uudecode([b"#\x7f\x7f\x7f\x7f"]) is None
+    assert decode_group([b"#\x7f\x7f\x7f\x7f"], b"0\r\n") is None
@@ -49,53 +49,215 @@ module top
     wire        start_dur_cnt;
     wire [31:0] glitch_ofs;
     wire [31:0] glitch_dur;
+    wire [31:0] reset_width;    // CMD_SET_RESET_WIDTH (0x05), 0 = default
+    wire [7:0]  trigger_cfg;    // CMD_SET_TRIGGER (0x06): bit 7 watch target_tx, bits 2:0 length
+    wire [31:0] trigger_pattern;
+    wire        cmd_target_tx;
+
+    // passthrough bytes (CMD_PASSTHROUGH, CMD_PASSTHROUGH_LONG 0x0D) to the target FIFO
+    wire        pt_wr;
+    wire [7:0]  pt_data;
+    wire        pt_full;
+
+    // host link: CMD_SET_BAUDRATE (0x0B), CMD_PING (0x0C)
+    wire        link_baud_set;
+    wire [15:0] link_baud_clks_per_bit;
+    wire        link_ping;
+    wire [15:0] link_clks_per_bit;
+
+    // target UART: CMD_SET_TARGET_BAUDRATE (0x0E), 115200 baud after every target reset
+    localparam [15:0] TARGET_CLKS_PER_BIT = 16'd868;
+    wire        target_baud_set;
+    wire [15:0] target_baud_clks_per_bit;
+    reg  [15:0] target_clks_per_bit = TARGET_CLKS_PER_BIT;
+
+    // hardware sweep: CMD_SWEEP_SETUP (0x07), CMD_SWEEP_PROBE (0x08),
+    // CMD_SWEEP_START (0x09), CMD_SWEEP_STOP (0x0A)
+    wire [31:0]  sweep_ofs_start, sweep_ofs_end, sweep_ofs_step;
+    wire [31:0]  sweep_dur_start, sweep_dur_end, sweep_dur_step;
+    wire [15:0]  sweep_retries;
+    wire [31:0]  sweep_probe_delay, sweep_timeout;
+    wire [127:0] sweep_probe, sweep_expect;
+    wire [4:0]   sweep_probe_len, sweep_expect_len;
+    wire         sweep_start, sweep_hits_only, sweep_stop;
 
     command_processor CMD (
         .clk                 (sys_clk),
         .rst                 (!pll_locked),
         .din                 (uart_rx),
-        .dout                (target_tx),
+        .passthrough_wr      (pt_wr),
+        .passthrough_data    (pt_data),
+        .passthrough_full    (pt_full),
+        .clks_per_bit        (link_clks_per_bit),
+        .baud_set            (link_baud_set),
+        .baud_clks_per_bit   (link_baud_clks_per_bit),
+        .ping                (link_ping),
+        .target_baud_set     (target_baud_set),
+        .target_baud_clks_per_bit(target_baud_clks_per_bit),
         .target_reset        (tgt_reset_req),
         .duration            (glitch_dur),
         .offset              (glitch_ofs),
+        .reset_width         (reset_width),
+        .trigger_config      (trigger_cfg),
+        .trigger_pattern     (trigger_pattern),
+        .sweep_ofs_start     (sweep_ofs_start),
+        .sweep_ofs_end       (sweep_ofs_end),
+        .sweep_ofs_step      (sweep_ofs_step),
+        .sweep_dur_start     (sweep_dur_start),
+        .sweep_dur_end       (sweep_dur_end),
+        .sweep_dur_step      (sweep_dur_step),
+        .sweep_retries       (sweep_retries),
+        .sweep_probe_delay   (sweep_probe_delay),
+        .sweep_timeout       (sweep_timeout),
+        .sweep_probe         (sweep_probe),
+        .sweep_probe_len     (sweep_probe_len),
+        .sweep_expect        (sweep_expect),
+        .sweep_expect_len    (sweep_expect_len),
+        .sweep_start         (sweep_start),
+        .sweep_hits_only     (sweep_hits_only),
+        .sweep_stop          (sweep_stop),
         .start_offset_counter(start_ofs_cnt)
     );
 
+    // passthrough bytes leave at the target baudrate, a target reset
+    // drops the bytes still queued for the old boot
+    target_link TGT (
+        .clk      (sys_clk),
+        .rst      (!pll_locked || tgt_reset_req),
+        .clks_per_bit(target_clks_per_bit),
+        .wr       (pt_wr),
+        .din      (pt_data),
+        .full     (pt_full),
+        .target_tx(cmd_target_tx)
+    );
+
+    /* ───────────────────────────────
+       2b. Hardware sweep engine
+       ─────────────────────────────── */
+    wire        eng_busy;
+    wire [31:0] eng_ofs;
+    wire [31:0] eng_dur;
+    wire        eng_start_glitch;
+    wire        eng_reset;
+    wire        eng_target_tx;
+    wire        eng_rec_wr;
+    wire [7:0]  eng_rec_data;
+    wire        eng_rec_full;
+
+    sweep_engine ENG (
+        .clk         (sys_clk),
+        .rst         (!pll_locked),
+        .ofs_start   (sweep_ofs_start),
+        .ofs_end     (sweep_ofs_end),
+        .ofs_step    (sweep_ofs_step),
+        .dur_start   (sweep_dur_start),
+        .dur_end     (sweep_dur_end),
+        .dur_step    (sweep_dur_step),
+        .retries     (sweep_retries),
+        .probe_delay (sweep_probe_delay),
+        .timeout     (sweep_timeout),
+        .probe       (sweep_probe),
+        .probe_len   (sweep_probe_len),
+        .expect      (sweep_expect),
+        .expect_len  (sweep_expect_len),
+        .host_clks_per_bit(link_clks_per_bit),
+        .start       (sweep_start),
+        .hits_only   (sweep_hits_only),
+        .stop        (sweep_stop),
+        .busy        (eng_busy),
+        .glitch_ofs  (eng_ofs),
+        .glitch_dur  (eng_dur),
+        .start_glitch(eng_start_glitch),
+        .target_reset(eng_reset),
+        .target_rx   (target_rx),
+        .target_tx   (eng_target_tx),
+        .rec_wr      (eng_rec_wr),
+        .rec_data    (eng_rec_data),
+        .rec_full    (eng_rec_full)
+    );
+
+    // the engine drives the glitch chain and the target UART while it runs
+    wire        reset_req = tgt_reset_req | eng_reset;
+    wire        start_glitch = start_ofs_cnt | eng_start_glitch;
+    wire [31:0] ofs_value = eng_busy ? eng_ofs : glitch_ofs;
+    wire [31:0] dur_value = eng_busy ? eng_dur : glitch_dur;
+    assign target_tx = eng_busy ? eng_target_tx : cmd_target_tx;
+
+    // the target boots into its bootloader at the default baudrate again
+    always @(posedge sys_clk) begin
+        if (reset_req)
+            target_clks_per_bit <= TARGET_CLKS_PER_BIT;
+        else if (target_baud_set)
+            target_clks_per_bit <= target_baud_clks_per_bit;
+    end
+
     /* ───────────────────────────────
        3.  Reset & glitch timing chain
        ─────────────────────────────── */
     resetter RST (
         .clk        (sys_clk),
-        .enable     (tgt_reset_req),
+        .enable     (reset_req),
+        .width      (reset_width),
         .reset_line (target_rst)
     );
 
+    /* With a trigger pattern, START_GLITCH only arms the UART trigger
+       and the offset counts from the last byte of the pattern, which
+       removes the boot time jitter of the target from the offset. */
+    wire trigger_fire;
+    wire ofs_start = (trigger_cfg[2:0] != 3'd0) ? trigger_fire : start_glitch;
+
+    uart_trigger TRG (
+        .clk    (sys_clk),
+        .rst    (!pll_locked),
+        .rx     (trigger_cfg[7] ? target_tx : target_rx),
+        .arm    (start_glitch),
+        .length (trigger_cfg[2:0]),
+        .pattern(trigger_pattern),
+        .trigger(trigger_fire)
+    );
+
     offset_counter OFS (
         .clk   (sys_clk),
-        .reset (tgt_reset_req),
-        .enable(start_ofs_cnt),
-        .din   (glitch_ofs),
+        .reset (reset_req),
+        .enable(ofs_start),
+        .din   (ofs_value),
         .done  (start_dur_cnt)
     );
 
     duration_counter DUR (
         .clk         (sys_clk),
-        .reset       (tgt_reset_req),
+        .reset       (reset_req),
         .enable      (start_dur_cnt),
-        .din         (glitch_dur),
+        .din         (dur_value),
         .power_select(power_ctrl)
     );
 
     /* ───────────────────────────────
-       4.  UART relay: target → PC
+       4.  UART relay: target → PC at the host baudrate
+           (outcome records during a hardware sweep)
        ─────────────────────────────── */
-    assign uart_tx = target_rx;
+    host_link LINK (
+        .clk              (sys_clk),
+        .rst              (!pll_locked),
+        .baud_set         (link_baud_set),
+        .baud_clks_per_bit(link_baud_clks_per_bit),
+        .ping             (link_ping),
+        .clks_per_bit     (link_clks_per_bit),
+        .target_rx        (target_rx),
+        .target_clks_per_bit(target_clks_per_bit),
+        .relay            (!eng_busy),
+        .rec_wr           (eng_rec_wr),
+        .rec_data         (eng_rec_data),
+        .rec_full         (eng_rec_full),
+        .host_tx          (uart_tx)
+    );
 
     /* ───────────────────────────────
        5.  LEDs (same as原版)
        ─────────────────────────────── */
     assign gled1 = pll_locked;  // green LED shows PLL lock
-    assign rled1 = 1'b0;
+    assign rled1 = eng_busy;    // hardware sweep running
     assign rled2 = 1'b0;
     assign rled3 = 1'b0;
     assign rled4 = 1'b0;
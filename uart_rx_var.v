@@ -0,0 +1,85 @@
+/*
+  iCEstick Glitcher (uart_rx_var.v)
+
+  UART receiver (8N1) with the clocks per bit given at runtime, latched
+  at the start bit of every byte. Every received byte is presented on
+  data with a single cycle valid pulse in its stop bit.
+*/
+
+`default_nettype none
+
+module uart_rx_var (
+    input  wire        clk,
+    input  wire        rst,
+    input  wire [15:0] clks_per_bit,
+    input  wire        rx,
+    output reg  [7:0]  data = 8'd0,
+    output reg         valid = 1'b0
+);
+
+    localparam [1:0] RX_IDLE  = 2'd0;
+    localparam [1:0] RX_START = 2'd1;
+    localparam [1:0] RX_DATA  = 2'd2;
+    localparam [1:0] RX_STOP  = 2'd3;
+
+    // synchronize the asynchronous UART line
+    reg [1:0] rx_sync = 2'b11;
+    always @(posedge clk)
+        rx_sync <= {rx_sync[0], rx};
+    wire rx_bit = rx_sync[1];
+
+    reg [1:0]  state = RX_IDLE;
+    reg [15:0] clk_cnt = 16'd0;
+    reg [15:0] bit_clks = 16'd0;
+    reg [2:0]  bit_cnt = 3'd0;
+
+    always @(posedge clk) begin
+        valid <= 1'b0;
+
+        if (rst) begin
+            state <= RX_IDLE;
+        end else begin
+            case (state)
+                RX_IDLE: begin
+                    clk_cnt <= 16'd0;
+                    bit_clks <= clks_per_bit;
+                    if (!rx_bit)
+                        state <= RX_START;
+                end
+
+                // sample the start bit in its middle
+                RX_START: begin
+                    if (clk_cnt == bit_clks / 2) begin
+                        clk_cnt <= 16'd0;
+                        bit_cnt <= 3'd0;
+                        state <= rx_bit ? RX_IDLE : RX_DATA;
+                    end else begin
+                        clk_cnt <= clk_cnt + 1;
+                    end
+                end
+
+                RX_DATA: begin
+                    if (clk_cnt == bit_clks - 1) begin
+                        clk_cnt <= 16'd0;
+                        data <= {rx_bit, data[7:1]};
+                        bit_cnt <= bit_cnt + 1;
+                        if (bit_cnt == 3'd7)
+                            state <= RX_STOP;
+                    end else begin
+                        clk_cnt <= clk_cnt + 1;
+                    end
+                end
+
+                RX_STOP: begin
+                    if (clk_cnt == bit_clks - 1) begin
+                        state <= RX_IDLE;
+                        valid <= 1'b1;
+                    end else begin
+                        clk_cnt <= clk_cnt + 1;
+                    end
+                end
+            endcase
+        end
+    end
+
+endmodule
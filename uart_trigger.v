@@ -0,0 +1,62 @@
+/*
+  iCEstick Glitcher (uart_trigger.v)
+
+  Watches a UART line for a pattern of up to 4 bytes and fires a single
+  cycle trigger pulse in the stop bit of the last pattern byte. The
+  trigger is armed by START_GLITCH and fires once per arming.
+*/
+
+`default_nettype none
+
+module uart_trigger #(
+    parameter CLKS_PER_BIT = 868        // 115200 baud at 100 MHz
+) (
+    input  wire        clk,
+    input  wire        rst,
+    input  wire        rx,              // watched UART line
+    input  wire        arm,             // start watching for the pattern
+    input  wire [2:0]  length,          // pattern length in bytes, 0 = disabled
+    input  wire [31:0] pattern,         // last pattern byte in bits 7:0
+    output reg         trigger = 1'b0
+);
+
+    wire [7:0] data;
+    wire       valid;
+
+    uart_rx_byte #(.CLKS_PER_BIT(CLKS_PER_BIT)) RX (
+        .clk  (clk),
+        .rst  (rst),
+        .rx   (rx),
+        .data (data),
+        .valid(valid)
+    );
+
+    // last received bytes (newest in bits 7:0) and their number since arming
+    reg [31:0] history = 32'd0;
+    reg [2:0]  received = 3'd0;
+    reg        armed = 1'b0;
+
+    wire [31:0] mask = (length >= 3'd4) ? 32'hFFFF_FFFF : ((32'd1 << {length, 3'b000}) - 32'd1);
+    wire [31:0] next = {history[23:0], data};
+
+    always @(posedge clk) begin
+        trigger <= 1'b0;
+
+        if (rst) begin
+            armed <= 1'b0;
+        end else if (arm) begin
+            armed <= (length != 3'd0);
+            received <= 3'd0;
+        end else if (valid) begin
+            // complete byte, compare the last length bytes
+            history <= next;
+            if (received != 3'd4)
+                received <= received + 1;
+            if (armed && received + 1 >= length && (next & mask) == (pattern & mask)) begin
+                trigger <= 1'b1;
+                armed <= 1'b0;
+            end
+        end
+    end
+
+endmodule
@@ -0,0 +1,53 @@
+/*
+  iCEstick Glitcher (uart_tx_var.v)
+
+  UART transmitter (8N1) with the clocks per bit given at runtime,
+  latched at the start of every byte. en starts a byte while rdy is
+  high, rdy drops in the following cycle.
+*/
+
+`default_nettype none
+
+module uart_tx_var (
+    input  wire        clk,
+    input  wire        rst,
+    input  wire [15:0] clks_per_bit,
+    input  wire [7:0]  data_in,
+    input  wire        en,
+    output reg         rdy = 1'b1,
+    output reg         dout = 1'b1
+);
+
+    reg [9:0]  shift = 10'h3FF;         // stop bit, 8 data bits, start bit
+    reg [3:0]  bits = 4'd0;
+    reg [15:0] cnt = 16'd0;
+    reg [15:0] bit_clks = 16'd0;
+
+    always @(posedge clk) begin
+        if (rst) begin
+            rdy <= 1'b1;
+            dout <= 1'b1;
+        end else if (rdy) begin
+            dout <= 1'b1;
+            if (en) begin
+                shift <= {1'b1, data_in, 1'b0};
+                bits <= 4'd0;
+                cnt <= 16'd0;
+                bit_clks <= clks_per_bit;
+                rdy <= 1'b0;
+            end
+        end else begin
+            dout <= shift[0];
+            if (cnt == bit_clks - 1) begin
+                cnt <= 16'd0;
+                shift <= {1'b1, shift[9:1]};
+                bits <= bits + 1;
+                if (bits == 4'd9)
+                    rdy <= 1'b1;
+            end else begin
+                cnt <= cnt + 1;
+            end
+        end
+    end
+
+endmodule